@@ -0,0 +1,267 @@
+# ============================================================
+# Analytics query service
+# ============================================================
+# asyncio HTTP server for the dashboard tables. The review cube (cube.py)
+# is loaded once and diced per continent up front; every query is answered
+# from one of these read-only views, in a worker thread so the event loop
+# keeps accepting connections. Identical queries that are
+# already running share one computation, and finished responses are kept
+# in a small LRU (the data does not change while the service runs).
+import asyncio
+import json
+import sys
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from cleaning import DATA_PATH
+
+# Endpoint -> accepted query parameters
+ENDPOINTS = {
+    "/top5_hotels": {"n", "continent"},
+    "/continent_summary": {"n"},
+    "/casino_score_comparison": {"continent"},
+    "/traveler_type_scores": {"hotel", "continent"},
+}
+
+RESPONSE_CACHE_SIZE = 1024
+
+
+def load_service(data_path=DATA_PATH):
+    """
+    Everything the endpoints read: (cube, review_stats) of all reviews
+    (key None) and of every continent, built from the persisted cube (for a
+    directory or pattern, from the loaded sources). Nothing is added later,
+    so worker threads only read it.
+    """
+    import os
+    from cube import build_cube, build_cube_rollups, cube_review_stats, dice_cube, dice_rollups, load_cube
+
+    if os.path.isfile(data_path):
+        cube, rollups = load_cube(data_path)
+    else:
+        from cleaning import load_sources
+
+        df = load_sources(data_path)
+        cube, rollups = build_cube(df), build_cube_rollups(df)
+        del df
+
+    views = {None: (cube, cube_review_stats(cube, rollups))}
+    for continent in cube["User continent"].dropna().unique():
+        filters = {"User continent": continent}
+        part = dice_cube(cube, filters)
+        views[str(continent)] = (part, cube_review_stats(part, dice_rollups(rollups, filters)))
+    return {"views": views}
+
+
+def _continent_view(service, continent):
+    # Cube and review_stats of the reviews from one continent (None: all)
+    if continent not in service["views"]:
+        raise LookupError(f"Unknown continent: {continent}")
+    return service["views"][continent]
+
+
+def _records(frame):
+    return json.loads(frame.to_json(orient="records"))
+
+
+def parse_query(target):
+    """
+    (endpoint, params) of a request target such as
+    "/top5_hotels?n=10&continent=Europe". Raises LookupError for unknown
+    endpoints and ValueError for unknown or invalid parameters.
+    """
+    url = urlsplit(target)
+    if url.path not in ENDPOINTS:
+        raise LookupError(f"Unknown endpoint: {url.path}")
+
+    params = {}
+    for name, values in parse_qs(url.query, keep_blank_values=True).items():
+        if name not in ENDPOINTS[url.path]:
+            raise ValueError(f"Unknown parameter for {url.path}: {name}")
+        params[name] = values[-1]
+
+    if "n" in params:
+        n = int(params["n"])
+        if n < 1:
+            raise ValueError("n must be at least 1")
+        params["n"] = n
+    return url.path, params
+
+
+def answer(service, endpoint, params):
+    """
+    JSON-ready result of one query. Raises LookupError for an unknown hotel
+    or continent.
+    """
+    from performance import continent_summary, top5_hotels
+    from relationship import casino_score_comparison, traveler_type_scores_for_one_hotel
+
+    # Answered from the view alone, so no reviews frame (None) is passed
+    cube, stats = _continent_view(service, params.get("continent"))
+
+    if endpoint == "/top5_hotels":
+        return {"hotels": _records(top5_hotels(None, stats["hotels"], params.get("n", 5)))}
+
+    if endpoint == "/continent_summary":
+        n = params.get("n", 3)
+        counts, table, _, _ = continent_summary(None, stats)
+        return {
+            "review_counts": {str(k): int(v) for k, v in counts.items()},
+            "continents": _records(table),
+            "top_score": _records(table.sort_values("avg_score", ascending=False).head(n)),
+            "top_helpful": _records(table.sort_values("avg_helpful", ascending=False).head(n)),
+        }
+
+    if endpoint == "/casino_score_comparison":
+        return {"casino": _records(casino_score_comparison(None, stats))}
+
+    hotel = params.get("hotel")
+    if hotel is not None and hotel not in stats["Hotel name"].index:
+        raise LookupError(f"Unknown hotel: {hotel}")
+    hotel, table = traveler_type_scores_for_one_hotel(None, hotel, cube)
+    return {"hotel": str(hotel), "traveler_types": _records(table)}
+
+
+def respond(service, target):
+    """
+    (status, JSON body) for a GET request target.
+    """
+    try:
+        endpoint, params = parse_query(target)
+        status, result = HTTPStatus.OK, answer(service, endpoint, params)
+    except LookupError as e:
+        status, result = HTTPStatus.NOT_FOUND, {"error": str(e.args[0] if e.args else e)}
+    except ValueError as e:
+        status, result = HTTPStatus.BAD_REQUEST, {"error": str(e)}
+    return status, json.dumps(result).encode()
+
+
+def _cache_key(target):
+    # Same endpoint and parameters in any order -> same key
+    try:
+        endpoint, params = parse_query(target)
+    except (LookupError, ValueError):
+        return target
+    return endpoint, tuple(sorted(params.items()))
+
+
+def make_handler(service, workers=None):
+    """
+    asyncio.start_server callback serving GET requests (HTTP/1.1 with
+    keep-alive). Queries run on a pool of worker threads.
+    """
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analytics")
+    inflight = {}
+    responses = OrderedDict()
+
+    def finished(key, future):
+        inflight.pop(key, None)
+        if not future.cancelled() and future.exception() is None and future.result()[0] == HTTPStatus.OK:
+            responses[key] = future.result()
+            while len(responses) > RESPONSE_CACHE_SIZE:
+                responses.popitem(last=False)
+
+    async def query(target):
+        key = _cache_key(target)
+        if key in responses:
+            responses.move_to_end(key)
+            return responses[key]
+
+        future = inflight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(executor, respond, service, target)
+            inflight[key] = future
+            future.add_done_callback(lambda f: finished(key, f))
+        # A client that goes away must not cancel the query for the others
+        return await asyncio.shield(future)
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    break
+                try:
+                    method, target, version = line.decode("latin-1").split()
+                except ValueError:
+                    await _send(writer, HTTPStatus.BAD_REQUEST, b'{"error": "Malformed request line"}', False)
+                    break
+
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip().lower()
+                if headers.get("content-length"):
+                    await reader.readexactly(int(headers["content-length"]))
+
+                connection = headers.get("connection", "")
+                keep_alive = connection == "keep-alive" or (version == "HTTP/1.1" and connection != "close")
+
+                if method != "GET":
+                    status, body = HTTPStatus.METHOD_NOT_ALLOWED, b'{"error": "Only GET is supported"}'
+                else:
+                    try:
+                        status, body = await query(target)
+                    except Exception as e:
+                        status, body = HTTPStatus.INTERNAL_SERVER_ERROR, json.dumps({"error": str(e)}).encode()
+                await _send(writer, status, body, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    handle.executor = executor
+    return handle
+
+
+async def _send(writer, status, body, keep_alive):
+    head = (
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    writer.write(head.encode("latin-1") + body)
+    await writer.drain()
+
+
+async def serve(service, host="127.0.0.1", port=8766, workers=None):
+    """
+    Run the query service until cancelled.
+    """
+    handle = make_handler(service, workers)
+    server = await asyncio.start_server(handle, host, port, backlog=1024)
+    print(f"Analytics service on http://{host}:{port} ({', '.join(ENDPOINTS)})", file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        handle.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Analytics query service (JSON over HTTP)")
+    parser.add_argument("--data", default=DATA_PATH, help="review CSV file, directory or glob pattern")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--workers", type=int, help="worker threads for the queries (default: CPU-based)")
+    args = parser.parse_args(argv)
+
+    service = load_service(args.data)
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,635 @@
+# ============================================================
+# Benchmarks with synthetic review data
+# ============================================================
+# python benchmark.py --sizes 1e3,1e4,1e5 --out benchmarks/results.json
+# Generates reviews with the schema and value distributions of the Las Vegas
+# dataset, then times and memory-profiles every public function of the
+# analytics modules. Results are written as JSON; --compare flags regressions
+# against an earlier results file.
+import os
+import gc
+import sys
+import json
+import time
+import inspect
+import platform
+import tempfile
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import bootstrap
+import cleaning
+import correlation
+import cube
+import performance
+import relationship
+import visualization
+import prediction
+import result_cache
+import review_store
+import sketches
+import taskgraph
+
+BENCHMARK_MODULES = [
+    cleaning, performance, relationship, visualization, prediction, correlation, review_store, cube, sketches,
+    taskgraph, bootstrap,
+]
+
+AMENITY_COLS = ["Pool", "Gym", "Tennis court", "Spa", "Casino", "Free internet"]
+USER_COLS = ["Nr. reviews", "Nr. hotel reviews", "Helpful votes", "Member years"]
+
+
+# ------------------------------------------------------------
+# Synthetic data
+# ------------------------------------------------------------
+def fit_profile(path=cleaning.DATA_PATH):
+    """
+    Learn the distributions the generator samples from: hotel attributes and
+    score distributions, (country, continent) pairs, traveler types, months
+    with their period of stay, weekdays, reviewer activity (jointly) and the
+    share of blank lines and missing values.
+    """
+    raw = pd.read_csv(path, sep=";", dtype=str)
+    n_raw = len(raw)
+    raw = raw.dropna(how="all")
+    df = cleaning.load_and_clean_data(path)
+
+    hotels = df.groupby("Hotel name")
+    hotel_attrs = hotels[["Hotel stars", "Nr. rooms"] + AMENITY_COLS].first()
+    score_probs = (
+        df.groupby("Hotel name")["Score"].value_counts(normalize=True)
+          .unstack(fill_value=0.0)
+          .reindex(columns=[1.0, 2.0, 3.0, 4.0, 5.0], fill_value=0.0)
+    )
+
+    def freqs(s):
+        p = s.value_counts(normalize=True)
+        return list(p.index), p.to_numpy()
+
+    countries = df.groupby(["User country", "User continent"]).size()
+    period_of_month = (
+        df.dropna(subset=["Period of stay"])
+          .groupby("Review month")["Period of stay"]
+          .agg(lambda s: s.mode().iloc[0])
+    )
+
+    return {
+        "hotels": list(hotel_attrs.index),
+        "hotel_weights": (hotels.size() / len(df)).reindex(hotel_attrs.index).to_numpy(),
+        "hotel_attrs": hotel_attrs.to_dict("index"),
+        "score_probs": score_probs.reindex(hotel_attrs.index).to_numpy(),
+        "countries": [list(k) for k in countries.index],
+        "country_weights": (countries / countries.sum()).to_numpy(),
+        "traveler_types": freqs(df["Traveler type"]),
+        "months": freqs(df["Review month"]),
+        "period_of_month": period_of_month.to_dict(),
+        "weekdays": freqs(df["Review weekday"]),
+        "user_activity": df[USER_COLS].to_numpy(dtype=float),
+        "columns": list(pd.read_csv(path, sep=";", nrows=0).columns),
+        "blank_rate": 1 - len(raw) / n_raw,
+        "missing_rates": raw.isna().mean().to_dict(),
+        "status_rate": raw["status"].notna().mean(),
+    }
+
+
+def generate_reviews(n, profile, seed=0, n_hotels=None):
+    """
+    n raw review rows (strings as in the CSV, including blank lines, YES/NO
+    flags and decimal-comma stars). With n_hotels larger than the real
+    hotel count, the extra hotels copy the attributes of the real ones.
+    """
+    rng = np.random.default_rng(seed)
+    base = len(profile["hotels"])
+    n_hotels = n_hotels or base
+
+    weights = np.resize(profile["hotel_weights"], n_hotels)
+    hotel = rng.choice(n_hotels, size=n, p=weights / weights.sum())
+    base_hotel = hotel % base
+
+    names = np.array([
+        profile["hotels"][i % base] + ("" if i < base else f" #{i // base}")
+        for i in range(n_hotels)
+    ], dtype=object)
+
+    # Score from the hotel's own distribution (inverse CDF per row)
+    cdf = np.cumsum(profile["score_probs"], axis=1)
+    score = (rng.random(n)[:, None] > cdf[base_hotel]).sum(axis=1) + 1
+    score = np.minimum(score, 5)
+
+    country_idx = rng.choice(len(profile["countries"]), size=n, p=profile["country_weights"])
+    countries = np.array(profile["countries"], dtype=object)
+
+    months, month_p = profile["months"]
+    month = np.array(months, dtype=object)[rng.choice(len(months), size=n, p=month_p)]
+    period = pd.Series(month).map(profile["period_of_month"]).to_numpy(dtype=object)
+
+    traveler, traveler_p = profile["traveler_types"]
+    weekday, weekday_p = profile["weekdays"]
+    activity = profile["user_activity"][rng.integers(0, len(profile["user_activity"]), size=n)]
+
+    attrs = [profile["hotel_attrs"][profile["hotels"][i]] for i in range(base)]
+
+    def hotel_col(key, fmt):
+        values = np.array([fmt(a[key]) for a in attrs], dtype=object)
+        return values[base_hotel]
+
+    yes_no = lambda v: "YES" if v is True else ("NO" if v is False else "")
+    stars = lambda v: ("%g" % v).replace(".", ",")
+
+    data = {
+        "User country": countries[country_idx, 0],
+        "Nr. reviews": activity[:, 0].astype(int).astype(str),
+        "Nr. hotel reviews": activity[:, 1].astype(int).astype(str),
+        "Helpful votes": activity[:, 2].astype(int).astype(str),
+        "Score": score.astype(str),
+        "Period of stay": period,
+        "Traveler type": np.array(traveler, dtype=object)[rng.choice(len(traveler), size=n, p=traveler_p)],
+        **{c: hotel_col(c, yes_no) for c in ["Pool", "Gym", "Tennis court", "Spa"]},
+        "status": np.where(rng.random(n) < profile["status_rate"], rng.choice(["yes", "no"], size=n), ""),
+        **{c: hotel_col(c, yes_no) for c in ["Casino", "Free internet"]},
+        "Hotel name": names[hotel],
+        "Hotel stars": hotel_col("Hotel stars", stars),
+        "Nr. rooms": hotel_col("Nr. rooms", lambda v: str(int(v))),
+        "User continent": countries[country_idx, 1],
+        "Member years": activity[:, 3].astype(int).astype(str),
+        "Review month": month,
+        "Review weekday": np.array(weekday, dtype=object)[rng.choice(len(weekday), size=n, p=weekday_p)],
+    }
+
+    df = pd.DataFrame({c: data.get(c, "") for c in profile["columns"]})
+
+    # Missing values at the rates of the real file
+    for c, rate in profile["missing_rates"].items():
+        if c in data and c != "status" and 0 < rate < 0.5:
+            df.loc[rng.random(n) < rate, c] = ""
+
+    blank = rng.random(n) < profile["blank_rate"]
+    df.loc[blank, :] = ""
+    return df
+
+
+def write_synthetic_csv(path, n, profile=None, seed=0, n_hotels=None, chunk_rows=1_000_000):
+    """
+    Write n synthetic rows as a ";"-separated CSV in chunks, so even 10^8
+    rows are generated in bounded memory.
+    """
+    profile = profile or fit_profile()
+    written = 0
+    with open(path, "w", newline="") as f:
+        while written < n or written == 0:
+            rows = min(chunk_rows, n - written)
+            chunk = generate_reviews(rows, profile, seed=seed + written, n_hotels=n_hotels)
+            chunk.to_csv(f, sep=";", index=False, header=(written == 0))
+            written += rows
+            if rows == 0:
+                break
+    return path
+
+
+# ------------------------------------------------------------
+# Benchmark registry
+# ------------------------------------------------------------
+def _model_inputs(c):
+    X, y, num, amen = c["model_data"]
+    return {"X": X, "y": y, "num": num, "amen": amen}
+
+
+def _report(c):
+    report = []
+    cleaning.load_and_clean_data(c["path"], report=report)
+    return report
+
+
+def _xy_chunks(c):
+    X, y = c["X"], c["y"]
+    return ((X.iloc[i], y.iloc[i]) for i in np.array_split(np.arange(len(X)), 10))
+
+
+# Inputs shared by the benchmarks of one data size, built from the context
+# the first time a benchmark asks for them
+CONTEXT_INPUTS = {
+    "df": lambda c: cleaning.load_and_clean_data(c["path"]),
+    "typed": lambda c: cleaning.load_and_clean_data(c["path"], chunksize=100_000),
+    "agg": lambda c: performance.build_hotel_aggregates(c["typed"]),
+    "dim": lambda c: performance.dimension_stats(c["typed"], "User continent"),
+    "report": _report,
+    "chunk_list": lambda c: list(cleaning.iter_clean_chunks(c["path"], chunksize=100_000)),
+    "corr": lambda c: relationship.numeric_corr(c["typed"]),
+    "moments": lambda c: correlation.corr_moments(c["typed"]),
+    "store": lambda c: review_store.build_review_store(c["df"]),
+    "cube": lambda c: cube.build_cube(c["typed"]),
+    "cube_rollups": lambda c: cube.build_cube_rollups(c["typed"]),
+    "sketches": lambda c: sketches.build_review_sketches(c["typed"]),
+    "model_data": lambda c: prediction.prepare_model_data(c["typed"]),
+    **{k: (lambda c, k=k: _model_inputs(c)[k]) for k in ["X", "y", "num", "amen"]},
+    "split": lambda c: prediction.split_data(c["X"], c["y"]),
+    "model": lambda c: prediction.fit_linear_regression(c["split"][0], c["split"][2], c["num"]),
+    "y_pred": lambda c: prediction.evaluate_model(*c["model"], c["split"][1], c["split"][3], c["num"])[2],
+}
+
+# Streamed inputs: a fresh generator on every access, never stored
+CONTEXT_STREAMS = {
+    "chunks": lambda c: cleaning.iter_clean_chunks(c["path"], chunksize=100_000),
+    "xy_chunks": _xy_chunks,
+}
+
+
+class _Context(dict):
+    # Builds CONTEXT_INPUTS on first access and remembers which inputs the
+    # current benchmark used, so release() can drop the others
+    def __init__(self, **fixed):
+        super().__init__(fixed)
+        self.fixed = set(fixed)
+        self.used = set()
+        self.builds = 0
+
+    def __getitem__(self, key):
+        self.used.add(key)
+        if key in CONTEXT_STREAMS:
+            return CONTEXT_STREAMS[key](self)
+        if key not in self:
+            self[key] = CONTEXT_INPUTS[key](self)
+            self.builds += 1
+        return dict.__getitem__(self, key)
+
+    def release(self):
+        for key in [k for k in self if k not in self.fixed | self.used]:
+            del self[key]
+        self.used = set()
+        gc.collect()
+
+
+def _prepare_context(path, workdir):
+    """
+    Lazy inputs for the benchmarks of one data size. Only the inputs of the
+    benchmark being run (and those kept from the one before it) are held;
+    chunked inputs are streamed.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+
+    return _Context(path=path, workdir=workdir, cache_dir=os.path.join(workdir, "cache"))
+
+
+def _consume(iterator):
+    return sum(1 for _ in iterator)
+
+
+# Function name -> call with the shared context. Public functions without an
+# entry are listed as "skipped" in the results, so new ones get noticed.
+def _graph(ctx):
+    # Small analytics graph: hotel aggregates shared by three rankings
+    agg = taskgraph.Ref("agg")
+    return {
+        "agg": taskgraph.task(performance.build_hotel_aggregates, ctx["typed"]),
+        "top5_hotels": taskgraph.task(performance.top5_hotels, ctx["typed"], agg),
+        "top10_hotels_europe": taskgraph.task(performance.top10_hotels_europe, ctx["typed"], agg),
+        "bottom5_hotels_all_amenities": taskgraph.task(performance.bottom5_hotels_all_amenities, ctx["typed"], agg),
+    }
+
+
+BENCHMARKS = {
+    # cleaning
+    "load_and_clean_data": lambda c: cleaning.load_and_clean_data(c["path"]),
+    "load_and_clean_data[chunked]": lambda c: cleaning.load_and_clean_data(c["path"], chunksize=100_000),
+    "iter_clean_chunks": lambda c: _consume(cleaning.iter_clean_chunks(c["path"], chunksize=100_000)),
+    "concat_clean_chunks": lambda c: cleaning.concat_clean_chunks(c["chunk_list"]),
+    "load_cached_clean_data": lambda c: cleaning.load_cached_clean_data(c["path"], c["cache_dir"]),
+    "cache_name": lambda c: cleaning.cache_name(c["path"]),
+    "source_unchanged": lambda c: cleaning.source_unchanged(
+        c["path"], os.path.join(c["workdir"], "source.json"), cleaning.CLEANING_VERSION),
+    "write_source_meta": lambda c: cleaning.write_source_meta(
+        c["path"], os.path.join(c["workdir"], "source.json"), cleaning.CLEANING_VERSION),
+    "cleaning_report": lambda c: cleaning.cleaning_report(c["report"]),
+    "source_files": lambda c: cleaning.source_files(c["path"]),
+    "city_from_path": lambda c: cleaning.city_from_path(c["path"]),
+    "load_sources": lambda c: cleaning.load_sources(c["path"], cache_dir=c["cache_dir"]),
+    # performance
+    "amenity_bits": lambda c: performance.amenity_bits("Gym", "Spa"),
+    "build_hotel_aggregates": lambda c: performance.build_hotel_aggregates(c["typed"]),
+    "merge_hotel_aggregates": lambda c: performance.merge_hotel_aggregates(c["agg"], c["agg"]),
+    "build_amenity_index": lambda c: performance.build_amenity_index(c["agg"]["detail"]),
+    "query_amenities": lambda c: performance.query_amenities(c["agg"], ["Pool", "Spa"], ["Casino"]),
+    "dimension_stats": lambda c: performance.dimension_stats(c["typed"], "User continent"),
+    "merge_dimension_stats": lambda c: performance.merge_dimension_stats(c["dim"], c["dim"]),
+    "top_counts": lambda c: performance.top_counts(c["dim"], 3),
+    "partition_by": lambda c: performance.partition_by(performance.top5_hotels, c["typed"], col="Traveler type"),
+    "top_k_per_group": lambda c: performance.top_k_per_group(c["typed"], "Hotel name", "User country", 10, 3),
+    "top5_hotels": lambda c: performance.top5_hotels(c["typed"]),
+    "top10_hotels_europe": lambda c: performance.top10_hotels_europe(c["typed"]),
+    "top10_hotels_europe[cube]": lambda c: performance.top10_hotels_europe(None, cube=c["cube"]),
+    "bottom5_hotels_all_amenities": lambda c: performance.bottom5_hotels_all_amenities(c["typed"]),
+    "top5_hotels_bootstrap": lambda c: performance.top5_hotels_bootstrap(c["typed"]),
+    "bottom5_hotels_all_amenities_bootstrap": lambda c: performance.bottom5_hotels_all_amenities_bootstrap(c["typed"]),
+    "top10_hotels_review_volume_with_countries":
+        lambda c: performance.top10_hotels_review_volume_with_countries(c["typed"]),
+    "continent_summary": lambda c: performance.continent_summary(c["typed"]),
+    "no_free_internet_summary": lambda c: performance.no_free_internet_summary(c["typed"]),
+    "top5_hotels_by_rooms_meeting_conditions":
+        lambda c: performance.top5_hotels_by_rooms_meeting_conditions(c["typed"]),
+    "most_frequent_fields": lambda c: performance.most_frequent_fields(c["typed"]),
+    # relationship
+    "member_years_vs_helpful_votes_spec": lambda c: relationship.member_years_vs_helpful_votes_spec(c["typed"]),
+    "plot_member_years_vs_helpful_votes": lambda c: relationship.plot_member_years_vs_helpful_votes(c["typed"]),
+    "casino_key": lambda c: relationship.casino_key(c["typed"]),
+    "casino_score_comparison": lambda c: relationship.casino_score_comparison(c["typed"]),
+    "traveler_type_scores_for_one_hotel": lambda c: relationship.traveler_type_scores_for_one_hotel(c["typed"]),
+    "numeric_corr": lambda c: relationship.numeric_corr(c["typed"]),
+    "numeric_corr_heatmap_spec": lambda c: relationship.numeric_corr_heatmap_spec(c["corr"]),
+    "plot_numeric_corr_heatmap": lambda c: relationship.plot_numeric_corr_heatmap(c["typed"]),
+    # visualization
+    "score_histogram_spec": lambda c: visualization.score_histogram_spec(c["typed"]),
+    "plot_score_histogram": lambda c: visualization.plot_score_histogram(c["typed"]),
+    "score_by_traveler_type_spec": lambda c: visualization.score_by_traveler_type_spec(c["typed"]),
+    "plot_score_by_traveler_type": lambda c: visualization.plot_score_by_traveler_type(c["typed"]),
+    "rooms_by_stars_spec": lambda c: visualization.rooms_by_stars_spec(c["typed"]),
+    "plot_rooms_by_stars": lambda c: visualization.plot_rooms_by_stars(c["typed"]),
+    # correlation
+    "corr_moments": lambda c: correlation.corr_moments(c["typed"]),
+    "merge_corr_moments": lambda c: correlation.merge_corr_moments(c["moments"], c["moments"]),
+    "corr_from_moments": lambda c: correlation.corr_from_moments(c["moments"]),
+    "pearson_corr": lambda c: correlation.pearson_corr(c["typed"]),
+    "spearman_corr": lambda c: correlation.spearman_corr(c["typed"]),
+    "bootstrap_corr_ci": lambda c: correlation.bootstrap_corr_ci(c["typed"], n_boot=100, n_jobs=1),
+    # review_store
+    "encode_keys": lambda c: review_store.encode_keys(c["df"]["Hotel name"]),
+    "bincount_stats": lambda c: review_store.bincount_stats(
+        c["store"]["codes"]["Hotel name"].astype(np.int64), len(c["store"]["categories"]["Hotel name"]),
+        c["store"]["values"]["Score"].astype(float), c["store"]["values"]["Helpful votes"].astype(float),
+        np.arange(c["store"]["n"])),
+    "stats_table": lambda c: review_store.stats_table(
+        review_store.bincount_stats(np.zeros(3, dtype=np.int64), 1, np.ones(3), np.ones(3), np.arange(3)),
+        pd.Index(["a"])),
+    "build_review_store": lambda c: review_store.build_review_store(c["df"]),
+    "store_nbytes": lambda c: review_store.store_nbytes(c["store"]),
+    "store_frame": lambda c: review_store.store_frame(c["store"]),
+    "store_dimension_stats": lambda c: review_store.store_dimension_stats(c["store"], "Hotel name"),
+    "store_group_mean": lambda c: review_store.store_group_mean(c["store"], "Traveler type", "Score"),
+    "store_amenity_mask": lambda c: review_store.store_amenity_mask(c["store"], ["Pool", "Spa"], ["Casino"]),
+    # cube
+    "build_cube": lambda c: cube.build_cube(c["typed"]),
+    "merge_cubes": lambda c: cube.merge_cubes(c["cube"], c["cube"]),
+    "dice_cube": lambda c: cube.dice_cube(c["cube"], {"User continent": "Europe", "Period of stay": "Jun-Aug"}),
+    "slice_cube": lambda c: cube.slice_cube(c["cube"], "Traveler type", "Couples"),
+    "rollup": lambda c: cube.rollup(c["cube"], ["User continent", "Traveler type"]),
+    "build_cube_rollups": lambda c: cube.build_cube_rollups(c["typed"]),
+    "dice_rollups": lambda c: cube.dice_rollups(c["cube_rollups"], {"User continent": "Europe"}),
+    "cube_review_stats": lambda c: cube.cube_review_stats(c["cube"], c["cube_rollups"]),
+    "load_cube": lambda c: cube.load_cube(c["path"], c["cache_dir"]),
+    # taskgraph
+    "task": lambda c: taskgraph.task(performance.top5_hotels, c["typed"], c["agg"]),
+    "select_steps": lambda c: taskgraph.select_steps(_graph(c), ["top5_hotels"]),
+    "graph_order": lambda c: taskgraph.graph_order(_graph(c)),
+    "graph_keys": lambda c: taskgraph.graph_keys(_graph(c)),
+    "run_graph": lambda c: taskgraph.run_graph(_graph(c)),
+    # bootstrap
+    "score_sum_distributions": lambda c: bootstrap.score_sum_distributions(c["typed"]),
+    "ranking_bootstrap": lambda c: bootstrap.ranking_bootstrap(c["typed"], largest=False),
+    # sketches
+    "frequent_items": lambda c: sketches.frequent_items(c["typed"]["User country"]),
+    "merge_frequent_items": lambda c: sketches.merge_frequent_items(
+        c["sketches"]["items"]["User country"], c["sketches"]["items"]["User country"]),
+    "top_items": lambda c: sketches.top_items(c["sketches"]["items"]["User country"], 10),
+    "count_min": lambda c: sketches.count_min(c["typed"]["User country"]),
+    "merge_count_min": lambda c: sketches.merge_count_min(c["sketches"]["pairs"], c["sketches"]["pairs"]),
+    "count_min_estimate": lambda c: sketches.count_min_estimate(c["sketches"]["pairs"], ["a", "b", "c"]),
+    "quantile_sketch": lambda c: sketches.quantile_sketch(c["typed"]["Score"]),
+    "merge_quantile_sketches": lambda c: sketches.merge_quantile_sketches(*c["sketches"]["score"].values()),
+    "sketch_quantile": lambda c: sketches.sketch_quantile(next(iter(c["sketches"]["score"].values())), 0.5),
+    "hyperloglog": lambda c: sketches.hyperloglog(c["typed"]["User country"]),
+    "merge_hyperloglogs": lambda c: sketches.merge_hyperloglogs(*c["sketches"]["distinct_countries"].values()),
+    "distinct_count": lambda c: sketches.distinct_count(next(iter(c["sketches"]["distinct_countries"].values()))),
+    "build_review_sketches": lambda c: sketches.build_review_sketches(c["typed"]),
+    "merge_review_sketches": lambda c: sketches.merge_review_sketches(c["sketches"], c["sketches"]),
+    "sketch_reviews": lambda c: sketches.sketch_reviews(c["path"]),
+    "approx_top_values": lambda c: sketches.approx_top_values(c["sketches"], "User country"),
+    "approx_hotel_review_volume_with_countries":
+        lambda c: sketches.approx_hotel_review_volume_with_countries(c["sketches"]),
+    "approx_pair_counts": lambda c: sketches.approx_pair_counts(c["sketches"], "Bellagio Las Vegas", ["USA", "UK"]),
+    "approx_score_quantiles": lambda c: sketches.approx_score_quantiles(c["sketches"]),
+    "approx_distinct_countries": lambda c: sketches.approx_distinct_countries(c["sketches"]),
+    # prediction
+    "prepare_model_data": lambda c: prediction.prepare_model_data(c["typed"]),
+    "split_data": lambda c: prediction.split_data(c["X"], c["y"]),
+    "fit_linear_regression": lambda c: prediction.fit_linear_regression(c["split"][0], c["split"][2], c["num"]),
+    "evaluate_model":
+        lambda c: prediction.evaluate_model(*c["model"], c["split"][1], c["split"][3], c["num"]),
+    "model_data_chunks": lambda c: _consume(prediction.model_data_chunks(c["chunks"])),
+    "stream_split": lambda c: _consume(prediction.stream_split(c["xy_chunks"])),
+    "accumulate_moments": lambda c: prediction.accumulate_moments(c["xy_chunks"]),
+    "fit_linear_regression_streaming":
+        lambda c: prediction.fit_linear_regression_streaming(c["xy_chunks"], c["num"]),
+    "evaluate_model_streaming":
+        lambda c: prediction.evaluate_model_streaming(*c["model"], c["xy_chunks"], c["num"]),
+    "model_candidates": lambda c: prediction.model_candidates(),
+    "cross_validate_models": lambda c: prediction.cross_validate_models(
+        c["X"], c["y"], c["num"], prediction.model_candidates(alphas=(1.0,), interactions=(False,)), n_jobs=1
+    ),
+    "coefficients_table": lambda c: prediction.coefficients_table(c["model"][0], list(c["X"].columns)),
+    "actual_vs_predicted_spec": lambda c: prediction.actual_vs_predicted_spec(c["split"][3], c["y_pred"]),
+    "plot_actual_vs_predicted": lambda c: prediction.plot_actual_vs_predicted(c["split"][3], c["y_pred"]),
+}
+
+
+def public_functions():
+    """
+    (module name, function name) of every public function defined in the
+    benchmarked modules.
+    """
+    found = []
+    for module in BENCHMARK_MODULES:
+        for name, func in inspect.getmembers(module, inspect.isfunction):
+            if func.__module__ == module.__name__ and not name.startswith("_"):
+                found.append((module.__name__, name))
+    return found
+
+
+def _measure(func, ctx, repeat, memory):
+    import matplotlib.pyplot as plt
+
+    times = []
+    while len(times) < repeat:
+        gc.collect()
+        builds = ctx.builds
+        start = time.perf_counter()
+        func(ctx)
+        seconds = time.perf_counter() - start
+        plt.close("all")
+        # A run that had to build inputs first is not timed
+        if ctx.builds == builds:
+            times.append(seconds)
+
+    peak = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        func(ctx)
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+        plt.close("all")
+
+    return min(times), peak
+
+
+def run_benchmarks(sizes, select=None, repeat=1, memory=True, seed=0, n_hotels=None, workdir=None):
+    """
+    Run the registered benchmarks for every data size. Returns one record
+    per (function, size): best time in seconds and peak traced memory in MiB.
+    """
+    # Every call must compute, not return a cached result
+    result_cache.configure(enabled=False)
+
+    profile = fit_profile()
+    funcs = public_functions()
+    module_of = {name: mod for mod, name in funcs}
+
+    names = [n for n in BENCHMARKS if select is None or any(s in n for s in select)]
+    results = []
+
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        for n in sizes:
+            path = write_synthetic_csv(os.path.join(tmp, f"reviews_{n}.csv"), n, profile, seed, n_hotels)
+            ctx = _prepare_context(path, tmp)
+
+            for name in names:
+                base_name = name.split("[")[0]
+                record = {"module": module_of.get(base_name), "function": name, "rows": n}
+                try:
+                    seconds, peak = _measure(BENCHMARKS[name], ctx, repeat, memory)
+                    record.update(seconds=round(seconds, 6), peak_mib=None if peak is None else round(peak, 3))
+                except Exception as e:
+                    record["error"] = f"{type(e).__name__}: {e}"
+                results.append(record)
+                ctx.release()
+                print(f"{n:>10} {name:<45} {record.get('seconds', record.get('error'))}", file=sys.stderr)
+
+            del ctx
+            os.remove(path)
+
+    skipped = sorted(f"{m}.{n}" for m, n in funcs if n not in BENCHMARKS)
+    return results, skipped
+
+
+def _git_revision():
+    import subprocess
+
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# main.py must reach the menu without importing pandas, matplotlib or sklearn
+STARTUP_BUDGET = 0.25
+
+
+def startup_time(module="main", runs=5):
+    """
+    Import time of module in a fresh interpreter (python -X importtime),
+    median over runs, with the slowest imports of the last run and whether
+    the heavy libraries were pulled in.
+    """
+    import subprocess
+
+    totals = []
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        imports = []
+        for line in proc.stderr.splitlines():
+            if line.startswith("import time:") and "|" in line and "cumulative" not in line:
+                _, cumulative, name = line.split("|")
+                imports.append((name.strip(), int(cumulative) / 1e6))
+        totals.append(dict(imports)[module])
+
+    nested = [(name, sec) for name, sec in imports if name != module]
+    return {
+        "module": module,
+        "seconds": float(np.median(totals)),
+        "slowest": sorted(nested, key=lambda t: -t[1])[:5],
+        "heavy_imports": sorted({n.split(".")[0] for n, _ in imports} & {"pandas", "matplotlib", "sklearn"}),
+    }
+
+
+def compare_results(old, new, threshold=1.25):
+    """
+    Benchmarks of new that got slower than threshold x the old time (same
+    function and size). Returns a table sorted by slowdown.
+    """
+    key = ["function", "rows"]
+    a = pd.DataFrame(old["results"]).dropna(subset=["seconds"]).set_index(key)["seconds"]
+    b = pd.DataFrame(new["results"]).dropna(subset=["seconds"]).set_index(key)["seconds"]
+    both = pd.concat({"old_seconds": a, "new_seconds": b}, axis=1, join="inner")
+    both["ratio"] = both["new_seconds"] / both["old_seconds"]
+    return both[both["ratio"] > threshold].sort_values("ratio", ascending=False).reset_index()
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the analytics functions on synthetic reviews")
+    parser.add_argument("--sizes", default="1e3,1e4,1e5",
+                        help="comma-separated row counts (10^3 to 10^8; the in-memory benchmarks "
+                             "hold the cleaned frame, about 70 bytes per row)")
+    parser.add_argument("--out", default="benchmarks/results.json", help="JSON results file")
+    parser.add_argument("--select", help="comma-separated substrings of function names to run")
+    parser.add_argument("--repeat", type=int, default=1, help="timed runs per function (best is kept)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    parser.add_argument("--hotels", type=int, help="number of hotels (default: as in the real data)")
+    parser.add_argument("--compare", metavar="OLD_JSON", help="report slowdowns against an earlier results file")
+    parser.add_argument("--startup", action="store_true",
+                        help="only check the import time of main.py against --startup-budget")
+    parser.add_argument("--startup-budget", type=float, default=STARTUP_BUDGET, help="seconds (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        startup = startup_time()
+        print(f"main.py startup: {startup['seconds']:.3f}s (budget {args.startup_budget:.3f}s)")
+        for name, seconds in startup["slowest"]:
+            print(f"  {seconds:.3f}s {name}")
+        if startup["heavy_imports"]:
+            print("  imported at startup: " + ", ".join(startup["heavy_imports"]))
+        return 0 if startup["seconds"] <= args.startup_budget and not startup["heavy_imports"] else 1
+
+    sizes = [int(float(s)) for s in args.sizes.split(",")]
+    select = args.select.split(",") if args.select else None
+
+    results, skipped = run_benchmarks(sizes, select, args.repeat, not args.no_memory, n_hotels=args.hotels)
+    output = {
+        "revision": _git_revision(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "sizes": sizes,
+        "startup": startup_time(),
+        "results": results,
+        "skipped": skipped,
+    }
+
+    if os.path.dirname(args.out):
+        os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"Wrote {len(results)} results to {args.out}", file=sys.stderr)
+    if skipped:
+        print("Not benchmarked: " + ", ".join(skipped), file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            slower = compare_results(json.load(f), output)
+        print(slower.to_string(index=False) if len(slower) else "No regressions.")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+# ============================================================
+# Bootstrap intervals and rank stability of hotel rankings
+# ============================================================
+# Resampling a hotel's n reviews with replacement gives its scores
+# multinomial weights, and the resampled mean depends only on the weighted
+# sum. For scores on a lattice (whole stars, or multiples of a resolution)
+# the exact distribution of that sum is the hotel's score distribution
+# convolved n times, so one resample of a hotel is one uniform draw looked
+# up in the sum's CDF instead of n draws. Resamples run in chunks (bounded
+# memory), in parallel with independent seeds; every chunk returns the
+# histograms of the resampled sums and the top-k counts, which add up.
+import numpy as np
+import pandas as pd
+
+
+def _trim(pmf, offset, tol=1e-12):
+    # Drop tails too unlikely to ever be drawn (and FFT round-off there)
+    keep = np.flatnonzero(pmf > tol * pmf.max())
+    return pmf[keep[0]:keep[-1] + 1], offset + keep[0]
+
+
+def _power(pmf, n):
+    # Distribution of the sum of n independent draws, pmf convolved n times
+    # (one FFT), as (pmf, offset of its first entry)
+    pmf, shift = _trim(pmf, 0)
+    size = int(n) * (len(pmf) - 1) + 1
+    padded = 1 << (size - 1).bit_length()
+    out = np.fft.irfft(np.fft.rfft(pmf, padded) ** n, padded)[:size]
+    out, offset = _trim(np.clip(out, 0, None), n * shift)
+    return out / out.sum(), offset
+
+
+def score_sum_distributions(df, group_col="Hotel name", value_col="Score", groups=None, resolution=None):
+    """
+    Exact distribution of the bootstrap sum of value_col per group (only
+    the given groups, if any). Scores are read as multiples of resolution;
+    without one they must be whole numbers. The CDFs are stored back to
+    back, group g shifted by g, so one searchsorted serves all groups.
+    """
+    data = df[[group_col, value_col]].dropna()
+    if groups is not None:
+        data = data[data[group_col].isin(groups)]
+
+    values = data[value_col].to_numpy(dtype=float)
+    step = resolution or 1.0
+    lattice = np.round(values / step)
+    if resolution is None and not np.array_equal(lattice, values):
+        raise ValueError(f"{value_col} has fractional values; pass a resolution")
+
+    codes, names = pd.factorize(data[group_col], sort=True)
+    lattice = lattice.astype(np.int64)
+    low = lattice.min() if len(lattice) else 0
+    width = (lattice.max() - low + 1) if len(lattice) else 1
+    counts = np.bincount(codes * width + (lattice - low), minlength=len(names) * width)
+    counts = counts.reshape(len(names), width).astype(float)
+    n = counts.sum(axis=1).astype(np.int64)
+
+    cdfs, base = [], []
+    for g, row in enumerate(counts):
+        pmf, offset = _power(row / n[g], n[g])
+        cdf = np.cumsum(pmf)
+        cdf = cdf / cdf[-1] + g
+        cdf[-1] = g + 1
+        cdfs.append(cdf)
+        base.append(n[g] * low + offset)
+
+    lengths = np.array([len(c) for c in cdfs], dtype=np.int64)
+    return {
+        "groups": pd.Index(names, name=group_col),
+        "n": n,
+        "base": np.array(base, dtype=np.int64),
+        "step": step,
+        "mean": (counts @ (low + np.arange(width))) * step / np.maximum(n, 1),
+        "cdf": np.concatenate(cdfs) if cdfs else np.zeros(0),
+        "start": np.cumsum(lengths) - lengths,
+    }
+
+
+def _means(dist, pos):
+    # Mean of every resampled sum from its position in the stored CDFs
+    return (dist["base"] + (pos - dist["start"])) * dist["step"] / dist["n"]
+
+
+def _top_k_counts(means, reviews, k, largest):
+    # Times each group ranks in the top k of a resample: by mean, ties by
+    # more reviews, then by group order (as the ranking tables sort)
+    order = np.argsort(-reviews, kind="stable")
+    m = means[:, order] if largest else -means[:, order]
+    k = min(k, m.shape[1])
+    threshold = np.partition(m, m.shape[1] - k, axis=1)[:, [m.shape[1] - k]]
+    above, tied = m > threshold, m == threshold
+    slots = k - above.sum(axis=1, keepdims=True)
+    chosen = above | (tied & (np.cumsum(tied, axis=1) <= slots))
+
+    counts = np.empty(m.shape[1], dtype=np.int64)
+    counts[order] = chosen.sum(axis=0)
+    return counts
+
+
+def _bootstrap_chunk(dist, n_boot, k, largest, seed):
+    # Draws are laid out group by group, so each search stays in one CDF
+    rng = np.random.default_rng(seed)
+    u = rng.random((len(dist["n"]), n_boot)) + np.arange(len(dist["n"]))[:, None]
+    pos = np.searchsorted(dist["cdf"], u, side="right")
+    hist = np.bincount(pos.ravel(), minlength=len(dist["cdf"]))
+    pos = np.ascontiguousarray(pos.T)
+    return hist, _top_k_counts(_means(dist, pos), dist["n"], k, largest)
+
+
+def _percentiles(dist, hist, n_boot, q):
+    # Linear-interpolated percentile (as np.percentile) of every group's
+    # resampled means, read from the summed histograms
+    cum = np.cumsum(hist)
+    offset = np.arange(len(dist["n"])) * n_boot
+
+    def at(rank):
+        return _means(dist, np.searchsorted(cum, offset + rank, side="right"))
+
+    p = q * (n_boot - 1)
+    lo, hi = np.floor(p), np.ceil(p)
+    return at(lo) + (at(hi) - at(lo)) * (p - lo)
+
+
+def ranking_bootstrap(df, k=5, largest=True, groups=None, group_col="Hotel name", value_col="Score",
+                      n_boot=10_000, alpha=0.05, random_state=0, n_jobs=-1, chunk_size=None,
+                      resolution=None):
+    """
+    Percentile bootstrap CI of every group's mean value_col and the share of
+    resamples in which it ranks in the top k (largest=False: the bottom k,
+    as bottom5_hotels_all_amenities ranks). Chunks of chunk_size resamples
+    (default: about 2 million group draws each) run in parallel (joblib,
+    n_jobs) with independent seeds, so results do not depend on n_jobs.
+    Returns one row per group in ranking order.
+    """
+    from joblib import Parallel, delayed
+
+    dist = score_sum_distributions(df, group_col, value_col, groups, resolution)
+    n_groups = len(dist["n"])
+    if not n_groups:
+        raise ValueError(f"No {value_col} values to resample")
+    chunk_size = chunk_size or max(1, 2_000_000 // max(n_groups, 1))
+
+    sizes = [min(chunk_size, n_boot - i) for i in range(0, n_boot, chunk_size)]
+    seeds = np.random.SeedSequence(random_state).spawn(len(sizes))
+    parts = Parallel(n_jobs=n_jobs)(
+        delayed(_bootstrap_chunk)(dist, size, k, largest, seed) for size, seed in zip(sizes, seeds)
+    )
+    hist = sum(p[0] for p in parts)
+    top = sum(p[1] for p in parts)
+
+    result = pd.DataFrame({
+        group_col: dist["groups"],
+        "avg_score": dist["mean"],
+        "reviews": dist["n"],
+        "ci_lower": _percentiles(dist, hist, n_boot, alpha / 2),
+        "ci_upper": _percentiles(dist, hist, n_boot, 1 - alpha / 2),
+        "p_top_k": top / n_boot,
+    })
+    return (
+        result.sort_values(["avg_score", "reviews"], ascending=[not largest, False])
+              .reset_index(drop=True)
+    )
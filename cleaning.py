@@ -1,69 +1,422 @@
 # ============================================================
 # Load and Clean the dataset
 # ============================================================
-def load_and_clean_data():
+from instrumentation import instrumented
+
+DATA_PATH = "data/LasVegasTripAdvisorReviews-Dataset.csv"
+CACHE_DIR = "data/cache"
+
+# Bump whenever a cleaning rule changes so cached frames get rebuilt
+CLEANING_VERSION = 1
+
+# Column types of the cleaned frame in streaming mode (declared up front so
+# every chunk comes out with the same compact schema)
+CLEAN_DTYPES = {
+    "User country": "category",
+    "Nr. reviews": "Int32",
+    "Nr. hotel reviews": "Int32",
+    "Helpful votes": "Int32",
+    "Score": "float64",
+    "Period of stay": "category",
+    "Traveler type": "category",
+    "Pool": "boolean",
+    "Gym": "boolean",
+    "Tennis court": "boolean",
+    "Spa": "boolean",
+    "Casino": "boolean",
+    "Free internet": "boolean",
+    "Hotel name": "category",
+    "Hotel stars": "float64",
+    "Nr. rooms": "Int32",
+    "User continent": "category",
+    "Member years": "Int16",
+    "Review month": "category",
+    "Review weekday": "category",
+}
+
+
+# Cleaning rule per raw column (columns not listed are treated as "text"):
+# - text: strip whitespace, empty string -> NaN
+# - yes_no: YES/NO (any case) -> True/False, anything else -> NaN
+# - numeric: numeric coercion, invalid -> NaN
+# - decimal_comma: like numeric, but '4,5' -> 4.5 (European decimal comma)
+# - drop: column is removed ("status" has too few entries)
+CLEANING_SCHEMA = {
+    "User country": "text",
+    "Nr. reviews": "numeric",
+    "Nr. hotel reviews": "numeric",
+    "Helpful votes": "numeric",
+    "Score": "numeric",
+    "Period of stay": "text",
+    "Traveler type": "text",
+    "Pool": "yes_no",
+    "Gym": "yes_no",
+    "Tennis court": "yes_no",
+    "Spa": "yes_no",
+    "status": "drop",
+    "Casino": "yes_no",
+    "Free internet": "yes_no",
+    "Hotel name": "text",
+    "Hotel stars": "decimal_comma",
+    "Nr. rooms": "numeric",
+    "User continent": "text",
+    "Member years": "numeric",
+    "Review month": "text",
+    "Review weekday": "text",
+}
+
+# Step name used in the cleaning report for each rule
+RULE_STEPS = {
+    "text": "strip_empty_to_nan",
+    "yes_no": "yes_no_to_bool",
+    "numeric": "numeric_coercion",
+    "decimal_comma": "decimal_comma_to_numeric",
+}
+
+@instrumented
+def load_and_clean_data(path=DATA_PATH, chunksize=None, report=None):
     """
     Load and clean the Las Vegas TripAdvisor dataset inclduing the necessary libraries.
+    With chunksize set, the file is read and cleaned chunk by chunk and the
+    typed chunks (see CLEAN_DTYPES) are appended into one frame.
+    Pass a list as report to collect per-step timings (see cleaning_report).
     """
     import pandas as pd
+
+    if chunksize is not None:
+        return concat_clean_chunks(iter_clean_chunks(path, chunksize=chunksize, report=report))
+
+    df = pd.read_csv(path, sep=";")
+
+    return _clean_frame(df, report)
+
+
+def iter_clean_chunks(path=DATA_PATH, chunksize=100_000, report=None):
+    """
+    Stream the dataset in chunks of `chunksize` raw rows and yield each chunk
+    already cleaned and cast to CLEAN_DTYPES. Peak memory depends on the chunk
+    size only, not on the file size.
+    """
+    import pandas as pd
+
+    header = pd.read_csv(path, sep=";", nrows=0).columns
+    # Headerless columns (";;" in the file) are always empty
+    usecols = [c for c in header if not c.startswith("Unnamed:")]
+
+    reader = pd.read_csv(path, sep=";", usecols=usecols, dtype=str, chunksize=chunksize)
+    for chunk in reader:
+        chunk = _clean_frame(chunk, report)
+
+        # A column can be empty within one chunk only, keep the schema fixed
+        chunk = chunk.reindex(columns=list(CLEAN_DTYPES))
+
+        # Counts that are not whole numbers are invalid in the integer columns
+        for c, t in CLEAN_DTYPES.items():
+            if t.startswith("Int"):
+                chunk[c] = chunk[c].where(chunk[c] % 1 == 0)
+
+        yield chunk.astype(CLEAN_DTYPES)
+
+
+def concat_clean_chunks(chunks):
+    """
+    Append typed chunks from iter_clean_chunks into one frame, merging the
+    categories of each categorical column so they stay categorical. Chunks
+    are split into their columns as they arrive and the frame is assembled
+    one column at a time, so peak memory is about the final frame plus one
+    column (not the chunks and their concatenation side by side).
+    """
+    import numpy as np
+    import pandas as pd
+
+    parts, indexes = {}, []
+    for chunk in chunks:
+        for c in chunk.columns:
+            parts.setdefault(c, []).append(chunk[c].array)
+        indexes.append(chunk.index)
+        del chunk
+    if not indexes:
+        return pd.DataFrame({c: pd.Series(dtype=t) for c, t in CLEAN_DTYPES.items()})
+
+    columns = {}
+    for c in list(parts):
+        arrays = parts.pop(c)
+        if isinstance(arrays[0].dtype, pd.CategoricalDtype):
+            cats = pd.Index(pd.unique(pd.concat([pd.Series(a.categories) for a in arrays]))).sort_values()
+            codes = np.concatenate([a.set_categories(cats).codes for a in arrays])
+            columns[c] = pd.Categorical.from_codes(codes, dtype=pd.CategoricalDtype(cats))
+        else:
+            columns[c] = pd.concat([pd.Series(a, copy=False) for a in arrays], ignore_index=True).array
+        del arrays
+
+    return pd.DataFrame(columns, index=indexes[0].append(indexes[1:]), copy=False)
+
+
+@instrumented
+def load_cached_clean_data(path=DATA_PATH, cache_dir=CACHE_DIR, chunksize=100_000):
+    """
+    Load the typed cleaned frame from a columnar (Arrow/Feather) cache in
+    cache_dir. The cache is rebuilt from the CSV when the file's size, mtime
+    and content hash or CLEANING_VERSION no longer match. Without pyarrow the
+    data is simply loaded and cleaned in streaming mode.
+    """
+    import os
+
+    try:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+    except ImportError:
+        return load_and_clean_data(path, chunksize=chunksize)
+
+    name = cache_name(path)
+    table_path = os.path.join(cache_dir, name + ".arrow")
+    meta_path = os.path.join(cache_dir, name + ".json")
+
+    if os.path.exists(table_path) and source_unchanged(path, meta_path, CLEANING_VERSION):
+        return feather.read_table(table_path, memory_map=True).to_pandas()
+
+    df = load_and_clean_data(path, chunksize=chunksize)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = table_path + ".tmp"
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    feather.write_feather(table, tmp_path, compression="uncompressed")
+    os.replace(tmp_path, table_path)
+
+    write_source_meta(path, meta_path, CLEANING_VERSION)
+    return df
+
+
+def cache_name(path):
+    """
+    Base name of the cache files of a review file: its stem and a hash of its
+    full path, so files with the same name in different folders do not share
+    (and overwrite) one cache.
+    """
+    import os
+    import hashlib
+
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return f"{stem}-{hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:12]}"
+
+
+def source_unchanged(path, meta_path, version):
+    """
+    True if meta_path (written by write_source_meta) still describes the
+    file at path for this version: same size and mtime, or same content
+    hash when only the mtime changed (the stored mtime is then refreshed).
+    """
+    import os
+    import json
+
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path) as f:
+        meta = json.load(f)
+
+    st = os.stat(path)
+    if (
+        meta.get("source") != os.path.abspath(path)
+        or meta.get("version") != version
+        or meta.get("size") != st.st_size
+    ):
+        return False
+    if meta.get("mtime_ns") == st.st_mtime_ns:
+        return True
+
+    # Touched but maybe unchanged: fall back to the content hash
+    if meta.get("sha256") == _file_sha256(path):
+        meta["mtime_ns"] = st.st_mtime_ns
+        _write_json_atomic(meta_path, meta)
+        return True
+    return False
+
+
+def write_source_meta(path, meta_path, version):
+    """
+    Record size, mtime and content hash of the file at path for
+    source_unchanged.
+    """
+    import os
+
+    st = os.stat(path)
+    _write_json_atomic(meta_path, {
+        "source": os.path.abspath(path),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "sha256": _file_sha256(path),
+        "version": version,
+    })
+
+
+def source_files(source):
+    """
+    Review files for a source: a single file, a directory (all *.csv files
+    in it, recursively) or a glob pattern. Sorted for a stable order.
+    """
+    import os
+    import glob
+
+    if os.path.isdir(source):
+        files = glob.glob(os.path.join(source, "**", "*.csv"), recursive=True)
+    elif os.path.isfile(source):
+        files = [source]
+    else:
+        files = glob.glob(source, recursive=True)
+    return sorted(files)
+
+
+def city_from_path(path):
+    """
+    City name from a review file name, e.g. "LasVegasTripAdvisorReviews-Dataset.csv"
+    -> "LasVegas" and "paris_2024-01.csv" -> "paris".
+    """
+    import os
+    import re
+
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return re.split(r"TripAdvisor|[_\-\s]", stem, maxsplit=1)[0] or stem
+
+
+@instrumented
+def load_sources(source, max_workers=None, city_of=city_from_path, cache_dir=CACHE_DIR):
+    """
+    Load and clean several review files with the same ";"-separated schema
+    (see source_files) in parallel worker processes and concatenate them into
+    one typed frame. Each row is tagged with its "City" (city_of(path)) and
+    "Source file" (the path relative to source, or to the files' common
+    folder for a single file or pattern). Files go through the per-file
+    cache of load_cached_clean_data.
+    """
+    import os
     import numpy as np
-    import matplotlib.pyplot as plt
-    
-    df = pd.read_csv("data/LasVegasTripAdvisorReviews-Dataset.csv", sep=";")
+    import pandas as pd
+    from concurrent.futures import ProcessPoolExecutor
+
+    files = source_files(source)
+    if not files:
+        raise FileNotFoundError(f"No review files found for {source!r}")
+
+    if max_workers == 1 or len(files) == 1:
+        frames = [load_cached_clean_data(f, cache_dir) for f in files]
+    else:
+        workers = min(len(files), max_workers or os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            frames = list(pool.map(load_cached_clean_data, files, [cache_dir] * len(files)))
+
+    df = concat_clean_chunks(frames).reset_index(drop=True)
+
+    lengths = [len(f) for f in frames]
+    df["City"] = pd.Categorical(np.repeat([city_of(f) for f in files], lengths))
+    base = source if os.path.isdir(source) else os.path.commonpath([os.path.dirname(os.path.abspath(f)) for f in files])
+    tags = [os.path.relpath(os.path.abspath(f), os.path.abspath(base)) for f in files]
+    df["Source file"] = pd.Categorical(np.repeat(tags, lengths))
+    return df
+
+
+def _file_sha256(path, block_size=1 << 20):
+    import hashlib
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _write_json_atomic(path, obj):
+    import os
+    import json
 
-    df_clean = df.copy()
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(obj, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def cleaning_report(report):
+    """
+    Sum the records collected with report=[...] (one per step and chunk)
+    into one row per cleaning step: seconds and rows/values affected.
+    """
+    import pandas as pd
+
+    table = pd.DataFrame(report, columns=["step", "seconds", "affected"])
+    return table.groupby("step", sort=False, as_index=False).sum()
+
+
+def _clean_frame(df, report=None):
+    """
+    Apply the cleaning rules to a raw frame (the whole file or one chunk):
+    drop empty rows and columns, apply CLEANING_SCHEMA column by column and
+    build the cleaned frame once, then drop negative "Member years".
+    Appends {"step", "seconds", "affected"} records to report if given.
+    """
+    import time
+    import pandas as pd
+
+    def record(step, start, affected):
+        if report is not None:
+            report.append({"step": step, "seconds": time.perf_counter() - start, "affected": int(affected)})
 
     # 1) Drop fully empty rows (blank lines in the CSV)
-    df_clean = df_clean.dropna(how="all")
-
-    # 2) Drop fully empty columns
-    df_clean = df_clean.dropna(axis=1, how="all")
-
-    # 3) Strip whitespace from object columns
-    obj_cols = df_clean.select_dtypes(include="object").columns
-    df_clean[obj_cols] = df_clean[obj_cols].apply(lambda s: s.str.strip())
-
-    # 4) Convert empty strings to NaN
-    df_clean = df_clean.replace("", np.nan)
-
-    # 5) Standardize YES/NO columns to True/False
-    yn_cols = ["Pool", "Gym", "Tennis court", "Spa", "Casino", "Free internet", "status"]
-    for c in yn_cols:
-        if c in df_clean.columns:
-            df_clean[c] = df_clean[c].str.upper().map({"YES": True, "NO": False})
-
-    # 6) Convert numeric columns EXCEPT "Hotel stars"
-    num_cols = [
-        "Nr. reviews",
-        "Nr. hotel reviews",
-        "Helpful votes",
-        "Score",
-        "Nr. rooms",
-        "Member years"
-    ]
-    for c in num_cols:
-        if c in df_clean.columns:
-            df_clean[c] = pd.to_numeric(df_clean[c], errors="coerce")
-    
-    # 7) Remove invalid negative values in "Member years"
-    if "Member years" in df_clean.columns:
-        df_clean = df_clean[df_clean["Member years"] >= 0]
-
-
-    # 8) Clean and convert "Hotel stars" explicitly
-    if "Hotel stars" in df_clean.columns:
-        s = df_clean["Hotel stars"].astype(str).str.strip()
-
-        # Treat known empty-like strings as missing
-        s = s.replace({"": np.nan, "nan": np.nan, "None": np.nan})
-
-        # Convert European decimal comma to dot (e.g., '4,5' -> '4.5')
-        s = s.str.replace(",", ".", regex=False)
-
-        df_clean["Hotel stars"] = pd.to_numeric(s, errors="coerce")
-
-    # 9) Drop column "status" (too few entries)
-    if "status" in df_clean.columns:
-        df_clean = df_clean.drop(columns=["status"])
-
-    return df_clean
+    start = time.perf_counter()
+    n_rows = len(df)
+    df = df.dropna(how="all")
+    record("drop_empty_rows", start, n_rows - len(df))
+
+    # 2) Drop fully empty columns and the columns marked "drop"
+    start = time.perf_counter()
+    keep = [c for c in df.columns if CLEANING_SCHEMA.get(c) != "drop" and df[c].notna().any()]
+    record("drop_columns", start, len(df.columns) - len(keep))
+
+    # 3) Apply the rule of each column in one pass over that column
+    columns = {}
+    steps = {}
+    for c in keep:
+        rule = CLEANING_SCHEMA.get(c, "text")
+        start = time.perf_counter()
+
+        s = df[c]
+        before = s.notna().sum()
+        s = _apply_rule(s, rule)
+        columns[c] = s
+
+        seconds, affected = steps.get(rule, (0.0, 0))
+        steps[rule] = (seconds + time.perf_counter() - start, affected + before - s.notna().sum())
+
+    df = pd.DataFrame(columns, index=df.index)
+    if report is not None:
+        for rule, (seconds, affected) in steps.items():
+            report.append({"step": RULE_STEPS[rule], "seconds": seconds, "affected": int(affected)})
+
+    # 4) Remove invalid negative (or missing) values in "Member years"
+    if "Member years" in df.columns:
+        start = time.perf_counter()
+        n_rows = len(df)
+        df = df[df["Member years"] >= 0]
+        record("drop_negative_member_years", start, n_rows - len(df))
+
+    return df
+
+
+def _apply_rule(s, rule):
+    import pandas as pd
+
+    is_text = s.dtype == object or pd.api.types.is_string_dtype(s.dtype)
+
+    if rule == "yes_no":
+        return s.str.strip().str.upper().map({"YES": True, "NO": False})
+
+    if rule in ("numeric", "decimal_comma"):
+        if not is_text:
+            return pd.to_numeric(s, errors="coerce")
+        s = s.str.strip()
+        if rule == "decimal_comma":
+            s = s.str.replace(",", ".", regex=False)
+        return pd.to_numeric(s, errors="coerce")
+
+    if not is_text:
+        return s
+    s = s.str.strip()
+    return s.mask(s == "")
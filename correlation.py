@@ -0,0 +1,213 @@
+# ============================================================
+# Streaming correlation matrices
+# ============================================================
+# Pearson correlations are computed from sums and cross-products that are
+# accumulated chunk by chunk, pairwise-complete: each pair of columns uses
+# every row where both are present (like DataFrame.corr), without dropping
+# rows or copying the whole numeric block. Spearman correlations are Pearson
+# correlations of average ranks, taken from merged value counts in a first
+# pass over the chunks.
+import numpy as np
+import pandas as pd
+
+
+def _iter_chunks(data, chunksize):
+    # A DataFrame is read in row slices; anything else is an iterable of frames
+    if isinstance(data, pd.DataFrame):
+        for start in range(0, max(len(data), 1), chunksize):
+            yield data.iloc[start:start + chunksize]
+    else:
+        yield from data
+
+
+def _as_float(chunk, columns):
+    return chunk[columns].to_numpy(dtype=float, na_value=np.nan)
+
+
+def _moments_of(values, shift):
+    present = ~np.isnan(values)
+    x = np.where(present, values - shift, 0.0)
+    m = present.astype(float)
+    return {"n": m.T @ m, "sx": x.T @ m, "sxx": (x * x).T @ m, "sxy": x.T @ x}
+
+
+def _column_means(values):
+    count = (~np.isnan(values)).sum(axis=0)
+    total = np.nansum(values, axis=0)
+    return np.divide(total, count, out=np.zeros(values.shape[1]), where=count > 0)
+
+
+def corr_moments(data, columns=None, chunksize=100_000):
+    """
+    Pairwise-complete sums for Pearson correlations of the numeric columns
+    of data (a DataFrame or an iterable of DataFrame chunks). For columns i
+    and j, n[i, j] counts the rows where both are present and sx[i, j],
+    sxx[i, j] sum column i (and its square) over those rows; sxy holds the
+    cross-products. Values are shifted by a per-column reference from the
+    first chunk to keep the sums well conditioned.
+    """
+    moments = None
+    for chunk in _iter_chunks(data, chunksize):
+        if columns is None:
+            columns = list(chunk.select_dtypes(include=[np.number]).columns)
+        values = _as_float(chunk, columns)
+        if moments is None:
+            moments = {"columns": list(columns), "shift": _column_means(values),
+                       **{k: np.zeros((len(columns), len(columns))) for k in ("n", "sx", "sxx", "sxy")}}
+        for k, v in _moments_of(values, moments["shift"]).items():
+            moments[k] += v
+
+    if moments is None:
+        columns = list(columns or [])
+        moments = {"columns": columns, "shift": np.zeros(len(columns)),
+                   **{k: np.zeros((len(columns), len(columns))) for k in ("n", "sx", "sxx", "sxy")}}
+    return moments
+
+
+def _reshift(m, shift):
+    # Express the sums of m relative to a new per-column shift
+    d = m["shift"] - shift
+    di, dj = d[:, None], d[None, :]
+    return {
+        "columns": m["columns"],
+        "shift": shift,
+        "n": m["n"],
+        "sx": m["sx"] + di * m["n"],
+        "sxx": m["sxx"] + 2 * di * m["sx"] + di ** 2 * m["n"],
+        "sxy": m["sxy"] + dj * m["sx"] + di * m["sx"].T + di * dj * m["n"],
+    }
+
+
+def merge_corr_moments(*moments):
+    """
+    Combine corr_moments results of disjoint parts of the same columns.
+    """
+    first = moments[0]
+    total = {k: (v.copy() if isinstance(v, np.ndarray) else v) for k, v in first.items()}
+    for m in moments[1:]:
+        if m["columns"] != first["columns"]:
+            raise ValueError("Correlation moments cover different columns")
+        m = _reshift(m, first["shift"])
+        for k in ("n", "sx", "sxx", "sxy"):
+            total[k] += m[k]
+    return total
+
+
+def corr_from_moments(m):
+    """
+    Pearson correlation matrix (DataFrame) from corr_moments. Pairs with
+    fewer than two common rows or without variance are NaN.
+    """
+    n, sx, sxx, sxy = m["n"], m["sx"], m["sxx"], m["sxy"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = sxy - sx * sx.T / n
+        var_x = sxx - sx ** 2 / n
+        corr = cov / np.sqrt(var_x * var_x.T)
+    corr[(n < 2) | ~np.isfinite(corr)] = np.nan
+    corr = np.clip(corr, -1.0, 1.0)
+    np.fill_diagonal(corr, np.where(np.isnan(np.diag(corr)), np.nan, 1.0))
+    return pd.DataFrame(corr, index=m["columns"], columns=m["columns"])
+
+
+def pearson_corr(data, columns=None, chunksize=100_000):
+    """
+    Pairwise-complete Pearson correlation matrix of the numeric columns of
+    data (a DataFrame or an iterable of DataFrame chunks).
+    """
+    return corr_from_moments(corr_moments(data, columns, chunksize))
+
+
+def _value_counts(data, columns, chunksize):
+    # Sorted distinct values and their counts per column, merged over chunks
+    uniques = [[] for _ in columns]
+    for chunk in _iter_chunks(data, chunksize):
+        values = _as_float(chunk, columns)
+        for j in range(len(columns)):
+            v = values[:, j]
+            uniques[j].append(np.unique(v[~np.isnan(v)], return_counts=True))
+
+    tables = []
+    for parts in uniques:
+        if not parts:
+            tables.append((np.empty(0), np.empty(0)))
+            continue
+        u = np.concatenate([p[0] for p in parts])
+        c = np.concatenate([p[1] for p in parts])
+        u, inverse = np.unique(u, return_inverse=True)
+        tables.append((u, np.bincount(inverse, weights=c)))
+    return tables
+
+
+def _average_ranks(values, tables):
+    ranks = np.full(values.shape, np.nan)
+    for j, (u, c) in enumerate(tables):
+        v = values[:, j]
+        ok = ~np.isnan(v)
+        # Average rank of tied values: rows before them + (ties + 1) / 2
+        avg = np.cumsum(c) - (c - 1) / 2
+        ranks[ok, j] = avg[np.searchsorted(u, v[ok])]
+    return ranks
+
+
+def spearman_corr(data, columns=None, chunksize=100_000):
+    """
+    Spearman correlation matrix: Pearson correlations of average ranks,
+    pairwise-complete. data is a DataFrame or a re-iterable collection of
+    chunks (read twice: value counts, then ranked moments). Ranks are taken
+    over all present values of a column; with missing values this can differ
+    slightly from DataFrame.corr("spearman"), which re-ranks every pair.
+    """
+    if columns is None:
+        first = next(iter(_iter_chunks(data, chunksize)), None)
+        columns = [] if first is None else list(first.select_dtypes(include=[np.number]).columns)
+
+    tables = _value_counts(data, columns, chunksize)
+    ranked = (
+        pd.DataFrame(_average_ranks(_as_float(chunk, columns), tables), columns=columns)
+        for chunk in _iter_chunks(data, chunksize)
+    )
+    return pearson_corr(ranked, columns)
+
+
+def _bootstrap_batch(values, method, n_boot, seed):
+    rng = np.random.default_rng(seed)
+    columns = list(range(values.shape[1]))
+    out = np.empty((n_boot, len(columns), len(columns)))
+    for b in range(n_boot):
+        sample = values[rng.integers(0, len(values), size=len(values))]
+        if method == "spearman":
+            frame = pd.DataFrame(sample)
+            out[b] = spearman_corr(frame, columns, chunksize=len(sample) or 1).to_numpy()
+        else:
+            m = _moments_of(sample, _column_means(sample))
+            out[b] = corr_from_moments({"columns": columns, **m}).to_numpy()
+    return out
+
+
+def bootstrap_corr_ci(df, columns=None, method="pearson", n_boot=1_000, alpha=0.05,
+                      random_state=0, n_jobs=-1, batch_size=50):
+    """
+    Percentile bootstrap confidence intervals for the correlation matrix
+    (rows resampled with replacement). Batches of resamples run in parallel
+    (joblib, n_jobs) with independent seeds, so the result does not depend
+    on n_jobs. Returns (lower, upper) DataFrames.
+    """
+    from joblib import Parallel, delayed
+
+    if columns is None:
+        columns = list(df.select_dtypes(include=[np.number]).columns)
+    values = _as_float(df, columns)
+
+    sizes = [min(batch_size, n_boot - i) for i in range(0, n_boot, batch_size)]
+    seeds = np.random.SeedSequence(random_state).spawn(len(sizes))
+    batches = Parallel(n_jobs=n_jobs)(
+        delayed(_bootstrap_batch)(values, method, size, seed) for size, seed in zip(sizes, seeds)
+    )
+    samples = np.concatenate(batches)
+
+    with np.errstate(all="ignore"):
+        lower, upper = np.nanpercentile(samples, [100 * alpha / 2, 100 * (1 - alpha / 2)], axis=0)
+    return (
+        pd.DataFrame(lower, index=columns, columns=columns),
+        pd.DataFrame(upper, index=columns, columns=columns),
+    )
@@ -0,0 +1,223 @@
+# ============================================================
+# Review cube
+# ============================================================
+# One group-by pass materializes the reviews as cells over the dimensions
+# the summaries group by (hotel, continent, traveler type, period, month)
+# with mergeable measures: row counts, first row position, sums, counts and
+# sums of squares of Score and Helpful votes. Roll-ups, slices and dices
+# run on the cells instead of the reviews. What the cells do not cover is
+# kept in small roll-ups next to them (per continent: review weekday and
+# the casino flag, plus the hotel aggregate store of performance.py), so
+# the cube and its roll-ups feed the review_stats parameters of
+# performance.py and relationship.py without reading the reviews.
+import numpy as np
+import pandas as pd
+
+from cleaning import CACHE_DIR, DATA_PATH
+from instrumentation import instrumented
+from performance import build_hotel_aggregates, merge_hotel_aggregates
+
+# Bump whenever the cell layout changes so persisted cubes get rebuilt
+CUBE_VERSION = 3
+
+CUBE_DIMENSIONS = [
+    "Hotel name",
+    "User continent",
+    "Traveler type",
+    "Period of stay",
+    "Review month",
+]
+
+# Roll-ups kept next to the cube: name -> the dimensions of its cells.
+# All of them are split by continent, so they can be diced like the cube
+ROLLUP_DIMENSIONS = {
+    "Review weekday": ["User continent", "Review weekday"],
+    "casino": ["User continent", "casino"],
+}
+
+# Measures and how cells are combined
+CUBE_MEASURES = {
+    "rows": "sum",
+    "first": "min",
+    "score_sum": "sum",
+    "score_count": "sum",
+    "score_sq": "sum",
+    "helpful_sum": "sum",
+    "helpful_count": "sum",
+    "helpful_sq": "sum",
+}
+
+# Column types of a roll-up (as in performance.dimension_stats)
+STATS_DTYPES = {
+    "rows": "int64",
+    "first": "int64",
+    "score_sum": "float64",
+    "score_count": "int64",
+    "score_sq": "float64",
+    "helpful_sum": "float64",
+    "helpful_count": "int64",
+    "helpful_sq": "float64",
+}
+
+
+@instrumented
+def build_cube(df, offset=0):
+    """
+    Cube cells of a cleaned review frame (one row per observed combination
+    of CUBE_DIMENSIONS, missing values included). offset is the number of
+    reviews seen before this batch, as in dimension_stats.
+    """
+    return _cells(df, [df[c] for c in CUBE_DIMENSIONS], offset)
+
+
+def _cells(df, keys, offset):
+    # Measures of df per combination of the keys (Series aligned with df)
+    # As float64, so sums of the nullable Int32 columns cannot overflow
+    score = df["Score"].to_numpy(dtype=float, na_value=np.nan)
+    helpful = df["Helpful votes"].to_numpy(dtype=float, na_value=np.nan)
+    data = pd.DataFrame({
+        "Score": score,
+        "Helpful votes": helpful,
+        "pos": np.arange(offset, offset + len(df)),
+        "score_sq": score ** 2,
+        "helpful_sq": helpful ** 2,
+    }, index=df.index)
+
+    return (
+        data.groupby(keys, observed=True, dropna=False)
+            .agg(
+                rows=("pos", "size"),
+                first=("pos", "min"),
+                score_sum=("Score", "sum"),
+                score_count=("Score", "count"),
+                score_sq=("score_sq", "sum"),
+                helpful_sum=("Helpful votes", "sum"),
+                helpful_count=("Helpful votes", "count"),
+                helpful_sq=("helpful_sq", "sum"),
+            )
+            .reset_index()
+    )
+
+
+def merge_cubes(*cubes):
+    """
+    Cube of the combined reviews from cubes of separate batches.
+    """
+    return (
+        pd.concat(cubes, ignore_index=True)
+          .groupby(CUBE_DIMENSIONS, observed=True, dropna=False)
+          .agg(CUBE_MEASURES)
+          .reset_index()
+    )
+
+
+def dice_cube(cube, filters=None):
+    """
+    Cells matching every filter ({dimension: value or list of values}).
+    """
+    keep = np.ones(len(cube), dtype=bool)
+    for dim, value in (filters or {}).items():
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        keep &= cube[dim].isin(values).to_numpy()
+    return cube[keep]
+
+
+def slice_cube(cube, dim, value):
+    """
+    Cells with dim == value.
+    """
+    return dice_cube(cube, {dim: value})
+
+
+def rollup(cube, dims):
+    """
+    Additive measures per value of dims (a dimension name, a list of them or
+    a Series of keys aligned with cube), in the format of dimension_stats.
+    Rows where a key is missing are left out.
+    """
+    keys = [dims] if isinstance(dims, (str, pd.Series)) else list(dims)
+    how = {m: CUBE_MEASURES[m] for m in STATS_DTYPES}
+    return (
+        cube.groupby([cube[k] if isinstance(k, str) else k for k in keys], observed=True)
+            .agg(how)
+            .astype(STATS_DTYPES)
+    )
+
+
+@instrumented
+def build_cube_rollups(df, offset=0):
+    """
+    The roll-ups kept next to the cube of df: cells over ROLLUP_DIMENSIONS
+    and the hotel aggregate store (hotel x continent x country x amenity
+    pattern).
+    """
+    from relationship import casino_key
+
+    keyed = df.assign(casino=casino_key(df))
+    rollups = {
+        name: _cells(keyed, [keyed[c] for c in dims], offset)
+        for name, dims in ROLLUP_DIMENSIONS.items()
+    }
+    # Built once per cube, not looked up again: keep it out of the result cache
+    rollups["hotels"] = build_hotel_aggregates.uncached(df, offset=offset)
+    return rollups
+
+
+def dice_rollups(rollups, filters):
+    """
+    The roll-ups of the reviews matching every filter, as dice_cube. Only
+    "User continent" can be filtered on.
+    """
+    unknown = set(filters) - {"User continent"}
+    if unknown:
+        raise ValueError(f"Roll-ups cannot be filtered on {sorted(unknown)}")
+
+    diced = {name: dice_cube(rollups[name], filters) for name in ROLLUP_DIMENSIONS}
+    diced["hotels"] = merge_hotel_aggregates({"detail": dice_cube(rollups["hotels"]["detail"], filters)})
+    return diced
+
+
+def cube_review_stats(cube, rollups):
+    """
+    The review_stats of incremental.build_review_stats for the reviews that
+    cube and rollups (build_cube_rollups, diced alike) summarize, without
+    reading the reviews.
+    """
+    from incremental import DIMENSIONS
+
+    stats = {"rows": int(cube["rows"].sum())}
+    for c in DIMENSIONS:
+        stats[c] = rollup(cube if c in CUBE_DIMENSIONS else rollups[c], c)
+    stats["casino"] = rollup(rollups["casino"], "casino")
+    stats["hotels"] = rollups["hotels"]
+    return stats
+
+
+@instrumented
+def load_cube(path=DATA_PATH, cache_dir=CACHE_DIR):
+    """
+    (cube, rollups) of a review file, persisted next to the cleaned-data
+    cache (<cache_name>.cube.pkl) and rebuilt only when the file,
+    CUBE_VERSION or the cleaning rules (CLEANING_VERSION) change.
+    """
+    import os
+    from cleaning import CLEANING_VERSION, cache_name, load_cached_clean_data, source_unchanged, write_source_meta
+
+    version = f"{CUBE_VERSION}.{CLEANING_VERSION}"
+    name = cache_name(path)
+    cube_path = os.path.join(cache_dir, name + ".cube.pkl")
+    meta_path = os.path.join(cache_dir, name + ".cube.json")
+
+    if os.path.exists(cube_path) and source_unchanged(path, meta_path, version):
+        return pd.read_pickle(cube_path)
+
+    df = load_cached_clean_data(path, cache_dir)
+    persisted = build_cube(df), build_cube_rollups(df)
+    del df
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = cube_path + ".tmp"
+    pd.to_pickle(persisted, tmp_path)
+    os.replace(tmp_path, cube_path)
+    write_source_meta(path, meta_path, version)
+    return persisted
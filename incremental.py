@@ -0,0 +1,58 @@
+# ============================================================
+# Incremental aggregation of review batches
+# ============================================================
+from performance import (
+    build_hotel_aggregates,
+    dimension_stats,
+    merge_dimension_stats,
+    merge_hotel_aggregates,
+)
+from relationship import casino_key
+
+# Dimensions kept in the review stats (besides "casino" and "hotels")
+DIMENSIONS = [
+    "Hotel name",
+    "User continent",
+    "Traveler type",
+    "Period of stay",
+    "Review month",
+    "Review weekday",
+]
+
+
+def build_review_stats(df, offset=0):
+    """
+    Mergeable statistics of a batch of cleaned reviews: one dimension_stats
+    table per dimension and for the casino flag, plus the hotel aggregate
+    store. offset is the number of reviews seen before this batch.
+    Pass the result as review_stats / agg (stats["hotels"]) to continent_summary,
+    most_frequent_fields, casino_score_comparison and the hotel rankings.
+    """
+    stats = {"rows": len(df)}
+    for c in DIMENSIONS:
+        stats[c] = dimension_stats(df, c, offset=offset)
+    stats["casino"] = dimension_stats(df, casino_key(df), offset=offset)
+    # Batches are seen once: keep their stores out of the result cache
+    stats["hotels"] = build_hotel_aggregates.uncached(df, offset=offset)
+    return stats
+
+
+def merge_review_stats(a, b):
+    """
+    Combine the stats of two batches (b following a).
+    """
+    stats = {"rows": a["rows"] + b["rows"]}
+    for c in DIMENSIONS + ["casino"]:
+        stats[c] = merge_dimension_stats(a[c], b[c])
+    stats["hotels"] = merge_hotel_aggregates(a["hotels"], b["hotels"])
+    return stats
+
+
+def update_review_stats(stats, batch):
+    """
+    Add a new batch of cleaned reviews to existing stats. Only the batch is
+    scanned, the existing stats are merged table by table.
+    """
+    if stats is None:
+        return build_review_stats(batch)
+    return merge_review_stats(stats, build_review_stats(batch, offset=stats["rows"]))
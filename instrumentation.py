@@ -0,0 +1,272 @@
+# ============================================================
+# Opt-in step instrumentation
+# ============================================================
+# Step functions are decorated with @instrumented. While no sink is enabled
+# the wrapper only checks one module-level list and calls the function, so
+# normal runs pay (almost) nothing. With enable(...) every call produces a
+# record: wall time, rows in/out, growth of the peak RSS and the number of
+# DataFrame/Series copies made, which is passed to each sink. Steps may run
+# on several threads at once (taskgraph.run_graph): copies are counted per
+# thread and records reach the sinks one at a time.
+import os
+import sys
+import json
+import time
+import functools
+import threading
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_SINKS = []
+_COPIES = threading.local()
+_ORIGINAL_COPY = {}
+_EMIT_LOCK = threading.Lock()
+_ACTIVE = {}
+
+
+def _peak_rss():
+    # Peak resident set size of this process in bytes (None where unknown)
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _rows(obj):
+    # Rows of a frame/array, of the first element of a tuple, else None
+    if isinstance(obj, tuple) and obj:
+        obj = obj[0]
+    shape = getattr(obj, "shape", None)
+    return shape[0] if shape else None
+
+
+def _copies():
+    return getattr(_COPIES, "count", 0)
+
+
+def _count_copies(enable):
+    # Count explicit DataFrame.copy / Series.copy calls while enabled; the
+    # originals are restored on disable so disabled runs are untouched.
+    import pandas as pd
+
+    for cls in (pd.DataFrame, pd.Series):
+        if enable and cls not in _ORIGINAL_COPY:
+            original = _ORIGINAL_COPY[cls] = cls.copy
+
+            @functools.wraps(original)
+            def copy(self, *args, _original=original, **kwargs):
+                _COPIES.count = _copies() + 1
+                return _original(self, *args, **kwargs)
+
+            cls.copy = copy
+        elif not enable and cls in _ORIGINAL_COPY:
+            cls.copy = _ORIGINAL_COPY.pop(cls)
+
+
+def enable(*sinks):
+    """
+    Start sending step records to the given sinks (callables taking one
+    record dict), e.g. enable(log_sink(), json_sink("steps.jsonl")).
+    """
+    _SINKS.extend(sinks)
+    _count_copies(True)
+
+
+def disable():
+    """
+    Stop recording and detach all sinks.
+    """
+    _SINKS.clear()
+    _count_copies(False)
+
+
+def is_enabled():
+    return bool(_SINKS)
+
+
+def _emit(record):
+    with _EMIT_LOCK:
+        for sink in _SINKS:
+            sink(record)
+
+
+def _enter(record):
+    # Mark this step and the steps running on other threads as concurrent:
+    # the peak RSS is per process, so its growth cannot be charged to one
+    thread = threading.get_ident()
+    with _EMIT_LOCK:
+        others = [r for r, t in _ACTIVE.values() if t != thread]
+        for r in others:
+            r["_concurrent"] = True
+        if others:
+            record["_concurrent"] = True
+        _ACTIVE[id(record)] = (record, thread)
+
+
+def _leave(record):
+    with _EMIT_LOCK:
+        _ACTIVE.pop(id(record), None)
+    return record.pop("_concurrent", False)
+
+
+@contextmanager
+def step(name, rows_in=None):
+    """
+    Record a block of code as a step. The yielded dict can be given
+    "rows_out" (and any other fields) before the block ends:
+
+        with step("load_data") as rec:
+            df = load(...)
+            rec["rows_out"] = len(df)
+    """
+    if not _SINKS:
+        yield {}
+        return
+
+    record = {"step": name, "rows_in": rows_in, "rows_out": None}
+    _enter(record)
+    rss, copies = _peak_rss(), _copies()
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record["error"] = type(e).__name__
+        raise
+    finally:
+        record["seconds"] = time.perf_counter() - start
+        concurrent = _leave(record)
+        record["peak_rss_delta"] = None if rss is None or concurrent else _peak_rss() - rss
+        record["copies"] = _copies() - copies
+        record["time"] = time.time()
+        _emit(record)
+
+
+def instrumented(func=None, *, name=None):
+    """
+    Decorator for step functions. Rows in are taken from the first argument,
+    rows out from the result (or its first element for tuples).
+    """
+    if func is None:
+        return functools.partial(instrumented, name=name)
+
+    step_name = name or func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _SINKS:
+            return func(*args, **kwargs)
+
+        with step(step_name, _rows(args[0]) if args else None) as record:
+            result = func(*args, **kwargs)
+            record["rows_out"] = _rows(result)
+        return result
+
+    return wrapper
+
+
+# ------------------------------------------------------------
+# Sinks
+# ------------------------------------------------------------
+def log_sink(logger=None, level=20):
+    """
+    One log line per step (logging.INFO by default).
+    """
+    import logging
+
+    logger = logger or logging.getLogger("hotel.steps")
+
+    def sink(record):
+        logger.log(
+            level, "%s %.3fs rows %s->%s rss +%s copies %s%s",
+            record["step"], record["seconds"], record["rows_in"], record["rows_out"],
+            record["peak_rss_delta"], record["copies"],
+            " error " + record["error"] if "error" in record else "",
+        )
+
+    return sink
+
+
+def json_sink(path):
+    """
+    Append each record as one JSON line to path.
+    """
+    def sink(record):
+        with open(path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    return sink
+
+
+PROMETHEUS_METRICS = [
+    ("calls_total", "counter", "Calls of the step."),
+    ("errors_total", "counter", "Calls of the step that raised."),
+    ("seconds_total", "counter", "Wall-clock seconds spent in the step."),
+    ("rows_in_total", "counter", "Input rows seen by the step."),
+    ("rows_out_total", "counter", "Output rows produced by the step."),
+    ("copies_total", "counter", "DataFrame/Series copies made during the step."),
+    ("peak_rss_delta_bytes", "gauge", "Largest growth of the peak RSS during one call."),
+]
+
+
+def prometheus_sink(path, prefix="hotel_step_"):
+    """
+    Keep per-step totals and rewrite path in the Prometheus text format after
+    every record (for the node exporter textfile collector).
+    """
+    totals = {}
+    lock = threading.Lock()
+
+    def sink(record):
+        # Steps on several threads share the totals and the file
+        with lock:
+            t = totals.setdefault(record["step"], dict.fromkeys([m for m, _, _ in PROMETHEUS_METRICS], 0))
+            t["calls_total"] += 1
+            t["errors_total"] += "error" in record
+            t["seconds_total"] += record["seconds"]
+            t["rows_in_total"] += record["rows_in"] or 0
+            t["rows_out_total"] += record["rows_out"] or 0
+            t["copies_total"] += record["copies"]
+            t["peak_rss_delta_bytes"] = max(t["peak_rss_delta_bytes"], record["peak_rss_delta"] or 0)
+
+            lines = []
+            for metric, kind, help_text in PROMETHEUS_METRICS:
+                lines.append(f"# HELP {prefix}{metric} {help_text}")
+                lines.append(f"# TYPE {prefix}{metric} {kind}")
+                for name, values in totals.items():
+                    label = name.replace("\\", "\\\\").replace('"', '\\"')
+                    lines.append(f'{prefix}{metric}{{step="{label}"}} {float(values[metric])!r}')
+
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write("\n".join(lines) + "\n")
+            os.replace(tmp_path, path)
+
+    return sink
+
+
+def parse_sink(spec):
+    """
+    Sink from a command-line/env spec: "log", "json:PATH" or "prom:PATH".
+    """
+    kind, _, path = spec.partition(":")
+    if kind == "log":
+        return log_sink()
+    if kind == "json" and path:
+        return json_sink(path)
+    if kind == "prom" and path:
+        return prometheus_sink(path)
+    raise ValueError(f"Unknown instrumentation sink: {spec!r} (use log, json:PATH or prom:PATH)")
+
+
+def enable_from_env(var="HOTEL_INSTRUMENT"):
+    """
+    Enable the comma-separated sinks named in the environment variable, if set.
+    """
+    specs = [s.strip() for s in os.environ.get(var, "").split(",") if s.strip()]
+    if specs:
+        enable(*[parse_sink(s) for s in specs])
+    return bool(specs)
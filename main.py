@@ -2,28 +2,18 @@
 # Hotel Analytics – Main Menu Program
 # ============================================================
 import os as os
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-
-from cleaning import load_and_clean_data
-from performance import (
-    continent_summary,
-    top5_hotels,
-    top10_hotels_europe,
-    bottom5_hotels_all_amenities,
-)
-
-from visualization import plot_score_histogram
-from relationship import casino_score_comparison, plot_numeric_corr_heatmap
-from prediction import (
-    prepare_model_data,
-    split_data,
-    fit_linear_regression,
-    evaluate_model,
-    coefficients_table,
-    plot_actual_vs_predicted,
-)
+import json
+import time
+import logging
+import argparse
+import functools
+
+# Only the light modules are imported here; pandas, matplotlib and
+# scikit-learn come in with the section that needs them, so the menu,
+# Info and Help start without waiting for them.
+import instrumentation
+import result_cache
+from cleaning import DATA_PATH
 
 
 # ------------------------------------------------------------
@@ -37,6 +27,33 @@ def ensure_plots():
     os.makedirs("plots", exist_ok=True)
 
 
+@functools.lru_cache(maxsize=None)
+def load_data(data_path=DATA_PATH):
+    """
+    Cleaned dataset, loaded on first use and kept for the rest of the run.
+    A directory or glob pattern loads several cities/files at once.
+    """
+    from cleaning import load_cached_clean_data, load_sources
+
+    if os.path.isfile(data_path):
+        return load_cached_clean_data(data_path)
+    return load_sources(data_path)
+
+
+@functools.lru_cache(maxsize=None)
+def load_review_cube(data_path=DATA_PATH):
+    """
+    Persisted (cube, rollups) of a review file (see cube.py); (None, None)
+    for directories and patterns, which are aggregated from the frame instead.
+    """
+    if not os.path.isfile(data_path):
+        return None, None
+
+    from cube import load_cube
+
+    return load_cube(data_path)
+
+
 # ------------------------------------------------------------
 # Section 1 – Program Info
 # ------------------------------------------------------------
@@ -55,15 +72,32 @@ def section_1_info():
 # ------------------------------------------------------------
 # Section 2 – Analytics
 # ------------------------------------------------------------
+SECTION_2_STEPS = [
+    "continent_summary",
+    "top5_hotels",
+    "top10_hotels_europe",
+    "bottom5_hotels_all_amenities",
+    "casino_score_comparison",
+    "numeric_corr",
+]
+
+
 def section_2_analytics(df):
+    from taskgraph import run_graph, select_steps
+    from visualization import plot_score_histogram
+    from relationship import plot_numeric_corr_heatmap
+
     print("\n=== Analytics ===")
 
+    # The tables of this section are independent steps, computed together
+    out = run_graph(select_steps(analytics_graph(df), SECTION_2_STEPS), store=step_store())
+
     # ------------------------------------------------------------
     # 1) Customer / Reviewer Overview
     # ------------------------------------------------------------
     print("\n--- Customer / Reviewer Overview ---")
 
-    cont_counts, cont_stats, top3_score, top3_helpful = continent_summary(df)
+    cont_counts, cont_stats, top3_score, top3_helpful = out["continent_summary"]
 
     print("\nReview volume by continent:")
     print(cont_counts.to_string())
@@ -80,13 +114,13 @@ def section_2_analytics(df):
     print("\n--- Hotel Performance Insights ---")
 
     print("\nTop 5 hotels by average Score:")
-    print(top5_hotels(df).to_string(index=False))
+    print(out["top5_hotels"].to_string(index=False))
 
     print("\nTop 10 hotels (Europe reviews only):")
-    print(top10_hotels_europe(df).to_string(index=False))
+    print(out["top10_hotels_europe"].to_string(index=False))
 
     print("\nBottom hotels that offer major amenities (Gym/Spa/Tennis/Casino):")
-    print(bottom5_hotels_all_amenities(df).to_string(index=False))
+    print(out["bottom5_hotels_all_amenities"].to_string(index=False))
 
     # ------------------------------------------------------------
     # 3) Visual Data Storytelling
@@ -101,7 +135,7 @@ def section_2_analytics(df):
     print("\n--- Relationship Exploration ---")
 
     print("\nCasino vs average Score:")
-    print(casino_score_comparison(df).to_string(index=False))
+    print(out["casino_score_comparison"].to_string(index=False))
 
     print("\nCorrelation Heatmap (Numeric Variables):")
     plot_numeric_corr_heatmap(df)
@@ -124,14 +158,22 @@ def section_2_analytics(df):
 # Section 3 – Prediction
 # ------------------------------------------------------------
 def section_3_prediction(df):
+    import pandas as pd
+    from prediction import plot_actual_vs_predicted
+    from scoring import MODEL_PATH, save_model
+    from taskgraph import run_graph
+
     ensure_plots()
     print("\n=== Hotel Score Prediction ===")
 
-    X, y, numeric_cols, _ = prepare_model_data(df)
-    X_train, X_test, y_train, y_test = split_data(X, y)
+    out = run_graph(prediction_graph(df), store=step_store())
+    _, _, numeric_cols, amenity_cols = out["prepare_model_data"]
+    X_train, X_test, y_train, y_test = out["split_data"]
+    model, scaler = out["fit_linear_regression"]
+    r2, mse, y_pred = out["evaluate_model"]
 
-    model, scaler = fit_linear_regression(X_train, y_train, numeric_cols)
-    r2, mse, y_pred = evaluate_model(model, scaler, X_test, y_test, numeric_cols)
+    # Keep the trained model for the scoring service (scoring.py)
+    save_model(model, scaler, numeric_cols, amenity_cols, MODEL_PATH)
 
     print("\nModel Performance (Test Set)")
     perf = pd.DataFrame([{
@@ -143,8 +185,7 @@ def section_3_prediction(df):
     print(perf.to_string(index=False))
 
     print("\nVariable Importance (Coefficients)")
-    coef = coefficients_table(model, list(X.columns))
-    print(coef.to_string(index=False))
+    print(out["coefficients_table"].to_string(index=False))
 
     plot_actual_vs_predicted(y_test, y_pred)
 
@@ -152,7 +193,8 @@ def section_3_prediction(df):
         "\nSection Summary:\n"
         "A linear regression model was trained to predict review Score.\n"
         "R² and MSE show how well the model explains the data.\n"
-        "Coefficients indicate which features increase or decrease the predicted Score."
+        "Coefficients indicate which features increase or decrease the predicted Score.\n"
+        "The trained model is saved to " + MODEL_PATH + " for the scoring service."
     )
     pause()
 
@@ -173,12 +215,295 @@ def section_4_help():
     pause()
 
 
+# ------------------------------------------------------------
+# Batch Mode – non-interactive runs (python main.py run ...)
+# ------------------------------------------------------------
+def timed(stages, name, func, *args, **kwargs):
+    """
+    Call func and append its wall-clock time as a named stage to stages.
+    """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    stages.append({"stage": name, "seconds": round(seconds, 6)})
+    print(f"[{seconds:8.3f}s] {name}")
+    return result
+
+
+def save_table(table, out_dir, name):
+    import pandas as pd
+
+    path = os.path.join(out_dir, name + ".csv")
+    table.to_csv(path, index=isinstance(table, pd.Series))
+
+
+def save_json(obj, out_dir, name):
+    with open(os.path.join(out_dir, name + ".json"), "w") as f:
+        json.dump(obj, f, indent=2, default=float)
+
+
+def review_stats(df, data_path=DATA_PATH):
+    """
+    review_stats of df: rolled up from the persisted cube and its roll-ups
+    when data_path is a file (df is not read then, it only keys the stored
+    step), else aggregated from df.
+    """
+    cube, rollups = load_review_cube(data_path)
+    if cube is None:
+        from incremental import build_review_stats
+
+        return build_review_stats(df)
+
+    from cube import cube_review_stats
+
+    return cube_review_stats(cube, rollups)
+
+
+def review_cube(df, data_path=DATA_PATH):
+    """
+    Cells of the persisted cube of data_path (None for directories and
+    patterns); like review_stats, df only keys the stored step.
+    """
+    return load_review_cube(data_path)[0]
+
+
+def analytics_graph(df, data_path=DATA_PATH):
+    """
+    Steps of the analytics section. Apart from the review stats and the
+    correlation matrix they use, the steps are independent of each other.
+    """
+    from taskgraph import Ref, task
+    from performance import (
+        continent_summary,
+        top5_hotels,
+        top10_hotels_europe,
+        bottom5_hotels_all_amenities,
+        top5_hotels_bootstrap,
+        bottom5_hotels_all_amenities_bootstrap,
+        top10_hotels_review_volume_with_countries,
+        no_free_internet_summary,
+        top5_hotels_by_rooms_meeting_conditions,
+        most_frequent_fields,
+    )
+    from visualization import score_histogram_spec, score_by_traveler_type_spec, rooms_by_stars_spec
+    from relationship import (
+        casino_score_comparison,
+        member_years_vs_helpful_votes_spec,
+        numeric_corr,
+        numeric_corr_heatmap_spec,
+    )
+
+    stats, agg = Ref("review_stats"), Ref("review_stats", "hotels")
+    return {
+        "review_stats": task(review_stats, df, data_path),
+        "review_cube": task(review_cube, df, data_path),
+        "continent_summary": task(continent_summary, df, stats),
+        "top5_hotels": task(top5_hotels, df, agg),
+        "top10_hotels_europe": task(top10_hotels_europe, df, agg, Ref("review_cube")),
+        "bottom5_hotels_all_amenities": task(bottom5_hotels_all_amenities, df, agg),
+        "top5_hotels_bootstrap": task(top5_hotels_bootstrap, df),
+        "bottom5_hotels_all_amenities_bootstrap": task(bottom5_hotels_all_amenities_bootstrap, df),
+        "top10_hotels_review_volume_with_countries": task(top10_hotels_review_volume_with_countries, df),
+        "no_free_internet_summary": task(no_free_internet_summary, df, agg),
+        "top5_hotels_by_rooms_meeting_conditions": task(top5_hotels_by_rooms_meeting_conditions, df, agg),
+        "most_frequent_fields": task(most_frequent_fields, df, stats),
+        "casino_score_comparison": task(casino_score_comparison, df, stats),
+        "numeric_corr": task(numeric_corr, df),
+        "score_histogram_spec": task(score_histogram_spec, df),
+        "score_by_traveler_type_spec": task(score_by_traveler_type_spec, df),
+        "rooms_by_stars_spec": task(rooms_by_stars_spec, df),
+        "member_years_vs_helpful_votes_spec": task(member_years_vs_helpful_votes_spec, df),
+        "numeric_corr_heatmap_spec": task(numeric_corr_heatmap_spec, Ref("numeric_corr")),
+    }
+
+
+def prediction_graph(df):
+    """
+    Steps of the prediction section (a chain: prepare, split, fit, evaluate).
+    """
+    from taskgraph import Ref, task
+    from prediction import (
+        prepare_model_data,
+        split_data,
+        fit_linear_regression,
+        evaluate_model,
+        coefficients_table,
+        actual_vs_predicted_spec,
+    )
+
+    data, split, fit = "prepare_model_data", "split_data", "fit_linear_regression"
+    return {
+        data: task(prepare_model_data, df),
+        split: task(split_data, Ref(data, 0), Ref(data, 1)),
+        fit: task(fit_linear_regression, Ref(split, 0), Ref(split, 2), Ref(data, 2)),
+        "evaluate_model": task(
+            evaluate_model, Ref(fit, 0), Ref(fit, 1), Ref(split, 1), Ref(split, 3), Ref(data, 2)
+        ),
+        "features": task(list, Ref(data, 0)),
+        "coefficients_table": task(coefficients_table, Ref(fit, 0), Ref("features")),
+        "actual_vs_predicted_spec": task(actual_vs_predicted_spec, Ref(split, 3), Ref("evaluate_model", 2)),
+    }
+
+
+def step_store():
+    """
+    Folder for stored step outputs: steps/ in the result cache directory
+    (None without one).
+    """
+    cache_dir = result_cache.cache_info()["cache_dir"]
+    return os.path.join(cache_dir, "steps") if cache_dir else None
+
+
+def run_steps(stages, graph):
+    """
+    Run a task graph, printing and recording the time of every step. Step
+    outputs are reused from step_store() while their code and inputs are
+    unchanged.
+    """
+    from taskgraph import run_graph
+
+    done = []
+    outputs = run_graph(graph, store=step_store(), stages=done)
+    for stage in done:
+        note = " (stored)" if stage["stored"] else ""
+        print(f"[{stage['seconds']:8.3f}s] {stage['stage']}{note}")
+    stages += done
+    return outputs
+
+
+def batch_analytics(df, out_dir, stages, data_path=DATA_PATH):
+    out = run_steps(stages, analytics_graph(df, data_path))
+
+    cont_counts, cont_stats, top3_score, top3_helpful = out["continent_summary"]
+    save_table(cont_counts, out_dir, "continent_review_counts")
+    save_table(cont_stats, out_dir, "continent_stats")
+    save_table(top3_score, out_dir, "continent_top3_score")
+    save_table(top3_helpful, out_dir, "continent_top3_helpful")
+
+    for name in [
+        "top5_hotels",
+        "top10_hotels_europe",
+        "bottom5_hotels_all_amenities",
+        "top5_hotels_bootstrap",
+        "bottom5_hotels_all_amenities_bootstrap",
+        "top10_hotels_review_volume_with_countries",
+    ]:
+        save_table(out[name], out_dir, name)
+    top3_countries, top3_hotels = out["no_free_internet_summary"]
+    save_table(top3_countries, out_dir, "no_free_internet_top3_countries")
+    save_table(top3_hotels, out_dir, "no_free_internet_top3_hotels")
+    save_table(out["top5_hotels_by_rooms_meeting_conditions"], out_dir, "top5_hotels_by_rooms_meeting_conditions")
+    for name, counts in out["most_frequent_fields"].items():
+        save_table(counts, out_dir, name)
+
+    save_table(out["casino_score_comparison"], out_dir, "casino_score_comparison")
+    out["numeric_corr"].to_csv(os.path.join(out_dir, "correlation_matrix.csv"))
+
+    # Figures are only prepared here and rendered together by run_batch
+    return [
+        out["score_histogram_spec"],
+        out["score_by_traveler_type_spec"],
+        out["rooms_by_stars_spec"],
+        out["member_years_vs_helpful_votes_spec"],
+        out["numeric_corr_heatmap_spec"],
+    ]
+
+
+def batch_prediction(df, out_dir, stages, data_path=DATA_PATH):
+    from scoring import save_model
+
+    out = run_steps(stages, prediction_graph(df))
+
+    _, _, numeric_cols, amenity_cols = out["prepare_model_data"]
+    X_train, X_test, _, _ = out["split_data"]
+    model, scaler = out["fit_linear_regression"]
+    save_model(model, scaler, numeric_cols, amenity_cols, os.path.join(out_dir, "score_model.json"))
+    r2, mse, _ = out["evaluate_model"]
+    save_json({
+        "Train rows": len(X_train),
+        "Test rows": len(X_test),
+        "R2": r2,
+        "MSE": mse
+    }, out_dir, "model_performance")
+
+    save_table(out["coefficients_table"], out_dir, "coefficients")
+
+    return [out["actual_vs_predicted_spec"]]
+
+
+BATCH_SECTIONS = {
+    "analytics": batch_analytics,
+    "prediction": batch_prediction,
+}
+
+
+def run_batch(sections, out_dir, data_path=DATA_PATH):
+    """
+    Run the given sections without prompts or on-screen plots and write
+    tables (CSV/JSON), plots (PNG, rendered in parallel worker processes)
+    and per-stage timings into out_dir.
+    """
+    # Headless before any analysis module imports pyplot, so no step of the
+    # batch path can pick a GUI backend
+    import matplotlib
+    matplotlib.use("Agg")
+
+    os.makedirs(out_dir, exist_ok=True)
+
+    stages = []
+    start = time.perf_counter()
+
+    from rendering import render_specs
+
+    df = timed(stages, "load_data", load_data, data_path)
+    specs = []
+    for section in sections:
+        specs += BATCH_SECTIONS[section](df, out_dir, stages, data_path)
+
+    timed(stages, "render_plots", render_specs, specs, out_dir)
+
+    save_json({
+        "sections": sections,
+        "rows": len(df),
+        "total_seconds": round(time.perf_counter() - start, 6),
+        "stages": stages,
+    }, out_dir, "timings")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Hotel Analytics (no arguments: interactive menu)")
+    parser.add_argument(
+        "--instrument", action="append", default=[], metavar="SINK",
+        help="record every step to SINK: log, json:PATH or prom:PATH (repeatable; "
+             "also read from HOTEL_INSTRUMENT)"
+    )
+    parser.add_argument(
+        "--result-cache", metavar="DIR", default=os.environ.get("HOTEL_RESULT_CACHE"),
+        help="also keep computed tables and models in DIR for later runs (or set HOTEL_RESULT_CACHE)"
+    )
+    commands = parser.add_subparsers(dest="command")
+
+    run = commands.add_parser("run", help="run sections non-interactively and write the outputs")
+    run.add_argument(
+        "--sections", default=",".join(BATCH_SECTIONS),
+        help="comma-separated sections to run: " + ", ".join(BATCH_SECTIONS)
+    )
+    run.add_argument("--out", default="output", help="output directory (default: output)")
+    run.add_argument("--data", default=DATA_PATH, help="review CSV file, directory or glob pattern")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        args.sections = [s.strip() for s in args.sections.split(",") if s.strip()]
+        unknown = [s for s in args.sections if s not in BATCH_SECTIONS]
+        if unknown or not args.sections:
+            run.error("unknown sections: " + ", ".join(unknown) if unknown else "no sections given")
+    return args
+
+
 # ------------------------------------------------------------
 # Main Menu (with required input rules)
 # ------------------------------------------------------------
 def main():
-    df = load_and_clean_data()
-
     while True:
         print("\n" + "=" * 50)
         print("HOTEL ANALYTICS - MAIN MENU")
@@ -217,9 +542,9 @@ def main():
             case 1:
                 section_1_info()
             case 2:
-                section_2_analytics(df)
+                section_2_analytics(load_data())
             case 3:
-                section_3_prediction(df)
+                section_3_prediction(load_data())
             case 4:
                 section_4_help()
             case 5:
@@ -228,4 +553,15 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    if args.instrument:
+        instrumentation.enable(*[instrumentation.parse_sink(s) for s in args.instrument])
+    instrumentation.enable_from_env()
+    if args.result_cache:
+        result_cache.configure(cache_dir=args.result_cache)
+    if instrumentation.is_enabled():
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    if args.command == "run":
+        run_batch(args.sections, args.out, args.data)
+    else:
+        main()
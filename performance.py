@@ -1,90 +1,441 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+
+from instrumentation import instrumented
+from result_cache import cached
+from review_store import bincount_stats, encode_keys, stats_table
+
+# Amenity flags packed into the "yes"/"no" bitmasks of the aggregate store
+AMENITY_COLS = ["Pool", "Gym", "Tennis court", "Spa", "Casino", "Free internet"]
+
+
+def amenity_bits(*names):
+    """
+    Bitmask for the given amenity columns (see AMENITY_COLS).
+    """
+    bits = 0
+    for name in names:
+        bits |= 1 << AMENITY_COLS.index(name)
+    return bits
+
+
+@instrumented
+@cached
+def build_hotel_aggregates(df, offset=0):
+    """
+    Aggregate all reviews in one group-by pass into a store shared by the
+    hotel rankings below:
+    - "detail": sums, counts and maxima per hotel x continent x country x
+      amenity pattern (bitmasks of the amenities that are YES / NO), and the
+      position of the first row (offset + row number, as in dimension_stats)
+    - "hotel": the same measures rolled up per hotel, with one "any" flag per amenity
+    """
+    yes = np.zeros(len(df), dtype=np.int64)
+    no = np.zeros(len(df), dtype=np.int64)
+    for i, c in enumerate(AMENITY_COLS):
+        yes |= (df[c] == True).fillna(False).to_numpy(dtype=np.int64) << i
+        no |= (df[c] == False).fillna(False).to_numpy(dtype=np.int64) << i
+    yes = pd.Series(yes, index=df.index, name="yes")
+    no = pd.Series(no, index=df.index, name="no")
+
+    # Measures as float64, as on the untyped frame (sums of the nullable
+    # Int32 columns would stay Int32 and can overflow)
+    measures = ["Score", "Helpful votes", "Nr. rooms", "Hotel stars"]
+    values = pd.DataFrame({c: df[c].to_numpy(dtype=float, na_value=np.nan) for c in measures}, index=df.index)
+    values["position"] = np.arange(offset, offset + len(df))
+
+    detail = (
+        values.groupby(
+            [df["Hotel name"], df["User continent"], df["User country"], yes, no],
+            observed=True,
+            dropna=False,
+        )
+        .agg(
+            score_sum=("Score", "sum"),
+            score_count=("Score", "count"),
+            helpful_sum=("Helpful votes", "sum"),
+            helpful_count=("Helpful votes", "count"),
+            rows=("Score", "size"),
+            rooms=("Nr. rooms", "max"),
+            stars=("Hotel stars", "max"),
+            first=("position", "min"),
+        )
+        .reset_index()
+    )
+    detail = detail[detail["Hotel name"].notna()].reset_index(drop=True)
+    hotel = _rollup_hotels(detail)
+
+    return {"detail": detail, "hotel": hotel, "amenities": build_amenity_index(detail, hotel)}
+
+
+def _rollup_hotels(detail):
+    flags = {c: (detail["yes"] & amenity_bits(c)) != 0 for c in AMENITY_COLS}
+
+    hotel = (
+        detail.assign(**flags)
+              .groupby("Hotel name", as_index=False, observed=True)
+              .agg(
+                  score_sum=("score_sum", "sum"),
+                  score_count=("score_count", "sum"),
+                  helpful_sum=("helpful_sum", "sum"),
+                  helpful_count=("helpful_count", "sum"),
+                  rows=("rows", "sum"),
+                  rooms=("rooms", "max"),
+                  stars=("stars", "max"),
+                  **{c: (c, "any") for c in AMENITY_COLS}
+              )
+    )
+    hotel["avg_score"] = (hotel["score_sum"] / hotel["score_count"]).astype(float)
+    hotel["avg_helpful"] = (hotel["helpful_sum"] / hotel["helpful_count"]).astype(float)
+    hotel["reviews"] = hotel["score_count"].astype("int64")
+    return hotel
+
+
+def merge_hotel_aggregates(*aggs):
+    """
+    Merge aggregate stores built on separate batches of reviews into the
+    store of the combined reviews.
+    """
+    keys = ["Hotel name", "User continent", "User country", "yes", "no"]
+    detail = (
+        pd.concat([a["detail"] for a in aggs], ignore_index=True)
+          .groupby(keys, as_index=False, observed=True, dropna=False)
+          .agg(
+              score_sum=("score_sum", "sum"),
+              score_count=("score_count", "sum"),
+              helpful_sum=("helpful_sum", "sum"),
+              helpful_count=("helpful_count", "sum"),
+              rows=("rows", "sum"),
+              rooms=("rooms", "max"),
+              stars=("stars", "max"),
+              first=("first", "min"),
+          )
+    )
+    hotel = _rollup_hotels(detail)
+    return {"detail": detail, "hotel": hotel, "amenities": build_amenity_index(detail, hotel)}
+
+
+AMENITY_MEASURES = ["score_sum", "score_count", "helpful_sum", "helpful_count", "rows", "rooms", "stars"]
+
+
+def build_amenity_index(detail, hotel=None):
+    """
+    Hotel aggregates per amenity pattern: {(yes bits, no bits): (hotel
+    codes, per-hotel sums, counts and maxima of the reviews with exactly that
+    pattern)}. There are at most 3^6 patterns (each amenity YES, NO or
+    missing); hotel (the rolled-up table) provides the output column types.
+    """
+    if hotel is None:
+        hotel = _rollup_hotels(detail)
+
+    codes, hotels = encode_keys(detail["Hotel name"])
+    codes = codes.astype(np.int64)
+    values = detail[AMENITY_MEASURES].to_numpy(dtype=float, na_value=np.nan)
+    pattern = detail["yes"].to_numpy(dtype=np.int64) << 8 | detail["no"].to_numpy(dtype=np.int64)
+    keep = codes >= 0
+
+    patterns = {}
+    for key in np.unique(pattern[keep]):
+        rows = keep & (pattern == key)
+        hotel_codes, inverse = np.unique(codes[rows], return_inverse=True)
+        patterns[(int(key >> 8), int(key & 0xFF))] = (hotel_codes, _sum_max(inverse, len(hotel_codes), values[rows]))
+
+    if isinstance(detail["Hotel name"].dtype, pd.CategoricalDtype):
+        hotels = pd.Categorical.from_codes(np.arange(len(hotels)), dtype=detail["Hotel name"].dtype)
+    return {"hotels": pd.Series(hotels, dtype=hotel["Hotel name"].dtype), "dtypes": hotel.dtypes, "patterns": patterns}
+
+
+def _sum_max(codes, n, values):
+    # Per code: sums of the count/sum measures, maxima of rooms and stars
+    out = np.empty((n, len(AMENITY_MEASURES)))
+    for j, m in enumerate(AMENITY_MEASURES):
+        x = values[:, j]
+        if m in ("rooms", "stars"):
+            best = np.full(n, -np.inf)
+            np.fmax.at(best, codes, x)
+            out[:, j] = np.where(np.isinf(best), np.nan, best)
+        else:
+            out[:, j] = np.bincount(codes, weights=np.nan_to_num(x), minlength=n)
+    return out
+
+
+def query_amenities(agg, required=(), forbidden=()):
+    """
+    Hotels rolled up over the reviews that list every amenity in required
+    as YES and every amenity in forbidden as NO, e.g.
+    query_amenities(agg, ["Pool", "Spa"], ["Casino"]). Only the matching
+    patterns of the amenity index are read, so the cost grows with the
+    number of matching hotels, not reviews. Same columns as agg["hotel"].
+    """
+    index = agg["amenities"]
+    need, avoid = amenity_bits(*required), amenity_bits(*forbidden)
+    matches = [
+        (yes, codes, values)
+        for (yes, no), (codes, values) in index["patterns"].items()
+        if (yes & need) == need and (no & avoid) == avoid
+    ]
+
+    n = len(index["hotels"])
+    codes = np.concatenate([m[1] for m in matches] + [np.empty(0, dtype=np.int64)])
+    values = np.concatenate([m[2] for m in matches] + [np.empty((0, len(AMENITY_MEASURES)))])
+    yes = np.concatenate([np.full(len(m[1]), m[0]) for m in matches] + [np.empty(0, dtype=np.int64)])
+
+    totals = _sum_max(codes, n, values)
+    bits = np.zeros(n, dtype=np.int64)
+    np.bitwise_or.at(bits, codes, yes)
+    found = np.bincount(codes, minlength=n) > 0
+
+    columns = {"Hotel name": index["hotels"][found].reset_index(drop=True)}
+    columns.update({m: totals[found, j] for j, m in enumerate(AMENITY_MEASURES)})
+    columns.update({c: (bits[found] & amenity_bits(c)) != 0 for c in AMENITY_COLS})
+    with np.errstate(divide="ignore", invalid="ignore"):
+        columns["avg_score"] = columns["score_sum"] / columns["score_count"]
+        columns["avg_helpful"] = columns["helpful_sum"] / columns["helpful_count"]
+    columns["reviews"] = columns["score_count"]
+
+    hotel = pd.DataFrame(columns)
+    cast = {c: t for c, t in index["dtypes"].items() if hotel[c].dtype != t}
+    return hotel.astype(cast) if cast else hotel
+
+
+@instrumented
+def dimension_stats(df, key, offset=0):
+    """
+    Mergeable statistics per value of key (a column name or a Series aligned
+    with df): number of rows, position of the first row (offset + row number,
+    used to break count ties like value_counts) and count, sum and sum of
+    squares of Score and Helpful votes.
+    """
+    keys = df[key] if isinstance(key, str) else key
+
+    # Integer codes per key value, aggregated with np.bincount
+    codes, categories = encode_keys(keys)
+    stats = bincount_stats(
+        codes,
+        len(categories),
+        df["Score"].to_numpy(dtype=float, na_value=np.nan),
+        df["Helpful votes"].to_numpy(dtype=float, na_value=np.nan),
+        np.arange(offset, offset + len(df)),
+    )
+
+    if isinstance(keys.dtype, pd.CategoricalDtype):
+        index = pd.CategoricalIndex(
+            pd.Categorical.from_codes(np.arange(len(categories)), dtype=keys.dtype), name=keys.name
+        )
+    else:
+        index = pd.Index(categories, name=keys.name)
+    return stats_table(stats, index)
+
+
+def merge_dimension_stats(*tables):
+    """
+    Merge dimension_stats tables of separate batches.
+    """
+    how = {c: "sum" for c in tables[0].columns}
+    how["first"] = "min"
+    return pd.concat(tables).groupby(level=0).agg(how)
+
+
+def top_counts(table, n):
+    """
+    The n most frequent values of a dimension_stats table, in value_counts
+    form (ties keep first-appearance order).
+    """
+    return (
+        table.sort_values(["rows", "first"], ascending=[False, True])["rows"]
+             .head(n)
+             .astype("int64")
+             .rename("count")
+    )
+
+
+def partition_by(func, df, *args, col="City", **kwargs):
+    """
+    Run one of the analytics functions on every partition of df (e.g. per
+    "City" or "Source file" from cleaning.load_sources) and combine the
+    outputs: tables get a leading col column, Series a leading index level,
+    tuples and dicts are combined element by element.
+    """
+    parts = [
+        (key, func(part, *args, **kwargs))
+        for key, part in df.groupby(col, observed=True, sort=True)
+    ]
+    return _combine_partitions(parts, col)
+
+
+def _combine_partitions(parts, col):
+    first = parts[0][1] if parts else None
+
+    if isinstance(first, tuple):
+        return tuple(_combine_partitions([(k, r[i]) for k, r in parts], col) for i in range(len(first)))
+    if isinstance(first, dict):
+        return {name: _combine_partitions([(k, r[name]) for k, r in parts], col) for name in first}
+    if isinstance(first, pd.DataFrame):
+        tables = [r.assign(**{col: k})[[col] + list(r.columns)] for k, r in parts]
+        return pd.concat(tables, ignore_index=True)
+    if isinstance(first, pd.Series):
+        return pd.concat({k: r for k, r in parts}, names=[col])
+    return pd.Series({k: r for k, r in parts}).rename_axis(col)
+
 
 # Step 1
-def top5_hotels(df):
+@instrumented
+@cached
+def top5_hotels(df, agg=None, n=5):
+    if agg is None:
+        agg = build_hotel_aggregates(df)
+
     result = (
-        df.groupby("Hotel name", as_index=False)
-          .agg(avg_score=("Score", "mean"), reviews=("Score", "count"))
+        agg["hotel"][["Hotel name", "avg_score", "reviews"]]
           .sort_values(["avg_score", "reviews"], ascending=[False, False])
-          .head(5)
+          .head(n)
           .reset_index(drop=True)
     )
     return result
 
 # Step 2
-def top10_hotels_europe(df):
-    eu = df[df["User continent"] == "Europe"]
+@instrumented
+@cached
+def top10_hotels_europe(df, agg=None, cube=None):
+    if cube is not None:
+        eu = _europe_hotels_from_cube(cube)
+    else:
+        if agg is None:
+            agg = build_hotel_aggregates(df)
+        detail = agg["detail"]
+        eu = _rollup_hotels(detail[detail["User continent"] == "Europe"])
+
     result = (
-        eu.groupby("Hotel name", as_index=False)
-          .agg(avg_score=("Score", "mean"), reviews=("Score", "count"))
+        eu[["Hotel name", "avg_score", "reviews"]]
           .sort_values(["avg_score", "reviews"], ascending=[False, False])
           .head(10)
           .reset_index(drop=True)
     )
     return result
 
+
+def _europe_hotels_from_cube(cube):
+    from cube import rollup
+
+    table = rollup(cube, ["Hotel name", "User continent"])
+    table = table[table.index.get_level_values("User continent") == "Europe"].droplevel("User continent")
+    return pd.DataFrame({
+        "Hotel name": table.index,
+        "avg_score": (table["score_sum"] / table["score_count"]).to_numpy(),
+        "reviews": table["score_count"].to_numpy(dtype="int64"),
+    })
+
 # Step 3
-def bottom5_hotels_all_amenities(df):
-    sub = df[
-        (df["Tennis court"] == True) &
-        (df["Gym"] == True) &
-        (df["Spa"] == True) &
-        (df["Casino"] == True)
-    ]
+MAJOR_AMENITIES = ["Tennis court", "Gym", "Spa", "Casino"]
+
+@instrumented
+@cached
+def bottom5_hotels_all_amenities(df, agg=None):
+    if agg is None:
+        agg = build_hotel_aggregates(df)
+
+    sub = query_amenities(agg, required=MAJOR_AMENITIES)
 
     result = (
-        sub.groupby("Hotel name", as_index=False)
-           .agg(avg_score=("Score", "mean"), reviews=("Score", "count"))
+        sub[["Hotel name", "avg_score", "reviews"]]
            .sort_values(["avg_score", "reviews"], ascending=[True, False])
            .head(5)
            .reset_index(drop=True)
     )
     return result
 
-# Step 4
-def top10_hotels_review_volume_with_countries(df):
-    top10 = (
-        df.groupby("Hotel name")["Score"]
-          .size()
-          .sort_values(ascending=False)
-          .head(10)
+# Ranking stability of steps 1 and 3
+@instrumented
+@cached
+def top5_hotels_bootstrap(df, n=5, n_boot=10_000, random_state=0):
+    """
+    Bootstrap CI of every hotel's average Score and the share of resamples
+    in which it is among the top n (see bootstrap.py).
+    """
+    from bootstrap import ranking_bootstrap
+
+    return ranking_bootstrap(df, k=n, n_boot=n_boot, random_state=random_state)
+
+@instrumented
+@cached
+def bottom5_hotels_all_amenities_bootstrap(df, n_boot=10_000, random_state=0):
+    """
+    As top5_hotels_bootstrap for the bottom 5 of step 3, resampling the
+    reviews that list all major amenities as YES.
+    """
+    from bootstrap import ranking_bootstrap
+
+    sub = df[(df[MAJOR_AMENITIES] == True).fillna(False).all(axis=1)]
+    return ranking_bootstrap(sub, k=5, largest=False, n_boot=n_boot, random_state=random_state)
+
+@instrumented
+@cached
+def top_k_per_group(df, group_col, value_col, n=10, k=3):
+    """
+    Top-k most frequent values of value_col within each of the n largest
+    groups of group_col, from one grouped count plus a ranked selection.
+    Ties keep first-appearance order, like value_counts.
+    Returns (group sizes, largest first; long table with group_col,
+    value_col and count).
+    """
+    pos = pd.Series(np.arange(len(df)), index=df.index)
+    pairs = (
+        pos.groupby([df[group_col], df[value_col]], observed=True, dropna=False)
+           .agg(["size", "min"])
+           .rename(columns={"size": "count", "min": "first"})
+           .reset_index()
     )
+    pairs = pairs[pairs[group_col].notna()]
 
-    rows = []
-    for hotel, n in top10.items():
-        top_countries = (
-            df[df["Hotel name"] == hotel]["User country"]
-              .value_counts()
-              .head(3)
-        )
+    # Group sizes include rows where value_col is missing
+    sizes = (
+        pairs.groupby(group_col, observed=True)["count"]
+             .sum()
+             .sort_values(ascending=False, kind="stable")
+             .head(n)
+    )
 
-        top_countries_str = ", ".join(
-            [country + " (" + str(count) + ")" for country, count in top_countries.items()]
-        )
+    rank = pd.Series(np.arange(len(sizes)), index=sizes.index)
+    top = pairs[pairs[value_col].notna() & pairs[group_col].isin(sizes.index)].copy()
+    top["group_rank"] = top[group_col].map(rank).astype("int64")
+    top = top.sort_values(["group_rank", "count", "first"], ascending=[True, False, True])
+    top = top[top.groupby("group_rank").cumcount() < k]
 
-        rows.append({
-            "Hotel name": hotel,
-            "reviews": int(n),
-            "top_countries": top_countries_str
-        })
+    return sizes, top[[group_col, value_col, "count"]].reset_index(drop=True)
 
-    return pd.DataFrame(rows)
+
+# Step 4
+@instrumented
+@cached
+def top10_hotels_review_volume_with_countries(df, n=10, k=3):
+    sizes, top = top_k_per_group(df, "Hotel name", "User country", n=n, k=k)
+
+    labels = top["User country"].astype(str) + " (" + top["count"].astype(str) + ")"
+    top_countries = labels.groupby(top["Hotel name"], observed=True, sort=False).agg(", ".join)
+
+    return pd.DataFrame({
+        "Hotel name": sizes.index,
+        "reviews": sizes.to_numpy(dtype="int64"),
+        "top_countries": top_countries.reindex(sizes.index, fill_value="").to_numpy()
+    })
 
 # Step 5
-def continent_summary(df):
-    counts = df["User continent"].value_counts()
+@instrumented
+@cached
+def continent_summary(df, review_stats=None):
+    if review_stats is None:
+        table = dimension_stats(df, "User continent")
+    else:
+        table = review_stats["User continent"]
 
-    stats = (
-        df.groupby("User continent", as_index=False)
-          .agg(
-              avg_score=("Score", "mean"),
-              avg_helpful=("Helpful votes", "mean"),
-              reviews=("Score", "count")
-          )
-          .reset_index(drop=True)
-    )
+    counts = top_counts(table, len(table))
+
+    stats = pd.DataFrame({
+        "User continent": table.index,
+        "avg_score": (table["score_sum"] / table["score_count"]).to_numpy(),
+        "avg_helpful": (table["helpful_sum"] / table["helpful_count"]).to_numpy(),
+        "reviews": table["score_count"].to_numpy(dtype="int64"),
+    })
 
     top3_score = stats.sort_values("avg_score", ascending=False).head(3).reset_index(drop=True)
     top3_helpful = stats.sort_values("avg_helpful", ascending=False).head(3).reset_index(drop=True)
@@ -92,14 +443,23 @@ def continent_summary(df):
     return counts, stats, top3_score, top3_helpful
 
 # Step 6
-def no_free_internet_summary(df):
-    no_net = df[df["Free internet"] == False]
+@instrumented
+@cached
+def no_free_internet_summary(df, agg=None):
+    if agg is None:
+        agg = build_hotel_aggregates(df)
 
-    top3_countries = no_net["User country"].value_counts().head(3)
+    detail = agg["detail"]
+    no_net = detail[(detail["no"] & amenity_bits("Free internet")) != 0]
+
+    top3_countries = top_counts(
+        no_net.groupby("User country", observed=True).agg(rows=("rows", "sum"), first=("first", "min")), 3
+    )
 
     top3_hotels = (
-        no_net.groupby("Hotel name", as_index=False)
-              .agg(avg_helpful=("Helpful votes", "mean"), reviews=("Helpful votes", "count"))
+        query_amenities(agg, forbidden=["Free internet"])
+              .assign(reviews=lambda h: h["helpful_count"].astype("int64"))
+              [["Hotel name", "avg_helpful", "reviews"]]
               .sort_values(["avg_helpful", "reviews"], ascending=[False, False])
               .head(3)
               .reset_index(drop=True)
@@ -108,19 +468,13 @@ def no_free_internet_summary(df):
     return top3_countries, top3_hotels
 
 # Step 7
-def top5_hotels_by_rooms_meeting_conditions(df):
-    hotel = (
-        df.groupby("Hotel name", as_index=False)
-          .agg(
-              rooms=("Nr. rooms", "max"),
-              stars=("Hotel stars", "max"),
-              avg_score=("Score", "mean"),
-              reviews=("Score", "count"),
-              free_net=("Free internet", "any"),
-              gym=("Gym", "any"),
-              pool=("Pool", "any")
-          )
-    )
+@instrumented
+@cached
+def top5_hotels_by_rooms_meeting_conditions(df, agg=None):
+    if agg is None:
+        agg = build_hotel_aggregates(df)
+
+    hotel = agg["hotel"].rename(columns={"Free internet": "free_net", "Gym": "gym", "Pool": "pool"})
 
     ok = hotel[
         (hotel["stars"] >= 4) &
@@ -140,10 +494,18 @@ def top5_hotels_by_rooms_meeting_conditions(df):
     return result[["Hotel name", "rooms", "stars", "avg_score", "reviews", "free_net", "gym", "pool"]]
 
 # Step 8
-def most_frequent_fields(df):
+@instrumented
+@cached
+def most_frequent_fields(df, review_stats=None):
+    if review_stats is None:
+        review_stats = {
+            c: dimension_stats(df, c)
+            for c in ["Review month", "Review weekday", "Traveler type", "Period of stay"]
+        }
+
     return {
-        "top_months": df["Review month"].value_counts().head(3),
-        "top_weekdays": df["Review weekday"].value_counts().head(3),
-        "top_traveler_type": df["Traveler type"].value_counts().head(1),
-        "top_period": df["Period of stay"].value_counts().head(1),
+        "top_months": top_counts(review_stats["Review month"], 3),
+        "top_weekdays": top_counts(review_stats["Review weekday"], 3),
+        "top_traveler_type": top_counts(review_stats["Traveler type"], 1),
+        "top_period": top_counts(review_stats["Period of stay"], 1),
     }
\ No newline at end of file
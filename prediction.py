@@ -2,12 +2,18 @@ import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
-from sklearn.linear_model import LinearRegression
+from sklearn.model_selection import train_test_split, RepeatedKFold
+from sklearn.preprocessing import StandardScaler, PolynomialFeatures
+from sklearn.linear_model import LinearRegression, Ridge, Lasso
 from sklearn.metrics import r2_score, mean_squared_error
 
+from instrumentation import instrumented
+from result_cache import cached
+from rendering import draw_spec, reduce_points
 
+
+@instrumented
+@cached
 def prepare_model_data(df):
     """
     Creates X (features) and y (target) for the regression model.
@@ -49,6 +55,8 @@ def prepare_model_data(df):
     return X, y, numeric_cols, amenity_cols
 
 
+@instrumented
+@cached
 def split_data(X, y, test_size=0.2, random_state=42):
     """
     Step 16: Split data into train and test sets.
@@ -56,6 +64,8 @@ def split_data(X, y, test_size=0.2, random_state=42):
     return train_test_split(X, y, test_size=test_size, random_state=random_state)
 
 
+@instrumented
+@cached
 def fit_linear_regression(X_train, y_train, numeric_cols):
     """
     Step 17: Fit a Linear Regression model.
@@ -76,6 +86,8 @@ def fit_linear_regression(X_train, y_train, numeric_cols):
     return model, scaler
 
 
+@instrumented
+@cached
 def evaluate_model(model, scaler, X_test, y_test, numeric_cols):
     """
     Step 18: Compute R2 and MSE on test set.
@@ -92,6 +104,239 @@ def evaluate_model(model, scaler, X_test, y_test, numeric_cols):
     return r2, mse, y_pred
 
 
+def model_data_chunks(chunks):
+    """
+    Out-of-core variant of prepare_model_data: yields (X, y) for every
+    cleaned chunk (e.g. from cleaning.iter_clean_chunks). Chunks bypass the
+    result cache, so only one chunk's X and y is held at a time.
+    """
+    prepare = instrumented(prepare_model_data.uncached)
+    for chunk in chunks:
+        X, y, _, _ = prepare(chunk)
+        yield X, y
+
+
+def stream_split(xy_chunks, part="train", test_size=0.2, random_state=42):
+    """
+    Streaming train/test split: keeps the rows of each (X, y) chunk that
+    belong to part ("train" or "test"). Rows are assigned by a hash of their
+    index, so every pass over the same data splits it the same way.
+    """
+    key = f"{random_state:016d}"[-16:]
+    for X, y in xy_chunks:
+        h = pd.util.hash_array(X.index.to_numpy(), hash_key=key)
+        is_test = (h % 10_000) < test_size * 10_000
+        keep = is_test if part == "test" else ~is_test
+        yield X[keep], y[keep]
+
+
+def accumulate_moments(xy_chunks):
+    """
+    Sufficient statistics of (X, y) over all chunks: row count, column
+    means and the centered cross-product matrix of [X, y], merged chunk by
+    chunk (Chan et al.), so X'X, X'y and the scaler's means and variances
+    are available without holding X in memory.
+    """
+    n, mean, comoment, columns = 0, None, None, None
+
+    for X, y in xy_chunks:
+        if len(X) == 0:
+            continue
+        Z = np.column_stack([X.to_numpy(dtype=float), y.to_numpy(dtype=float)])
+        m = Z.mean(axis=0)
+        C = (Z - m).T @ (Z - m)
+
+        if n == 0:
+            n, mean, comoment, columns = len(Z), m, C, list(X.columns)
+            continue
+
+        total = n + len(Z)
+        delta = m - mean
+        comoment = comoment + C + np.outer(delta, delta) * n * len(Z) / total
+        mean = mean + delta * len(Z) / total
+        n = total
+
+    return {"n": n, "mean": mean, "comoment": comoment, "columns": columns}
+
+
+@instrumented
+def fit_linear_regression_streaming(xy_chunks, numeric_cols):
+    """
+    Step 17 (out-of-core): same model as fit_linear_regression, solved once
+    from the accumulated moments instead of a materialized X.
+    Returns a fitted LinearRegression and StandardScaler.
+    """
+    stats = accumulate_moments(xy_chunks)
+    if stats["n"] == 0:
+        raise ValueError("No rows to fit the model on.")
+
+    columns = stats["columns"]
+    p = len(columns)
+    mean, cov = stats["mean"], stats["comoment"] / stats["n"]
+
+    # Least squares on centered data: Cxx b = Cxy
+    beta = np.linalg.lstsq(cov[:p, :p], cov[:p, p], rcond=None)[0]
+
+    is_num = np.array([c in numeric_cols for c in columns])
+    num_idx = np.flatnonzero(is_num)
+
+    scaler = StandardScaler()
+    scaler.mean_ = mean[num_idx]
+    scaler.var_ = np.diag(cov)[num_idx]
+    scaler.scale_ = np.where(scaler.var_ > 0, np.sqrt(scaler.var_), 1.0)
+    scaler.n_samples_seen_ = stats["n"]
+    scaler.n_features_in_ = len(num_idx)
+    scaler.feature_names_in_ = np.array(columns, dtype=object)[num_idx]
+
+    # Coefficients of the standardized numeric columns
+    coef = beta.copy()
+    coef[num_idx] = beta[num_idx] * scaler.scale_
+    x_mean = np.where(is_num, 0.0, mean[:p])
+
+    model = LinearRegression()
+    model.coef_ = coef
+    model.intercept_ = mean[p] - coef @ x_mean
+    model.n_features_in_ = p
+    model.feature_names_in_ = np.array(columns, dtype=object)
+
+    return model, scaler
+
+
+@instrumented
+def evaluate_model_streaming(model, scaler, xy_chunks, numeric_cols):
+    """
+    Step 18 (out-of-core): R2 and MSE accumulated chunk by chunk.
+    Returns (r2, mse). Raises ValueError if the chunks hold no rows.
+    """
+    n, sse, y_sum, y_sq = 0, 0.0, 0.0, 0.0
+
+    for X, y in xy_chunks:
+        if len(X) == 0:
+            continue
+        X_scaled = X.copy()
+        X_scaled[numeric_cols] = scaler.transform(X_scaled[numeric_cols])
+        y = y.to_numpy(dtype=float)
+
+        resid = y - model.predict(X_scaled)
+        n += len(y)
+        sse += resid @ resid
+        y_sum += y.sum()
+        y_sq += y @ y
+
+    if n == 0:
+        raise ValueError("No rows to evaluate the model on.")
+
+    sst = y_sq - y_sum ** 2 / n
+    if sst <= 0:
+        # Constant Score: as r2_score, 1 for a perfect fit, else 0
+        return (1.0 if sse == 0 else 0.0), sse / n
+    return 1 - sse / sst, sse / n
+
+
+def model_candidates(alphas=(0.01, 0.1, 1.0, 10.0, 100.0), interactions=(False, True)):
+    """
+    Model families for cross_validate_models: OLS, ridge and lasso over an
+    alpha grid, each with and without pairwise interaction features.
+    """
+    candidates = []
+    for inter in interactions:
+        suffix = " + interactions" if inter else ""
+        candidates.append({"name": "ols" + suffix, "family": "ols", "alpha": None, "interactions": inter})
+        for family in ["ridge", "lasso"]:
+            for alpha in alphas:
+                candidates.append({
+                    "name": f"{family}(alpha={alpha:g}){suffix}",
+                    "family": family,
+                    "alpha": alpha,
+                    "interactions": inter,
+                })
+    return candidates
+
+
+def _make_estimator(candidate):
+    if candidate["family"] == "ridge":
+        return Ridge(alpha=candidate["alpha"])
+    if candidate["family"] == "lasso":
+        return Lasso(alpha=candidate["alpha"], max_iter=10_000)
+    return LinearRegression()
+
+
+def _run_fold(X, y, numeric_cols, train_idx, test_idx, candidates, fold, repeat):
+    import time
+
+    # Scaled (and interaction) matrices are built once per fold and shared by all candidates
+    X_train, X_test = X.iloc[train_idx].copy(), X.iloc[test_idx].copy()
+    y_train, y_test = y.iloc[train_idx], y.iloc[test_idx]
+
+    scaler = StandardScaler()
+    X_train[numeric_cols] = scaler.fit_transform(X_train[numeric_cols])
+    X_test[numeric_cols] = scaler.transform(X_test[numeric_cols])
+
+    matrices = {False: (X_train.to_numpy(dtype=float), X_test.to_numpy(dtype=float))}
+    if any(c["interactions"] for c in candidates):
+        poly = PolynomialFeatures(degree=2, interaction_only=True, include_bias=False)
+        matrices[True] = (poly.fit_transform(matrices[False][0]), poly.transform(matrices[False][1]))
+
+    rows = []
+    for candidate in candidates:
+        A_train, A_test = matrices[candidate["interactions"]]
+
+        start = time.perf_counter()
+        model = _make_estimator(candidate).fit(A_train, y_train)
+        y_pred = model.predict(A_test)
+        seconds = time.perf_counter() - start
+
+        rows.append({
+            "candidate": candidate["name"],
+            "repeat": repeat,
+            "fold": fold,
+            "r2": r2_score(y_test, y_pred),
+            "mse": mean_squared_error(y_test, y_pred),
+            "fit_seconds": seconds,
+        })
+    return rows
+
+
+@instrumented
+@cached
+def cross_validate_models(X, y, numeric_cols, candidates=None, n_splits=5, n_repeats=1,
+                          random_state=42, n_jobs=-1):
+    """
+    Step 20: (repeated) k-fold cross-validation of several model candidates
+    (see model_candidates). Folds run in parallel (joblib, n_jobs); inside a
+    fold the scaled feature matrices are shared by all candidates.
+    Returns (summary per candidate sorted by mean R2, results per fold).
+    """
+    from joblib import Parallel, delayed
+
+    if candidates is None:
+        candidates = model_candidates()
+
+    splitter = RepeatedKFold(n_splits=n_splits, n_repeats=n_repeats, random_state=random_state)
+    tasks = (
+        delayed(_run_fold)(X, y, numeric_cols, train_idx, test_idx, candidates, i % n_splits, i // n_splits)
+        for i, (train_idx, test_idx) in enumerate(splitter.split(X))
+    )
+    results = pd.DataFrame([row for rows in Parallel(n_jobs=n_jobs)(tasks) for row in rows])
+
+    summary = (
+        results.groupby("candidate", as_index=False, sort=False)
+               .agg(
+                   mean_r2=("r2", "mean"),
+                   std_r2=("r2", "std"),
+                   mean_mse=("mse", "mean"),
+                   std_mse=("mse", "std"),
+                   mean_fit_seconds=("fit_seconds", "mean"),
+                   folds=("r2", "count"),
+               )
+               .sort_values("mean_r2", ascending=False)
+               .reset_index(drop=True)
+    )
+    return summary, results
+
+
+@instrumented
+@cached
 def coefficients_table(model, feature_names):
     """
     Step 19: Return a table of coefficients.
@@ -104,13 +349,24 @@ def coefficients_table(model, feature_names):
     return coefs
 
 
+@instrumented
+@cached
+def actual_vs_predicted_spec(y_test, y_pred, max_points=50_000):
+    return {
+        **reduce_points(y_test, y_pred, max_points),
+        "name": "actual_vs_predicted_score",
+        "alpha": 0.5,
+        "title": "Actual vs Predicted Score",
+        "xlabel": "Actual Score",
+        "ylabel": "Predicted Score",
+    }
+
+
+@instrumented
 def plot_actual_vs_predicted(y_test, y_pred):
     """
     Step 21 (optional): Scatter plot of actual vs predicted score.
     """
     plt.figure()
-    plt.scatter(y_test, y_pred, alpha=0.5)
-    plt.title("Actual vs Predicted Score")
-    plt.xlabel("Actual Score")
-    plt.ylabel("Predicted Score")
+    draw_spec(plt.gcf(), actual_vs_predicted_spec(y_test, y_pred))
     plt.show()
@@ -1,50 +1,83 @@
 import numpy as np
+import pandas as pd
 import matplotlib.pyplot as plt
 
+from correlation import pearson_corr, spearman_corr
+from instrumentation import instrumented
+from result_cache import cached
+from performance import dimension_stats, top_counts
+from rendering import draw_spec, reduce_points
+
 
 # Step 12
-def plot_member_years_vs_helpful_votes(df):
+@instrumented
+@cached
+def member_years_vs_helpful_votes_spec(df, max_points=50_000):
     data = df[["Member years", "Helpful votes"]].dropna()
+    return {
+        **reduce_points(data["Member years"], data["Helpful votes"], max_points),
+        "name": "relationship_member_years_helpful_votes",
+        "alpha": 0.4,
+        "title": "Member Years vs Helpful Votes",
+        "xlabel": "Member years",
+        "ylabel": "Helpful votes",
+    }
 
-    if len(data) > 1:
-        corr = data["Member years"].corr(data["Helpful votes"])
-    else:
-        corr = float("nan")
+
+@instrumented
+def plot_member_years_vs_helpful_votes(df):
+    corr = pearson_corr(df, ["Member years", "Helpful votes"]).iloc[0, 1]
 
     plt.figure()
-    plt.scatter(data["Member years"], data["Helpful votes"], alpha=0.4)
-    plt.title("Member Years vs Helpful Votes")
-    plt.xlabel("Member years")
-    plt.ylabel("Helpful votes")
+    draw_spec(plt.gcf(), member_years_vs_helpful_votes_spec(df))
     plt.show()
 
     return corr
 
 
 # Step 13
-def casino_score_comparison(df):
-    data = df[["Casino", "Score"]].dropna()
-
-    # Convert Casino to True/False (YES -> True, everything else -> False)
+def casino_key(df):
+    """
+    "YES"/"NO" per review from the Casino column (YES -> True, everything
+    else -> False), missing where Casino is missing.
+    """
     casino_is_yes = (
-        data["Casino"].astype(str).str.strip().str.upper().isin(["YES", "Y", "TRUE", "1"])
+        df["Casino"].astype(str).str.strip().str.upper().isin(["YES", "Y", "TRUE", "1"])
     )
-    data = data.copy()
-    data["casino"] = np.where(casino_is_yes, "YES", "NO")
+    key = pd.Series(np.where(casino_is_yes, "YES", "NO"), index=df.index, name="casino")
+    return key.where(df["Casino"].notna())
 
-    result = (
-        data.groupby("casino", as_index=False)
-            .agg(avg_score=("Score", "mean"), reviews=("Score", "count"))
-            .sort_values("casino")
-            .reset_index(drop=True)
-    )
+
+@instrumented
+@cached
+def casino_score_comparison(df, review_stats=None):
+    if review_stats is None:
+        table = dimension_stats(df, casino_key(df))
+    else:
+        table = review_stats["casino"]
+
+    # Only reviews with both Casino and Score count
+    table = table[table["score_count"] > 0].sort_index()
+
+    result = pd.DataFrame({
+        "casino": table.index,
+        "avg_score": (table["score_sum"] / table["score_count"]).to_numpy(),
+        "reviews": table["score_count"].to_numpy(dtype="int64"),
+    })
     return result
 
 
 # Step 14
-def traveler_type_scores_for_one_hotel(df, hotel_name=None):
+@instrumented
+@cached
+def traveler_type_scores_for_one_hotel(df, hotel_name=None, cube=None):
+    if cube is not None:
+        return _traveler_type_scores_from_cube(cube, hotel_name)
+
     if hotel_name is None:
-        hotel_name = df["Hotel name"].value_counts().idxmax()
+        # Most reviewed hotel, ties by first appearance (as value_counts on
+        # the untyped frame)
+        hotel_name = top_counts(dimension_stats(df, "Hotel name"), 1).index[0]
 
     sub = df[df["Hotel name"] == hotel_name].copy()
 
@@ -58,17 +91,60 @@ def traveler_type_scores_for_one_hotel(df, hotel_name=None):
     return hotel_name, result
 
 
+def _traveler_type_scores_from_cube(cube, hotel_name=None):
+    from cube import rollup, slice_cube
+
+    if hotel_name is None:
+        # Most reviewed hotel, ties by first appearance
+        hotel_name = top_counts(rollup(cube, "Hotel name"), 1).index[0]
+
+    table = rollup(slice_cube(cube, "Hotel name", hotel_name), "Traveler type")
+    result = (
+        pd.DataFrame({
+            "Traveler type": table.index,
+            "avg_score": (table["score_sum"] / table["score_count"]).to_numpy(),
+            "reviews": table["score_count"].to_numpy(),
+        })
+        .sort_values(["avg_score", "reviews"], ascending=[False, False])
+        .reset_index(drop=True)
+    )
+    return hotel_name, result
+
+
 # Step 15
+@instrumented
+@cached
+def numeric_corr(df, method="pearson"):
+    """
+    Pairwise-complete correlation matrix of the numeric columns, computed
+    in chunks (see correlation.py) instead of on a copy without missing rows.
+    """
+    columns = list(df.select_dtypes(include=[np.number]).columns)
+    if method == "spearman":
+        return spearman_corr(df, columns)
+    return pearson_corr(df, columns)
+
+
+@instrumented
+def numeric_corr_heatmap_spec(corr):
+    return {
+        "kind": "heatmap",
+        "name": "correlation_heatmap",
+        "figsize": (8, 6),
+        "values": corr.to_numpy(dtype=float),
+        "columns": list(corr.columns),
+        "index": list(corr.index),
+        "title": "Correlation Heatmap (Numeric Variables)",
+        "xtick_rotation": 45,
+    }
+
+
+@instrumented
 def plot_numeric_corr_heatmap(df):
-    num = df.select_dtypes(include=[np.number]).dropna(axis=0, how="any")
-    corr = num.corr(numeric_only=True)
+    corr = numeric_corr(df)
 
     plt.figure(figsize=(8, 6))
-    plt.imshow(corr.values, aspect="auto")
-    plt.colorbar()
-    plt.xticks(range(len(corr.columns)), corr.columns, rotation=45, ha="right")
-    plt.yticks(range(len(corr.index)), corr.index)
-    plt.title("Correlation Heatmap (Numeric Variables)")
+    draw_spec(plt.gcf(), numeric_corr_heatmap_spec(corr))
     plt.show()
 
     return corr
@@ -0,0 +1,139 @@
+# ============================================================
+# Figure specs and parallel rendering
+# ============================================================
+# A spec is a plain dict of precomputed (and reduced) arrays plus labels,
+# so it can be pickled to worker processes. draw_spec draws it on a
+# matplotlib Figure through the object-oriented API only.
+import os
+
+import numpy as np
+
+
+def reduce_points(x, y, max_points=50_000, bins=100):
+    """
+    Scatter data for a spec: the points themselves up to max_points pairs,
+    otherwise a bins x bins 2D histogram of them, so the spec size (and the
+    render time) no longer grows with the number of rows.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if max_points is None or len(x) <= max_points:
+        return {"kind": "scatter", "x": x, "y": y}
+
+    counts, xedges, yedges = np.histogram2d(x, y, bins=bins)
+    return {"kind": "hist2d", "counts": counts, "xedges": xedges, "yedges": yedges}
+
+
+def box_stats(keys, values, whis=1.5, max_fliers=1_000):
+    """
+    Boxplot summaries per key (median, quartiles, whiskers at whis * IQR and
+    fliers, as matplotlib's boxplot computes them) from one sort of the data.
+    Returns {key: stats dict for Axes.bxp} in sorted key order. At most
+    max_fliers distinct flier values are kept per key.
+    """
+    import pandas as pd
+
+    values = np.asarray(values, dtype=float)
+    codes, uniques = pd.factorize(keys, sort=True)
+
+    order = np.lexsort((values, codes))
+    codes, values = codes[order], values[order]
+    starts = np.searchsorted(codes, np.arange(len(uniques) + 1))
+
+    stats = {}
+    for i, key in enumerate(uniques):
+        x = values[starts[i]:starts[i + 1]]
+        q1, med, q3 = np.percentile(x, [25, 50, 75])
+        iqr = q3 - q1
+
+        lo = x[np.searchsorted(x, q1 - whis * iqr, side="left")]
+        hi = x[np.searchsorted(x, q3 + whis * iqr, side="right") - 1]
+        whislo = q1 if lo > q1 else lo
+        whishi = q3 if hi < q3 else hi
+
+        fliers = np.unique(np.concatenate([x[x < whislo], x[x > whishi]]))
+        if len(fliers) > max_fliers:
+            fliers = fliers[np.linspace(0, len(fliers) - 1, max_fliers).astype(int)]
+
+        stats[key] = {
+            "med": med, "q1": q1, "q3": q3,
+            "whislo": whislo, "whishi": whishi,
+            "fliers": fliers, "label": str(key),
+        }
+    return stats
+
+
+def draw_spec(fig, spec):
+    """
+    Draw a figure spec on fig (a matplotlib Figure).
+    """
+    ax = fig.add_subplot()
+    kind = spec["kind"]
+
+    if kind == "hist":
+        edges = spec["edges"]
+        ax.hist(edges[:-1], bins=edges, weights=spec["counts"])
+        ax.grid(True)
+    elif kind == "boxplot":
+        ax.bxp(spec["stats"])
+    elif kind == "scatter":
+        ax.scatter(spec["x"], spec["y"], alpha=spec.get("alpha"))
+    elif kind == "hist2d":
+        from matplotlib.colors import LogNorm
+
+        counts = np.ma.masked_equal(spec["counts"].T, 0)
+        mesh = ax.pcolormesh(spec["xedges"], spec["yedges"], counts, norm=LogNorm())
+        fig.colorbar(mesh, ax=ax, label="Reviews")
+    elif kind == "heatmap":
+        image = ax.imshow(spec["values"], aspect="auto")
+        fig.colorbar(image, ax=ax)
+        ax.set_xticks(range(len(spec["columns"])), spec["columns"])
+        ax.set_yticks(range(len(spec["index"])), spec["index"])
+    else:
+        raise ValueError(f"Unknown figure kind: {kind!r}")
+
+    ax.set_title(spec["title"])
+    if spec.get("xlabel"):
+        ax.set_xlabel(spec["xlabel"])
+    if spec.get("ylabel"):
+        ax.set_ylabel(spec["ylabel"])
+    if spec.get("xtick_rotation"):
+        for label in ax.get_xticklabels():
+            label.set_rotation(spec["xtick_rotation"])
+            label.set_horizontalalignment("right")
+
+    return ax
+
+
+def render_spec(spec, out_dir="plots"):
+    """
+    Render one spec to out_dir/<name>.png without touching pyplot state.
+    Returns the path of the PNG.
+    """
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=spec.get("figsize", (6.4, 4.8)))
+    draw_spec(fig, spec)
+
+    path = os.path.join(out_dir, spec["name"] + ".png")
+    fig.savefig(path, bbox_inches="tight")
+    return path
+
+
+def render_specs(specs, out_dir="plots", max_workers=None):
+    """
+    Render specs concurrently in a process pool (Agg, one Figure per spec).
+    With max_workers=1 or a single spec they are rendered in this process.
+    Returns the PNG paths in the order of specs.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    os.makedirs(out_dir, exist_ok=True)
+    specs = list(specs)
+
+    if max_workers == 1 or len(specs) <= 1:
+        return [render_spec(spec, out_dir) for spec in specs]
+
+    workers = min(len(specs), max_workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(render_spec, specs, [out_dir] * len(specs)))
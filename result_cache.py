@@ -0,0 +1,301 @@
+# ============================================================
+# Result cache for analysis steps
+# ============================================================
+# @cached functions return a stored result when they are called again with
+# the same data and parameters. The key combines the function, a hash of
+# its module source and of every project module that module imports
+# (recursively, including imports inside functions) and a fingerprint of
+# every argument (frames are hashed by content), so results are recomputed
+# only when the data, a parameter or the code changes. Results live in an
+# in-memory LRU and, if a cache directory is configured, as pickles on disk
+# for later sessions (least recently used ones removed above a size cap).
+#
+# Cached results are shared between callers: treat them as read-only.
+import os
+import sys
+import pickle
+import hashlib
+import threading
+import functools
+from collections import OrderedDict
+
+# Bump to drop every on-disk result (e.g. after a pandas upgrade)
+RESULT_CACHE_VERSION = 1
+
+_SETTINGS = {"enabled": True, "maxsize": 128, "cache_dir": None, "disk_maxsize": 2 * 1024 ** 3}
+_MEMORY = OrderedDict()
+_STATS = {"hits": 0, "disk_hits": 0, "misses": 0}
+# Results on disk in cache_dir: path -> bytes, least recently used first.
+# Read from the directory once, then kept up to date on every store
+_DISK = {"dir": None, "files": OrderedDict(), "bytes": 0}
+# Guards _MEMORY, _STATS and _DISK when steps run in worker threads
+# (taskgraph.run_graph, analytics_service.py)
+_LOCK = threading.Lock()
+
+
+def configure(enabled=None, maxsize=None, cache_dir=None, disk_maxsize=None):
+    """
+    Change the cache settings. cache_dir turns on the on-disk tier
+    ("" turns it off again); maxsize is the number of results kept in memory,
+    disk_maxsize the bytes kept on disk.
+    """
+    if enabled is not None:
+        _SETTINGS["enabled"] = enabled
+    if maxsize is not None:
+        _SETTINGS["maxsize"] = maxsize
+        with _LOCK:
+            _evict()
+    if cache_dir is not None:
+        _SETTINGS["cache_dir"] = cache_dir or None
+    if disk_maxsize is not None:
+        _SETTINGS["disk_maxsize"] = disk_maxsize
+
+
+def clear_cache(disk=False):
+    """
+    Drop all in-memory results (and the on-disk ones with disk=True).
+    """
+    import shutil
+
+    with _LOCK:
+        _MEMORY.clear()
+        if disk and _SETTINGS["cache_dir"]:
+            shutil.rmtree(_SETTINGS["cache_dir"], ignore_errors=True)
+            _DISK["dir"] = None
+
+
+def cache_info():
+    with _LOCK:
+        return {**_STATS, "size": len(_MEMORY), "disk_bytes": _DISK["bytes"], **_SETTINGS}
+
+
+def frame_fingerprint(obj):
+    """
+    Content hash of a DataFrame or Series: values, index, column names and
+    dtypes. Computed on every call, so frames edited in place get a new one.
+    """
+    import pandas as pd
+
+    h = hashlib.sha256()
+    h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    if isinstance(obj, pd.DataFrame):
+        h.update(repr(list(obj.columns)).encode())
+        h.update(repr(list(obj.dtypes.astype(str))).encode())
+    else:
+        h.update(repr((obj.name, str(obj.dtype))).encode())
+    return h.hexdigest()
+
+
+def _fingerprint(value, h):
+    import numpy as np
+    import pandas as pd
+
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        h.update(b"F" + frame_fingerprint(value).encode())
+    elif isinstance(value, np.ndarray) and value.dtype != object:
+        h.update(b"A" + repr((value.dtype.str, value.shape)).encode() + np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        h.update(b"D%d" % len(value))
+        for k, v in value.items():
+            _fingerprint(k, h)
+            _fingerprint(v, h)
+    elif isinstance(value, (list, tuple)):
+        h.update(b"L%d" % len(value))
+        for v in value:
+            _fingerprint(v, h)
+    else:
+        # Fitted models and other objects by their pickled state
+        h.update(b"P" + pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def fingerprint(*values):
+    """
+    Content hash of any values, as used for cache keys (frames by content,
+    other objects by their pickled state).
+    """
+    h = hashlib.sha256()
+    _fingerprint(list(values), h)
+    return h.hexdigest()
+
+
+def code_fingerprint(func):
+    """
+    Hash of a function's name and the source of its module and the project
+    modules it uses, so results keyed on it are dropped when the code changes.
+    """
+    return hashlib.sha256(
+        f"{func.__module__}.{func.__qualname__}:{_module_hash(func.__module__)}".encode()
+    ).hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def _file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def _imports(path):
+    # Modules next to path that it imports anywhere (also inside functions)
+    import ast
+
+    with open(path, "rb") as f:
+        tree = ast.parse(f.read())
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(a.name.split(".")[0] for a in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module.split(".")[0])
+
+    folder = os.path.dirname(path)
+    return sorted(p for p in (os.path.join(folder, n + ".py") for n in names) if os.path.isfile(p))
+
+
+@functools.lru_cache(maxsize=None)
+def _module_hash(module_name):
+    module = sys.modules.get(module_name)
+    path = getattr(module, "__file__", None)
+    if not path or not os.path.isfile(path):
+        return ""
+
+    seen, todo = set(), [os.path.abspath(path)]
+    while todo:
+        path = todo.pop()
+        if path not in seen:
+            seen.add(path)
+            todo += _imports(path)
+
+    h = hashlib.sha256()
+    for path in sorted(seen):
+        h.update(f"{os.path.basename(path)}:{_file_hash(path)};".encode())
+    return h.hexdigest()
+
+
+def _evict():
+    while len(_MEMORY) > _SETTINGS["maxsize"]:
+        _MEMORY.popitem(last=False)
+
+
+def _disk_path(func, key):
+    return os.path.join(_SETTINGS["cache_dir"], func.__name__, key + ".pkl")
+
+
+def _load_disk(func, key):
+    path = _disk_path(func, key)
+    try:
+        with open(path, "rb") as f:
+            result = pickle.load(f)
+        os.utime(path)
+        with _LOCK:
+            if path in _disk_index():
+                _DISK["files"].move_to_end(path)
+        return True, result
+    except FileNotFoundError:
+        return False, None
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        # Unreadable or written by other code: recompute and overwrite
+        return False, None
+
+
+def _store_disk(func, key, result):
+    path = _disk_path(func, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except (pickle.PicklingError, TypeError, AttributeError):
+        # Not picklable: keep it in memory only
+        os.remove(tmp_path)
+        return
+
+    size = os.path.getsize(path)
+    with _LOCK:
+        files = _disk_index()
+        _DISK["bytes"] += size - files.pop(path, 0)
+        files[path] = size
+        _evict_disk()
+
+
+def _disk_index():
+    # Index of the results in cache_dir (under _LOCK). Built from the
+    # directory when the cache_dir is first used, oldest mtime first (disk
+    # hits refresh the mtime, so later sessions keep the LRU order)
+    if _DISK["dir"] != _SETTINGS["cache_dir"]:
+        found = []
+        for folder in os.scandir(_SETTINGS["cache_dir"]):
+            if folder.is_dir():
+                found += [(e.stat().st_mtime, e.path, e.stat().st_size) for e in os.scandir(folder.path)
+                          if e.name.endswith(".pkl")]
+        _DISK["files"] = OrderedDict((path, size) for _, path, size in sorted(found))
+        _DISK["bytes"] = sum(_DISK["files"].values())
+        _DISK["dir"] = _SETTINGS["cache_dir"]
+    return _DISK["files"]
+
+
+def _evict_disk():
+    # Remove the least recently used results until the cache fits in
+    # disk_maxsize (under _LOCK)
+    files = _DISK["files"]
+    while _DISK["bytes"] > _SETTINGS["disk_maxsize"] and files:
+        path, size = files.popitem(last=False)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        _DISK["bytes"] -= size
+
+
+def cached(func):
+    """
+    Decorator: memoize func on the fingerprint of its (bound) arguments.
+    Only for functions without side effects whose result is a table, a
+    figure spec or a model. wrapper.uncached calls func directly (e.g. for
+    streamed chunks, which are seen once).
+    """
+    import inspect
+
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _SETTINGS["enabled"]:
+            return func(*args, **kwargs)
+
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+
+        h = hashlib.sha256()
+        h.update(f"{RESULT_CACHE_VERSION}:{func.__module__}.{func.__qualname__}:".encode())
+        h.update(_module_hash(func.__module__).encode())
+        try:
+            _fingerprint(bound.arguments, h)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return func(*args, **kwargs)
+        key = h.hexdigest()
+
+        with _LOCK:
+            if key in _MEMORY:
+                _MEMORY.move_to_end(key)
+                _STATS["hits"] += 1
+                return _MEMORY[key]
+
+        found = False
+        if _SETTINGS["cache_dir"]:
+            found, result = _load_disk(func, key)
+        with _LOCK:
+            _STATS["disk_hits" if found else "misses"] += 1
+        if not found:
+            result = func(*args, **kwargs)
+            if _SETTINGS["cache_dir"]:
+                _store_disk(func, key, result)
+
+        with _LOCK:
+            _MEMORY[key] = result
+            _evict()
+        return result
+
+    wrapper.uncached = func
+    return wrapper
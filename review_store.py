@@ -0,0 +1,189 @@
+# ============================================================
+# Dictionary-encoded review store
+# ============================================================
+# The string dimensions of the reviews are kept as small integer codes into
+# one lookup table per dimension, the amenity flags as two bitmasks (YES and
+# NO, bit order of performance.AMENITY_COLS) and the numeric columns as
+# float32 arrays. Aggregations run on the codes with np.bincount instead of
+# hashing strings in a group-by.
+import numpy as np
+import pandas as pd
+
+STORE_DIMENSIONS = [
+    "Hotel name",
+    "User country",
+    "User continent",
+    "Traveler type",
+    "Period of stay",
+    "Review month",
+    "Review weekday",
+]
+
+STORE_VALUES = [
+    "Score",
+    "Helpful votes",
+    "Nr. reviews",
+    "Nr. hotel reviews",
+    "Member years",
+    "Nr. rooms",
+    "Hotel stars",
+]
+
+
+def _code_dtype(n_categories):
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def encode_keys(keys, categories=None):
+    """
+    Integer codes (-1 for missing) and the sorted lookup table of a key
+    Series. Categorical keys keep their own categories; with categories
+    given, values are coded against that table (unknown values get -1).
+    """
+    if categories is not None:
+        codes = pd.Index(categories).get_indexer(keys)
+    elif isinstance(keys.dtype, pd.CategoricalDtype):
+        codes, categories = keys.cat.codes.to_numpy(), keys.cat.categories
+    else:
+        codes, categories = pd.factorize(keys, sort=True)
+    return codes.astype(_code_dtype(len(categories)), copy=False), categories
+
+
+def bincount_stats(codes, n_groups, score, helpful, pos):
+    """
+    Kernel of dimension_stats: rows, first position and count, sum and sum
+    of squares of score and helpful per code (codes < 0 are skipped).
+    Returns a dict of arrays of length n_groups.
+    """
+    keep = codes >= 0
+    codes, score, helpful, pos = codes[keep], score[keep], helpful[keep], pos[keep]
+
+    stats = {"rows": np.bincount(codes, minlength=n_groups)}
+    first = np.full(n_groups, np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(first, codes, pos)
+    stats["first"] = first
+
+    for name, values in (("score", score), ("helpful", helpful)):
+        present = ~np.isnan(values)
+        x = np.where(present, values, 0.0)
+        stats[name + "_sum"] = np.bincount(codes, weights=x, minlength=n_groups)
+        stats[name + "_count"] = np.bincount(codes, weights=present, minlength=n_groups).astype(np.int64)
+        stats[name + "_sq"] = np.bincount(codes, weights=x * x, minlength=n_groups)
+    return stats
+
+
+def stats_table(stats, index):
+    """
+    dimension_stats table (observed groups only) from bincount_stats.
+    """
+    observed = stats["rows"] > 0
+    columns = ["rows", "first", "score_sum", "score_count", "score_sq",
+               "helpful_sum", "helpful_count", "helpful_sq"]
+    return pd.DataFrame({c: stats[c][observed] for c in columns}, index=index[observed])
+
+
+def build_review_store(df, categories=None):
+    """
+    Encode a cleaned review frame. categories ({dimension: lookup table},
+    e.g. from an earlier store) lets several batches share their tables;
+    new values are appended to them.
+    """
+    from performance import AMENITY_COLS
+
+    store = {"n": len(df), "codes": {}, "categories": {}, "values": {}}
+
+    for c in STORE_DIMENSIONS:
+        table = None
+        if categories is not None and c in categories:
+            new = pd.Index(df[c].dropna().unique()).difference(categories[c])
+            table = categories[c].append(new) if len(new) else categories[c]
+        store["codes"][c], store["categories"][c] = encode_keys(df[c], table)
+
+    yes = np.zeros(len(df), dtype=np.uint8)
+    no = np.zeros(len(df), dtype=np.uint8)
+    for i, c in enumerate(AMENITY_COLS):
+        yes |= (df[c] == True).fillna(False).to_numpy(dtype=np.uint8) << i
+        no |= (df[c] == False).fillna(False).to_numpy(dtype=np.uint8) << i
+    store["yes"], store["no"] = yes, no
+
+    for c in STORE_VALUES:
+        store["values"][c] = pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=np.float32, na_value=np.nan)
+
+    return store
+
+
+def store_nbytes(store):
+    """
+    Bytes held by the arrays of a store (lookup tables included).
+    """
+    arrays = list(store["codes"].values()) + list(store["values"].values()) + [store["yes"], store["no"]]
+    tables = sum(pd.Index(t).memory_usage(deep=True) for t in store["categories"].values())
+    return sum(a.nbytes for a in arrays) + tables
+
+
+def store_frame(store):
+    """
+    Decode a store into a cleaned frame (dimensions as categoricals that
+    share the store's codes, amenities as nullable booleans).
+    """
+    from performance import AMENITY_COLS
+
+    data = {
+        c: pd.Categorical.from_codes(store["codes"][c].astype(np.int64), categories=store["categories"][c])
+        for c in STORE_DIMENSIONS
+    }
+    for i, c in enumerate(AMENITY_COLS):
+        yes, no = (store["yes"] >> i) & 1 == 1, (store["no"] >> i) & 1 == 1
+        data[c] = pd.arrays.BooleanArray(yes, ~(yes | no))
+    data.update(store["values"])
+    return pd.DataFrame(data)
+
+
+def store_dimension_stats(store, dim, offset=0):
+    """
+    dimension_stats of one store dimension, computed on its codes.
+    """
+    categories = store["categories"][dim]
+    stats = bincount_stats(
+        store["codes"][dim],
+        len(categories),
+        store["values"]["Score"].astype(float),
+        store["values"]["Helpful votes"].astype(float),
+        np.arange(offset, offset + store["n"]),
+    )
+    return stats_table(stats, pd.Index(categories, name=dim))
+
+
+def store_group_mean(store, dim, value, mask=None):
+    """
+    Mean and count of a value column per category of dim (optionally only
+    rows where mask is True), as a DataFrame indexed by the category.
+    """
+    codes = store["codes"][dim]
+    values = store["values"][value].astype(float)
+    keep = (codes >= 0) & ~np.isnan(values)
+    if mask is not None:
+        keep &= mask
+
+    n_groups = len(store["categories"][dim])
+    count = np.bincount(codes[keep], minlength=n_groups)
+    total = np.bincount(codes[keep], weights=values[keep], minlength=n_groups)
+    observed = count > 0
+    return pd.DataFrame(
+        {"mean": total[observed] / count[observed], "count": count[observed]},
+        index=pd.Index(store["categories"][dim], name=dim)[observed],
+    )
+
+
+def store_amenity_mask(store, required=(), forbidden=()):
+    """
+    Rows whose amenities include all of required (YES) and none of
+    forbidden (NO), as a boolean array.
+    """
+    from performance import amenity_bits
+
+    need, avoid = amenity_bits(*required), amenity_bits(*forbidden)
+    return ((store["yes"] & need) == need) & ((store["no"] & avoid) == avoid)
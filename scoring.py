@@ -0,0 +1,175 @@
+# ============================================================
+# Score model artifact and batch scoring service
+# ============================================================
+# Scoring needs only NumPy: the saved bundle holds the scaler statistics and
+# the regression coefficients, folded into one weight vector on load.
+import json
+import sys
+
+import numpy as np
+
+MODEL_PATH = "models/score_model.json"
+
+# Same YES/NO rule as prepare_model_data
+YES_VALUES = {"YES", "Y", "TRUE", "1"}
+
+
+def save_model(model, scaler, numeric_cols, amenity_cols, path=MODEL_PATH):
+    """
+    Save a fitted (scaler, model) pair from fit_linear_regression together
+    with its feature schema as a JSON bundle.
+    """
+    import os
+
+    bundle = {
+        "numeric_cols": list(numeric_cols),
+        "amenity_cols": list(amenity_cols),
+        "features": [str(c) for c in getattr(model, "feature_names_in_", list(numeric_cols) + list(amenity_cols))],
+        "scaler_mean": np.asarray(scaler.mean_, dtype=float).tolist(),
+        "scaler_scale": np.asarray(scaler.scale_, dtype=float).tolist(),
+        "coef": np.asarray(model.coef_, dtype=float).tolist(),
+        "intercept": float(model.intercept_),
+    }
+
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(bundle, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_model(path=MODEL_PATH):
+    """
+    Load a bundle written by save_model and fold the standardization into
+    raw-feature weights: score = bias + x @ weights.
+    """
+    with open(path) as f:
+        bundle = json.load(f)
+
+    features = bundle["features"]
+    coef = np.array(bundle["coef"], dtype=float)
+    weights = coef.copy()
+    bias = bundle["intercept"]
+
+    for c, mean, scale in zip(bundle["numeric_cols"], bundle["scaler_mean"], bundle["scaler_scale"]):
+        j = features.index(c)
+        weights[j] = coef[j] / scale
+        bias -= coef[j] * mean / scale
+
+    bundle["weights"] = weights
+    bundle["bias"] = bias
+    bundle["is_amenity"] = [c in bundle["amenity_cols"] for c in features]
+    return bundle
+
+
+def _to_number(value):
+    try:
+        return float(str(value).strip().replace(",", "."))
+    except ValueError:
+        return np.nan
+
+
+def _to_flag(value):
+    return 1.0 if str(value).strip().upper() in YES_VALUES else 0.0
+
+
+def score_rows(bundle, rows):
+    """
+    Predict Score for a batch of raw review rows (dicts keyed by column
+    name). Rows with a missing or invalid numeric feature get None.
+    """
+    features = bundle["features"]
+    convert = [_to_flag if a else _to_number for a in bundle["is_amenity"]]
+
+    X = np.array(
+        [[f(row.get(c)) for c, f in zip(features, convert)] for row in rows],
+        dtype=float,
+    ).reshape(len(rows), len(features))
+
+    scores = bundle["bias"] + X @ bundle["weights"]
+    return [None if np.isnan(s) else float(s) for s in scores]
+
+
+def _handle_request(bundle, payload):
+    # A single row, a list of rows or {"rows": [...]}
+    if isinstance(payload, dict) and "rows" in payload:
+        payload = payload["rows"]
+    if isinstance(payload, dict):
+        return {"score": score_rows(bundle, [payload])[0]}
+    return {"scores": score_rows(bundle, payload)}
+
+
+def serve_stdio(bundle, stdin=None, stdout=None):
+    """
+    JSON-lines service: one request per input line, one response per line.
+    """
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+
+    for line in stdin:
+        if not line.strip():
+            continue
+        try:
+            response = _handle_request(bundle, json.loads(line))
+        except (ValueError, TypeError, AttributeError) as e:
+            response = {"error": str(e)}
+        stdout.write(json.dumps(response) + "\n")
+        stdout.flush()
+
+
+def serve_http(bundle, host="127.0.0.1", port=8765):
+    """
+    Local HTTP service: POST /score with a JSON request body.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class ScoreHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != "/score":
+                self.send_error(404)
+                return
+            try:
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                response, status = _handle_request(bundle, json.loads(body)), 200
+            except (ValueError, TypeError, AttributeError) as e:
+                response, status = {"error": str(e)}, 400
+
+            data = json.dumps(response).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), ScoreHandler)
+    print(f"Scoring service on http://{host}:{port}/score", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Score prediction service")
+    parser.add_argument("--model", default=MODEL_PATH, help="model bundle from save_model")
+    parser.add_argument("--http", type=int, metavar="PORT", help="serve HTTP on PORT instead of stdin/stdout")
+    parser.add_argument("--host", default="127.0.0.1")
+    args = parser.parse_args(argv)
+
+    bundle = load_model(args.model)
+    if args.http:
+        serve_http(bundle, args.host, args.http)
+    else:
+        serve_stdio(bundle)
+
+
+if __name__ == "__main__":
+    main()
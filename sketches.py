@@ -0,0 +1,428 @@
+# ============================================================
+# Mergeable sketches for approximate analytics
+# ============================================================
+# Bounded-memory summaries of review streams, built chunk by chunk and
+# combined across workers with the merge_* functions:
+#   - frequent items (Misra-Gries): top values with a deterministic
+#     undercount bound of at most rows / (k + 1)
+#   - Count-Min: point counts of any key, overcounting by at most
+#     e / width * rows with probability 1 - e^-depth
+#   - quantiles (KLL-style compactors): values whose rank is off by at most
+#     the tracked compaction error
+#   - HyperLogLog: distinct counts with a relative standard error of
+#     1.04 / sqrt(2^p)
+# Every sketch is a plain dict of NumPy/pandas values, so it pickles and
+# can be shipped between processes.
+import numpy as np
+import pandas as pd
+
+from cleaning import DATA_PATH
+
+
+def _hash(values, key="0123456789123456"):
+    # 64-bit hash of the (string) values
+    return pd.util.hash_array(np.asarray(values, dtype=object), hash_key=key)
+
+
+def _value_counts(values):
+    # Counts of the present values in first-seen order, keyed by their string form
+    codes, uniques = pd.factorize(pd.Series(values))
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques)).astype("int64")
+    return pd.Series(counts, index=pd.Index(pd.Index(uniques).astype(str), dtype=object))
+
+
+# ------------------------------------------------------------
+# Frequent items (Misra-Gries)
+# ------------------------------------------------------------
+def _reduce_items(counts, k, error):
+    # Keep at most k counters: subtract the (k+1)-th largest count from all
+    if len(counts) > k:
+        cut = np.sort(counts.to_numpy())[::-1][k]
+        counts = counts[counts > cut] - cut
+        error += int(cut)
+    return counts, error
+
+
+def frequent_items(values, k=64, counts=None):
+    """
+    Misra-Gries summary of a batch of values (missing values skipped), or
+    of their precomputed counts. Every value occurring more than
+    rows / (k + 1) times is kept, and its count is low by at most the
+    sketch's error.
+    """
+    if counts is None:
+        counts = _value_counts(values)
+    n = int(counts.sum())
+    counts, error = _reduce_items(counts, k, 0)
+    return {"k": k, "n": n, "counts": counts, "error": error}
+
+
+def merge_frequent_items(*sketches):
+    """
+    Summary of the combined batches (Agarwal et al., mergeable summaries).
+    """
+    k = sketches[0]["k"]
+    counts = pd.concat([s["counts"] for s in sketches]).groupby(level=0, sort=False).sum()
+    counts.index = pd.Index(counts.index, dtype=object)
+    counts, error = _reduce_items(counts, k, sum(s["error"] for s in sketches))
+    return {"k": k, "n": sum(s["n"] for s in sketches), "counts": counts, "error": error}
+
+
+def top_items(sketch, n):
+    """
+    The n most frequent values: count (lower bound) and upper bound of the
+    true count. Ties keep first-seen order.
+    """
+    counts = sketch["counts"].sort_values(ascending=False, kind="stable").head(n)
+    return pd.DataFrame({
+        "value": counts.index,
+        "count": counts.to_numpy(dtype="int64"),
+        "upper": counts.to_numpy(dtype="int64") + sketch["error"],
+    })
+
+
+# ------------------------------------------------------------
+# Count-Min
+# ------------------------------------------------------------
+def _cms_columns(sketch, keys):
+    width, seed = sketch["table"].shape[1], sketch["seed"]
+    return np.stack([
+        (_hash(keys, f"{seed:06d}cms{row:07d}") % np.uint64(width)).astype(np.int64)
+        for row in range(sketch["table"].shape[0])
+    ])
+
+
+def count_min(values, width=2048, depth=5, seed=0, counts=None):
+    """
+    Count-Min sketch of a batch of values (missing values skipped), or of
+    their precomputed counts.
+    """
+    if counts is None:
+        counts = _value_counts(values)
+    sketch = {"seed": seed, "n": int(counts.sum()), "table": np.zeros((depth, width), dtype=np.int64)}
+    columns = _cms_columns(sketch, counts.index)
+    for row in range(depth):
+        np.add.at(sketch["table"][row], columns[row], counts.to_numpy(dtype=np.int64))
+    return sketch
+
+
+def merge_count_min(*sketches):
+    """
+    Count-Min sketch of the combined batches (same width, depth and seed).
+    """
+    first = sketches[0]
+    if any(s["table"].shape != first["table"].shape or s["seed"] != first["seed"] for s in sketches):
+        raise ValueError("Count-Min sketches differ in width, depth or seed")
+    return {
+        "seed": first["seed"],
+        "n": sum(s["n"] for s in sketches),
+        "table": sum(s["table"] for s in sketches),
+    }
+
+
+def count_min_estimate(sketch, keys):
+    """
+    Estimated counts of keys. The estimate never undercounts and exceeds the
+    true count by at most error with probability confidence.
+    """
+    keys = pd.Index(keys, dtype=object).astype(str)
+    depth, width = sketch["table"].shape
+    columns = _cms_columns(sketch, keys)
+    estimate = np.min(sketch["table"][np.arange(depth)[:, None], columns], axis=0) if len(keys) else np.zeros(0, int)
+    return pd.DataFrame({
+        "key": keys,
+        "count": estimate,
+        "error": np.e / width * sketch["n"],
+        "confidence": 1 - np.exp(-depth),
+    })
+
+
+# ------------------------------------------------------------
+# Quantiles (KLL-style compactors)
+# ------------------------------------------------------------
+def _compact(sketch):
+    # A level over capacity keeps every other sorted item at twice the
+    # weight; this moves any rank by at most the level weight 2^h
+    levels, k = sketch["levels"], sketch["k"]
+    h = 0
+    while h < len(levels):
+        if len(levels[h]) > k:
+            items = np.sort(levels[h])
+            held = items[len(items) - len(items) % 2:]
+            offset = sketch["flips"][h]
+            sketch["flips"][h] ^= 1
+            if h + 1 == len(levels):
+                levels.append(np.empty(0))
+                sketch["flips"].append(0)
+            levels[h + 1] = np.concatenate([levels[h + 1], items[:len(items) - len(held)][offset::2]])
+            levels[h] = held
+            sketch["error"] += 2 ** h
+        h += 1
+    return sketch
+
+
+def quantile_sketch(values, k=256):
+    """
+    Quantile sketch of a batch of numbers (missing values skipped): at most
+    about k items per level and log2(rows / k) levels.
+    """
+    values = pd.to_numeric(pd.Series(values), errors="coerce").dropna().to_numpy(dtype=float)
+    sketch = {"k": k, "n": len(values), "levels": [values], "flips": [0], "error": 0}
+    return _compact(sketch)
+
+
+def merge_quantile_sketches(*sketches):
+    """
+    Quantile sketch of the combined batches.
+    """
+    depth = max(len(s["levels"]) for s in sketches)
+    levels = [
+        np.concatenate([s["levels"][h] for s in sketches if h < len(s["levels"])])
+        for h in range(depth)
+    ]
+    merged = {
+        "k": sketches[0]["k"],
+        "n": sum(s["n"] for s in sketches),
+        "levels": levels,
+        "flips": [0] * depth,
+        "error": sum(s["error"] for s in sketches),
+    }
+    return _compact(merged)
+
+
+def sketch_quantile(sketch, q):
+    """
+    (value, lower, upper) for quantile q: the item at rank q * rows and the
+    items at that rank -/+ the sketch's rank error, which bracket the true
+    quantile. NaN for an empty sketch.
+    """
+    if sketch["n"] == 0:
+        return np.nan, np.nan, np.nan
+    values = np.concatenate(sketch["levels"])
+    weights = np.concatenate([np.full(len(v), 2 ** h) for h, v in enumerate(sketch["levels"])])
+    order = np.argsort(values, kind="stable")
+    values, cum = values[order], np.cumsum(weights[order])
+
+    def at(rank):
+        return values[min(np.searchsorted(cum, max(rank, 1)), len(values) - 1)]
+
+    rank = q * sketch["n"]
+    return at(rank), at(rank - sketch["error"]), at(rank + sketch["error"])
+
+
+# ------------------------------------------------------------
+# Distinct counts (HyperLogLog)
+# ------------------------------------------------------------
+def _bit_length(x):
+    n = np.zeros(len(x), dtype=np.int64)
+    for s in (32, 16, 8, 4, 2, 1):
+        big = x >= (np.uint64(1) << np.uint64(s))
+        n += s * big
+        x = np.where(big, x >> np.uint64(s), x)
+    return n + (x > 0)
+
+
+def _hll_cells(values, p):
+    # Register index (first p bits) and rank of the first 1-bit in the rest
+    h = _hash(values)
+    index = (h >> np.uint64(64 - p)).astype(np.int64)
+    rest = h << np.uint64(p)
+    rank = np.minimum(64 - _bit_length(rest) + 1, 64 - p + 1)
+    return index, rank.astype(np.uint8)
+
+
+def hyperloglog(values, p=10):
+    """
+    HyperLogLog sketch (2^p one-byte registers) of the distinct values of
+    a batch (missing values skipped).
+    """
+    registers = np.zeros(2 ** p, dtype=np.uint8)
+    index, rank = _hll_cells(_value_counts(values).index, p)
+    np.maximum.at(registers, index, rank)
+    return {"p": p, "registers": registers}
+
+
+def merge_hyperloglogs(*sketches):
+    """
+    Sketch of the distinct values of the combined batches.
+    """
+    if len({s["p"] for s in sketches}) > 1:
+        raise ValueError("HyperLogLog sketches differ in precision")
+    return {"p": sketches[0]["p"], "registers": np.maximum.reduce([s["registers"] for s in sketches])}
+
+
+def distinct_count(sketch):
+    """
+    (estimate, relative standard error). Small counts use linear counting.
+    """
+    registers = sketch["registers"]
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(2.0 ** -registers.astype(float))
+    empty = int((registers == 0).sum())
+    if estimate <= 2.5 * m and empty:
+        estimate = m * np.log(m / empty)
+    return float(estimate), 1.04 / np.sqrt(m)
+
+
+# ------------------------------------------------------------
+# Review sketches (approximate mode of the frequency, median and
+# distinct-count analyses)
+# ------------------------------------------------------------
+SKETCH_DIMENSIONS = ["Hotel name", "User country", "Review month", "Review weekday"]
+
+
+def _per_group(groups, values, build):
+    return {
+        str(g): build(v)
+        for g, v in pd.Series(values).groupby(pd.Series(groups).to_numpy(), sort=False, observed=True)
+    }
+
+
+def _merge_per_group(parts, merge):
+    keys = list(dict.fromkeys(g for part in parts for g in part))
+    return {g: merge(*[part[g] for part in parts if g in part]) for g in keys}
+
+
+def build_review_sketches(df, k=64, hotel_k=16, quantile_k=256, p=10):
+    """
+    Sketches of a batch of cleaned reviews:
+    - items: frequent values of SKETCH_DIMENSIONS and of User country among
+      reviews of hotels without free internet
+    - hotel_countries: frequent User country values per hotel
+    - pairs: Count-Min of (hotel, country) pairs
+    - score: Score quantiles per traveler type
+    - distinct_countries: HyperLogLog of User country per hotel
+    """
+    no_net = (df["Free internet"] == False).fillna(False).to_numpy(dtype=bool)
+    items = {c: frequent_items(df[c], k) for c in SKETCH_DIMENSIONS}
+    items["no_free_internet_country"] = frequent_items(df["User country"][no_net], k)
+
+    # (hotel, country) pairs are counted once and feed the per-hotel sketches
+    pairs = df.groupby(["Hotel name", "User country"], observed=True, sort=False).size()
+    pairs = pairs[pairs > 0]
+    hotels = pairs.index.get_level_values(0).astype(str)
+    countries = pd.Index(pairs.index.get_level_values(1).astype(str), dtype=object)
+    per_hotel = pd.Series(pairs.to_numpy(dtype="int64"), index=countries)
+    pair_counts = pd.Series(pairs.to_numpy(dtype="int64"), index=pd.Index(hotels + "\x1f" + countries, dtype=object))
+
+    scored = df["Traveler type"].notna().to_numpy()
+    return {
+        "rows": len(df),
+        "items": items,
+        "hotel_countries": {
+            h: frequent_items(None, hotel_k, counts=c)
+            for h, c in per_hotel.groupby(hotels.to_numpy(), sort=False)
+        },
+        "pairs": count_min(None, counts=pair_counts),
+        "score": _per_group(
+            df["Traveler type"][scored], df["Score"][scored], lambda v: quantile_sketch(v, quantile_k)
+        ),
+        "distinct_countries": {
+            h: hyperloglog(c.index, p) for h, c in per_hotel.groupby(hotels.to_numpy(), sort=False)
+        },
+    }
+
+
+def merge_review_sketches(*parts):
+    """
+    Sketches of the combined batches (e.g. from parallel workers).
+    """
+    return {
+        "rows": sum(s["rows"] for s in parts),
+        "items": {c: merge_frequent_items(*[s["items"][c] for s in parts]) for c in parts[0]["items"]},
+        "hotel_countries": _merge_per_group([s["hotel_countries"] for s in parts], merge_frequent_items),
+        "pairs": merge_count_min(*[s["pairs"] for s in parts]),
+        "score": _merge_per_group([s["score"] for s in parts], merge_quantile_sketches),
+        "distinct_countries": _merge_per_group([s["distinct_countries"] for s in parts], merge_hyperloglogs),
+    }
+
+
+def sketch_reviews(path=DATA_PATH, chunksize=100_000, **options):
+    """
+    Review sketches of a CSV file, cleaned and sketched chunk by chunk in
+    bounded memory.
+    """
+    from cleaning import iter_clean_chunks
+
+    total = None
+    for chunk in iter_clean_chunks(path, chunksize=chunksize):
+        part = build_review_sketches(chunk, **options)
+        total = part if total is None else merge_review_sketches(total, part)
+    return total
+
+
+def approx_top_values(sketches, dim, n=3):
+    """
+    Approximate value_counts().head(n) of a dimension (SKETCH_DIMENSIONS or
+    "no_free_internet_country"), with the upper bound of every count.
+    """
+    return top_items(sketches["items"][dim], n).rename(columns={"value": dim})
+
+
+def approx_hotel_review_volume_with_countries(sketches, n=10, k=3):
+    """
+    Approximate top10_hotels_review_volume_with_countries: hotels by review
+    count with their k most frequent User country values. upper bounds the
+    hotel's count; country counts are low by at most country_error.
+    """
+    hotels = top_items(sketches["items"]["Hotel name"], n)
+    rows = []
+    for hotel, count, upper in hotels.itertuples(index=False):
+        sketch = sketches["hotel_countries"].get(hotel)
+        top = top_items(sketch, k) if sketch else top_items(frequent_items([]), k)
+        rows.append({
+            "Hotel name": hotel,
+            "reviews": count,
+            "upper": upper,
+            "top_countries": ", ".join(f"{c} ({v})" for c, v in zip(top["value"], top["count"])),
+            "country_error": sketch["error"] if sketch else 0,
+        })
+    return pd.DataFrame(rows, columns=["Hotel name", "reviews", "upper", "top_countries", "country_error"])
+
+
+def approx_pair_counts(sketches, hotel, countries):
+    """
+    Count-Min estimates of the reviews of hotel from each of countries.
+    """
+    keys = [f"{hotel}\x1f{c}" for c in countries]
+    result = count_min_estimate(sketches["pairs"], keys)
+    result.insert(0, "User country", list(countries))
+    return result.drop(columns="key")
+
+
+def approx_score_quantiles(sketches, q=0.5):
+    """
+    Approximate Score quantile q per traveler type, highest first (the
+    ordering of score_by_traveler_type_spec for q=0.5), with bounds.
+    """
+    rows = []
+    for group, sketch in sketches["score"].items():
+        value, lower, upper = sketch_quantile(sketch, q)
+        rows.append({
+            "Traveler type": group,
+            "quantile": value,
+            "lower": lower,
+            "upper": upper,
+            "rank_error": sketch["error"] / sketch["n"] if sketch["n"] else np.nan,
+        })
+    table = pd.DataFrame(rows, columns=["Traveler type", "quantile", "lower", "upper", "rank_error"])
+    return table.sort_values(["quantile", "Traveler type"], ascending=[False, True]).reset_index(drop=True)
+
+
+def approx_distinct_countries(sketches):
+    """
+    Approximate number of distinct User country values per hotel, with a
+    two-standard-error interval (about 95%).
+    """
+    rows = []
+    for hotel, sketch in sketches["distinct_countries"].items():
+        estimate, rse = distinct_count(sketch)
+        rows.append({
+            "Hotel name": hotel,
+            "countries": estimate,
+            "lower": estimate * (1 - 2 * rse),
+            "upper": estimate * (1 + 2 * rse),
+        })
+    table = pd.DataFrame(rows, columns=["Hotel name", "countries", "lower", "upper"])
+    return table.sort_values("countries", ascending=False, kind="stable").reset_index(drop=True)
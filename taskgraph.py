@@ -0,0 +1,187 @@
+# ============================================================
+# Task graph of analysis steps
+# ============================================================
+# Every step declares its inputs, either constants or Ref(...) to the output
+# of another step. run_graph starts each step as soon as its inputs are
+# ready on a pool of worker threads (or processes), so independent steps
+# overlap. Each step is keyed by a content hash of its code (its module and
+# every project module that module imports, see result_cache.code_fingerprint)
+# and its inputs (steps it depends on by their own keys); with a store
+# directory the output is kept under that key, and a re-run only executes
+# the steps whose code or inputs changed.
+import os
+import pickle
+import time
+from collections import namedtuple
+
+# Output of step name (or output[key] with a key, e.g. an element of a tuple)
+Ref = namedtuple("Ref", ["name", "key"], defaults=[None])
+
+
+def task(func, *args, **kwargs):
+    """
+    Graph node calling func(*args, **kwargs); Ref arguments are replaced by
+    the outputs of other steps.
+    """
+    return {"func": func, "args": args, "kwargs": kwargs}
+
+
+def _refs(node):
+    values = list(node["args"]) + list(node["kwargs"].values())
+    return list(dict.fromkeys(v.name for v in values if isinstance(v, Ref)))
+
+
+def graph_order(graph):
+    """
+    Step names with every step after its inputs (declaration order where
+    possible). Raises ValueError for unknown inputs and cycles.
+    """
+    deps = {}
+    for name, node in graph.items():
+        unknown = [r for r in _refs(node) if r not in graph]
+        if unknown:
+            raise ValueError(f"Step {name} depends on unknown steps: {', '.join(unknown)}")
+        deps[name] = set(_refs(node))
+
+    order, done = [], set()
+    while len(order) < len(graph):
+        ready = [n for n in graph if n not in done and deps[n] <= done]
+        if not ready:
+            raise ValueError("Steps depend on each other: " + ", ".join(n for n in graph if n not in done))
+        order += ready
+        done.update(ready)
+    return order
+
+
+def select_steps(graph, names):
+    """
+    The part of graph needed for the given steps (they and their inputs).
+    """
+    needed, todo = set(), list(names)
+    while todo:
+        name = todo.pop()
+        if name not in needed:
+            needed.add(name)
+            todo += _refs(graph[name])
+    return {n: node for n, node in graph.items() if n in needed}
+
+
+def graph_keys(graph):
+    """
+    Content hash of every step: its code, its constant arguments (functions
+    by their code) and the keys of the steps it depends on.
+    """
+    from result_cache import code_fingerprint, fingerprint
+
+    keys = {}
+    for name in graph_order(graph):
+        node = graph[name]
+
+        def resolve(v):
+            if isinstance(v, Ref):
+                return ("ref", keys[v.name], v.key)
+            if callable(v) and hasattr(v, "__code__"):
+                return ("code", code_fingerprint(v))
+            return v
+
+        keys[name] = fingerprint(
+            code_fingerprint(node["func"]),
+            [resolve(v) for v in node["args"]],
+            {k: resolve(v) for k, v in sorted(node["kwargs"].items())},
+        )
+    return keys
+
+
+def _store_path(store, name, key):
+    return os.path.join(store, name, key + ".pkl")
+
+
+def _load_output(store, name, key):
+    try:
+        with open(_store_path(store, name, key), "rb") as f:
+            return True, pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return False, None
+
+
+def _save_output(store, name, key, output):
+    # Only the latest output of a step is kept
+    path = _store_path(store, name, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(output, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+    except (pickle.PicklingError, TypeError, AttributeError):
+        os.remove(path + ".tmp")
+        return
+    for old in os.listdir(os.path.dirname(path)):
+        if old.endswith(".pkl") and old != key + ".pkl":
+            os.remove(os.path.join(os.path.dirname(path), old))
+
+
+def _call(func, args, kwargs):
+    start = time.perf_counter()
+    output = func(*args, **kwargs)
+    return output, time.perf_counter() - start
+
+
+def run_graph(graph, workers=None, store=None, processes=False, stages=None):
+    """
+    Run every step of graph ({name: task(...)}) and return {name: output}.
+    Steps run in parallel on workers threads (processes=True: processes,
+    for steps whose inputs and outputs pickle cheaply). With store (a
+    directory), outputs are saved there and reused while their key is
+    unchanged. stages, if given, gets {"stage", "seconds", "stored"} per
+    step in completion order.
+    """
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+    order = graph_order(graph)
+    keys = graph_keys(graph) if store else {}
+    waiting = {n: len(_refs(graph[n])) for n in order}
+    dependents = {n: [m for m in order if n in _refs(graph[m])] for n in order}
+    ready = [n for n in order if not waiting[n]]
+    outputs, running = {}, {}
+
+    def value(v):
+        if not isinstance(v, Ref):
+            return v
+        return outputs[v.name] if v.key is None else outputs[v.name][v.key]
+
+    def finish(name, output, seconds, stored):
+        outputs[name] = output
+        if stages is not None:
+            stages.append({"stage": name, "seconds": round(seconds, 6), "stored": stored})
+        for m in dependents[name]:
+            waiting[m] -= 1
+            if not waiting[m]:
+                ready.append(m)
+
+    executor = (ProcessPoolExecutor if processes else ThreadPoolExecutor)(max_workers=workers)
+    try:
+        while ready or running:
+            while ready:
+                name = ready.pop(0)
+                found, output = _load_output(store, name, keys[name]) if store else (False, None)
+                if found:
+                    finish(name, output, 0.0, True)
+                    continue
+                node = graph[name]
+                args = [value(v) for v in node["args"]]
+                kwargs = {k: value(v) for k, v in node["kwargs"].items()}
+                running[executor.submit(_call, node["func"], args, kwargs)] = name
+
+            if running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    output, seconds = future.result()
+                    if store:
+                        _save_output(store, name, keys[name], output)
+                    finish(name, output, seconds, False)
+    finally:
+        for future in running:
+            future.cancel()
+        executor.shutdown(wait=True)
+    return outputs
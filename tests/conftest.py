@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def reviews():
+    # Cleaned Las Vegas file as read in one piece (object/float columns)
+    from cleaning import load_and_clean_data
+
+    return load_and_clean_data()
+
+
+@pytest.fixture(scope="session")
+def typed():
+    # The same file read in chunks (CLEAN_DTYPES: categoricals, Int32, boolean)
+    from cleaning import load_and_clean_data
+
+    return load_and_clean_data(chunksize=97)
+
+
+@pytest.fixture(params=["reviews", "typed"])
+def frame(request):
+    return request.getfixturevalue(request.param)
@@ -0,0 +1,84 @@
+import asyncio
+import json
+
+import pytest
+
+from analytics_service import load_service, make_handler, respond
+from performance import continent_summary, top5_hotels
+from relationship import casino_score_comparison, traveler_type_scores_for_one_hotel
+
+
+@pytest.fixture(scope="module")
+def service():
+    return load_service()
+
+
+def get(service, target):
+    status, body = respond(service, target)
+    return status, json.loads(body)
+
+
+def records(frame):
+    return json.loads(frame.to_json(orient="records"))
+
+
+def test_answers_match_the_frame(service, reviews):
+    europe = reviews[reviews["User continent"] == "Europe"]
+
+    assert get(service, "/top5_hotels?n=8")[1]["hotels"] == records(top5_hotels(reviews, n=8))
+    assert get(service, "/top5_hotels?continent=Europe")[1]["hotels"] == records(top5_hotels(europe))
+    assert get(service, "/casino_score_comparison")[1]["casino"] == records(casino_score_comparison(reviews))
+    assert (
+        get(service, "/casino_score_comparison?continent=Europe")[1]["casino"]
+        == records(casino_score_comparison(europe))
+    )
+
+    counts, table, _, _ = continent_summary(reviews)
+    result = get(service, "/continent_summary")[1]
+    assert result["review_counts"] == {str(k): int(v) for k, v in counts.items()}
+    assert result["continents"] == records(table)
+
+    hotel, table = traveler_type_scores_for_one_hotel(reviews, "Bellagio Las Vegas")
+    result = get(service, "/traveler_type_scores?hotel=Bellagio%20Las%20Vegas")[1]
+    assert result["hotel"] == hotel
+    assert result["traveler_types"] == pytest.approx(records(table))
+
+
+def test_errors(service):
+    assert get(service, "/top5_hotels?continent=Mars")[0] == 404
+    assert get(service, "/traveler_type_scores?hotel=Nowhere")[0] == 404
+    assert get(service, "/nothing")[0] == 404
+    assert get(service, "/top5_hotels?n=0")[0] == 400
+    assert get(service, "/top5_hotels?colour=red")[0] == 400
+
+
+def test_http_round_trip(service):
+    async def fetch(port, targets):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        replies = []
+        for target in targets:
+            writer.write(f"GET {target} HTTP/1.1\r\nHost: test\r\n\r\n".encode())
+            await writer.drain()
+            status = int((await reader.readline()).split()[1])
+            headers = {}
+            while (line := await reader.readline()) != b"\r\n":
+                name, _, value = line.decode().partition(":")
+                headers[name.lower()] = value.strip()
+            replies.append((status, json.loads(await reader.readexactly(int(headers["content-length"])))))
+        writer.close()
+        return replies
+
+    async def main():
+        handle = make_handler(service, workers=4)
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            targets = ["/top5_hotels", "/top5_hotels?continent=Mars", "/top5_hotels"]
+            return await asyncio.gather(*[fetch(port, targets) for _ in range(5)])
+        finally:
+            server.close()
+            handle.executor.shutdown()
+
+    for replies in asyncio.run(main()):
+        assert [status for status, _ in replies] == [200, 404, 200]
+        assert replies[0][1] == replies[2][1] == get(service, "/top5_hotels")[1]
@@ -0,0 +1,60 @@
+from itertools import product
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bootstrap import ranking_bootstrap, score_sum_distributions
+
+SMALL = pd.DataFrame({
+    "Hotel name": ["A", "A", "A", "B", "B", "B", "B", "C", "C"],
+    "Score": [1, 2, 5, 3, 3, 4, 5, 5, 4],
+})
+
+
+def sum_pmf(dist, g):
+    # {resampled sum: probability} of group g from the stored CDFs
+    end = dist["start"][g + 1] if g + 1 < len(dist["start"]) else len(dist["cdf"])
+    cdf = dist["cdf"][dist["start"][g]:end] - g
+    pmf = np.diff(cdf, prepend=0.0)
+    return {(dist["base"][g] + i) * dist["step"]: p for i, p in enumerate(pmf) if p > 1e-12}
+
+
+def test_distributions_equal_all_resamples():
+    dist = score_sum_distributions(SMALL)
+    for g, (name, scores) in enumerate(SMALL.groupby("Hotel name")["Score"]):
+        assert dist["groups"][g] == name
+        assert np.isclose(dist["mean"][g], scores.mean())
+
+        counts = {}
+        draws = list(product(scores, repeat=len(scores)))
+        for draw in draws:
+            counts[sum(draw)] = counts.get(sum(draw), 0) + 1
+        pmf = sum_pmf(dist, g)
+        assert set(pmf) == set(counts)
+        assert all(np.isclose(pmf[s], c / len(draws)) for s, c in counts.items())
+
+
+def test_fractional_scores_need_a_resolution():
+    halves = SMALL.assign(Score=SMALL["Score"] / 2)
+    with pytest.raises(ValueError):
+        score_sum_distributions(halves)
+    dist = score_sum_distributions(halves, resolution=0.5)
+    assert np.allclose(dist["mean"], halves.groupby("Hotel name")["Score"].mean())
+
+
+def test_ranking_bootstrap_matches_the_ranking(reviews):
+    result = ranking_bootstrap(reviews, k=5, n_boot=2_000, n_jobs=1)
+    expected = reviews.groupby("Hotel name")["Score"].agg(["mean", "count"])
+    expected = expected.reindex(result["Hotel name"])
+
+    assert np.allclose(result["avg_score"], expected["mean"])
+    assert list(result["reviews"]) == list(expected["count"])
+    assert (result["ci_lower"] <= result["avg_score"]).all() and (result["avg_score"] <= result["ci_upper"]).all()
+    assert np.isclose(result["p_top_k"].sum(), 5)
+
+
+def test_results_do_not_depend_on_n_jobs(reviews):
+    one = ranking_bootstrap(reviews, n_boot=3_000, chunk_size=1_000, n_jobs=1)
+    two = ranking_bootstrap(reviews, n_boot=3_000, chunk_size=1_000, n_jobs=2)
+    assert one.equals(two)
@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+
+from cleaning import CLEAN_DTYPES, concat_clean_chunks, iter_clean_chunks, load_and_clean_data
+
+
+def test_chunked_load_has_the_values_of_the_full_load(reviews, typed):
+    assert list(typed.index) == list(reviews.index)
+    assert list(typed.columns) == list(reviews.columns)
+    for c in reviews:
+        full = reviews[c].astype(object).where(reviews[c].notna(), None)
+        chunked = typed[c].astype(object).where(typed[c].notna(), None)
+        if pd.api.types.is_numeric_dtype(reviews[c]):
+            assert np.allclose(chunked.astype(float), full.astype(float), equal_nan=True), c
+        else:
+            assert list(chunked) == list(full), c
+
+
+def test_concat_matches_pandas_concat():
+    for size in (7, 50, 100_000):
+        chunks = list(iter_clean_chunks(chunksize=size))
+        result = concat_clean_chunks(chunks)
+        expected = pd.concat(chunks)
+        for c in result:
+            assert list(result[c].astype(object).fillna("")) == list(expected[c].astype(object).fillna("")), c
+        assert list(result.index) == list(expected.index)
+        assert result.dtypes.to_dict() == load_and_clean_data(chunksize=size).dtypes.to_dict()
+
+
+def test_concat_of_nothing_is_typed_and_empty():
+    empty = concat_clean_chunks([])
+    assert len(empty) == 0
+    assert all(str(empty[c].dtype) == str(pd.Series(dtype=t).dtype) for c, t in CLEAN_DTYPES.items() if c in empty)
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from correlation import corr_moments, corr_from_moments, merge_corr_moments, pearson_corr, spearman_corr
+
+
+def numeric(df):
+    return df.select_dtypes(include=[np.number]).astype(float)
+
+
+def with_gaps(seed=0, n=2_000):
+    # Correlated columns with missing values at different rows
+    rng = np.random.default_rng(seed)
+    x = rng.normal(1e6, 1.0, n)
+    df = pd.DataFrame({"x": x, "y": 2 * x + rng.normal(0, 1, n), "z": rng.integers(0, 5, n).astype(float)})
+    for c in df:
+        df.loc[rng.random(n) < 0.1, c] = np.nan
+    return df
+
+
+def test_pearson_matches_dataframe_corr(reviews):
+    df = numeric(reviews)
+    assert np.allclose(pearson_corr(df), df.corr(), equal_nan=True)
+
+
+def test_chunks_and_missing_values_match_dataframe_corr():
+    df = with_gaps()
+    chunks = [df.iloc[i:i + 333] for i in range(0, len(df), 333)]
+    assert np.allclose(pearson_corr(chunks), df.corr(), equal_nan=True)
+    assert np.allclose(pearson_corr(df, chunksize=100), df.corr(), equal_nan=True)
+
+
+def test_merged_moments_equal_one_pass():
+    df = with_gaps(1)
+    merged = merge_corr_moments(corr_moments(df.iloc[:700]), corr_moments(df.iloc[700:] + 5.0 - 5.0))
+    assert np.allclose(corr_from_moments(merged), df.corr(), equal_nan=True)
+    assert np.array_equal(merged["n"], corr_moments(df)["n"])
+
+
+def test_spearman_matches_dataframe_corr(reviews):
+    df = numeric(reviews).dropna()
+    assert np.allclose(spearman_corr(df, chunksize=50), df.corr("spearman"), equal_nan=True)
@@ -0,0 +1,105 @@
+import os
+
+import numpy as np
+
+from cube import (
+    CUBE_DIMENSIONS,
+    build_cube,
+    build_cube_rollups,
+    cube_review_stats,
+    dice_cube,
+    dice_rollups,
+    load_cube,
+    merge_cubes,
+    rollup,
+)
+from incremental import build_review_stats
+from performance import (
+    bottom5_hotels_all_amenities,
+    continent_summary,
+    most_frequent_fields,
+    no_free_internet_summary,
+    top5_hotels,
+    top10_hotels_europe,
+)
+from relationship import casino_score_comparison, traveler_type_scores_for_one_hotel
+
+
+def brute_force(df, dims):
+    # Row count, Score sum/count and Helpful votes sum per group
+    return (
+        df.assign(score=df["Score"].astype(float), helpful=df["Helpful votes"].astype(float))
+          .groupby(dims, observed=True)
+          .agg(rows=("score", "size"), score_sum=("score", "sum"), score_count=("score", "count"),
+               helpful_sum=("helpful", "sum"))
+    )
+
+
+def assert_same_measures(table, expected):
+    table = table[expected.columns].sort_index()
+    expected = expected.sort_index()
+    assert list(table.index) == list(expected.index)
+    assert np.allclose(table.to_numpy(dtype=float), expected.to_numpy(dtype=float))
+
+
+def test_rollups_match_groupby(frame):
+    cube = build_cube(frame)
+    for dims in [d for d in CUBE_DIMENSIONS] + [["Hotel name", "User continent"], ["Traveler type", "Review month"]]:
+        assert_same_measures(rollup(cube, dims), brute_force(frame, dims))
+
+
+def test_dice_then_rollup_matches_filtered_groupby(frame):
+    cube = build_cube(frame)
+    filters = {"User continent": "Europe", "Period of stay": ["Jun-Aug", "Sep-Nov"]}
+    part = frame[(frame["User continent"] == "Europe") & frame["Period of stay"].isin(["Jun-Aug", "Sep-Nov"])]
+    assert_same_measures(rollup(dice_cube(cube, filters), "Hotel name"), brute_force(part, "Hotel name"))
+
+
+def test_merged_batches_equal_the_whole(frame):
+    half = len(frame) // 2
+    merged = merge_cubes(build_cube(frame.iloc[:half]), build_cube(frame.iloc[half:], offset=half))
+    for dim in CUBE_DIMENSIONS:
+        assert rollup(merged, dim).equals(rollup(build_cube(frame), dim))
+
+
+def test_cube_review_stats_answer_like_the_frame(frame):
+    cube, rollups = build_cube(frame), build_cube_rollups(frame)
+    stats, expected = cube_review_stats(cube, rollups), build_review_stats(frame)
+
+    assert repr(most_frequent_fields(frame, stats)) == repr(most_frequent_fields(frame, expected))
+    assert casino_score_comparison(frame, stats).equals(casino_score_comparison(frame, expected))
+    for a, b in zip(continent_summary(frame, stats), continent_summary(frame, expected)):
+        assert a.equals(b)
+    for func in [top5_hotels, bottom5_hotels_all_amenities]:
+        assert func(frame, stats["hotels"]).equals(func(frame))
+    for a, b in zip(no_free_internet_summary(frame, stats["hotels"]), no_free_internet_summary(frame)):
+        assert a.equals(b)
+    assert top10_hotels_europe(frame, cube=cube).equals(top10_hotels_europe(frame))
+
+    hotel, table = traveler_type_scores_for_one_hotel(frame, cube=cube)
+    expected_hotel, expected_table = traveler_type_scores_for_one_hotel(frame)
+    assert hotel == expected_hotel
+    assert np.allclose(table["avg_score"], expected_table["avg_score"])
+
+
+def test_diced_rollups_match_a_filtered_frame(frame):
+    rollups = build_cube_rollups(frame)
+    europe = frame[frame["User continent"] == "Europe"]
+    diced = dice_rollups(rollups, {"User continent": "Europe"})
+    expected = build_cube_rollups(europe)
+
+    assert top5_hotels(europe, diced["hotels"], 10).equals(top5_hotels(europe, expected["hotels"], 10))
+    assert_same_measures(
+        rollup(diced["Review weekday"], "Review weekday"), brute_force(europe, "Review weekday")
+    )
+
+
+def test_load_cube_persists_and_reloads(tmp_path):
+    from cleaning import DATA_PATH
+
+    first = load_cube(DATA_PATH, str(tmp_path))
+    assert any(name.endswith(".cube.pkl") for name in os.listdir(tmp_path))
+    again = load_cube(DATA_PATH, str(tmp_path))
+    assert again[0].equals(first[0])
+    assert again[1]["casino"].equals(first[1]["casino"])
+
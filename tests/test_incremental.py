@@ -0,0 +1,39 @@
+import numpy as np
+
+from incremental import DIMENSIONS, build_review_stats, update_review_stats
+from performance import (
+    bottom5_hotels_all_amenities,
+    continent_summary,
+    most_frequent_fields,
+    no_free_internet_summary,
+    top5_hotels,
+    top5_hotels_by_rooms_meeting_conditions,
+)
+
+
+def test_batches_equal_a_full_recompute(frame):
+    stats = None
+    for start in range(0, len(frame), 60):
+        stats = update_review_stats(stats, frame.iloc[start:start + 60])
+    expected = build_review_stats(frame)
+
+    assert stats["rows"] == expected["rows"] == len(frame)
+    for c in DIMENSIONS + ["casino"]:
+        table, full = stats[c].sort_index(), expected[c].sort_index()
+        assert list(table.index) == list(full.index)
+        assert np.allclose(table.to_numpy(dtype=float), full[table.columns].to_numpy(dtype=float), equal_nan=True)
+
+    assert repr(most_frequent_fields(frame, stats)) == repr(most_frequent_fields(frame, expected))
+    for a, b in zip(continent_summary(frame, stats), continent_summary(frame, expected)):
+        assert a.equals(b)
+    for func in [top5_hotels, bottom5_hotels_all_amenities, top5_hotels_by_rooms_meeting_conditions]:
+        assert func(frame, stats["hotels"]).equals(func(frame))
+    # Ties are broken by first appearance, which the merged store keeps
+    for a, b in zip(no_free_internet_summary(frame, stats["hotels"]), no_free_internet_summary(frame)):
+        assert a.equals(b)
+
+
+def test_first_batch_starts_from_none(reviews):
+    stats = update_review_stats(None, reviews)
+    assert stats["rows"] == len(reviews)
+    assert stats["User continent"]["rows"].sum() == len(reviews)
@@ -0,0 +1,52 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import instrumentation
+from instrumentation import instrumented, prometheus_sink
+from taskgraph import run_graph, task
+
+STEPS = 16
+
+
+@instrumented
+def slow_step(i, barrier):
+    # Every step waits for the others, so all of them emit together
+    barrier.wait(timeout=10)
+    return list(range(i))
+
+
+def test_prometheus_sink_with_concurrent_steps(tmp_path):
+    path = str(tmp_path / "steps.prom")
+    barrier = threading.Barrier(STEPS)
+    graph = {f"step_{i}": task(slow_step, i, barrier) for i in range(STEPS)}
+
+    instrumentation.enable(prometheus_sink(path))
+    try:
+        for _ in range(3):
+            barrier.reset()
+            run_graph(graph, workers=STEPS)
+    finally:
+        instrumentation.disable()
+
+    with open(path) as f:
+        text = f.read()
+    assert 'hotel_step_calls_total{step="slow_step"} 48.0' in text
+    assert not [n for n in os.listdir(tmp_path) if n.endswith(".tmp")]
+
+
+def test_concurrent_steps_get_no_rss_delta():
+    records = []
+    barrier = threading.Barrier(4)
+    graph = {f"step_{i}": task(slow_step, i, barrier) for i in range(4)}
+
+    instrumentation.enable(records.append)
+    try:
+        run_graph(graph, workers=4)
+    finally:
+        instrumentation.disable()
+
+    assert len(records) == 4
+    assert all(r["peak_rss_delta"] is None and r["copies"] == 0 for r in records)
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from prediction import (
+    evaluate_model,
+    evaluate_model_streaming,
+    fit_linear_regression,
+    fit_linear_regression_streaming,
+    prepare_model_data,
+    stream_split,
+)
+
+
+def chunks_of(X, y, size=50):
+    return [(X.iloc[i:i + size], y.iloc[i:i + size]) for i in range(0, len(X), size)]
+
+
+def test_streaming_fit_matches_linear_regression(reviews):
+    X, y, numeric_cols, _ = prepare_model_data(reviews)
+    model, scaler = fit_linear_regression(X, y, numeric_cols)
+    streamed, streamed_scaler = fit_linear_regression_streaming(chunks_of(X, y), numeric_cols)
+
+    assert np.allclose(streamed_scaler.mean_, scaler.mean_)
+    assert np.allclose(streamed_scaler.scale_, scaler.scale_)
+    assert np.allclose(streamed.coef_, model.coef_, atol=1e-8)
+    assert np.isclose(streamed.intercept_, model.intercept_)
+
+
+def test_streaming_evaluation_matches_evaluate_model(reviews):
+    X, y, numeric_cols, _ = prepare_model_data(reviews)
+    model, scaler = fit_linear_regression(X, y, numeric_cols)
+    r2, mse, _ = evaluate_model(model, scaler, X, y, numeric_cols)
+
+    assert np.allclose(evaluate_model_streaming(model, scaler, chunks_of(X, y), numeric_cols), (r2, mse))
+
+
+def test_stream_split_partitions_the_rows(reviews):
+    X, y, _, _ = prepare_model_data(reviews)
+    train = [X for X, _ in stream_split(chunks_of(X, y), "train")]
+    test = [X for X, _ in stream_split(chunks_of(X, y), "test")]
+    train_rows = {i for part in train for i in part.index}
+    test_rows = {i for part in test for i in part.index}
+
+    assert not train_rows & test_rows
+    assert train_rows | test_rows == set(X.index)
+    assert 0.1 < len(test_rows) / len(X) < 0.3
+
+
+def test_empty_stream_raises(reviews):
+    X, y, numeric_cols, _ = prepare_model_data(reviews)
+    model, scaler = fit_linear_regression(X, y, numeric_cols)
+
+    with pytest.raises(ValueError):
+        evaluate_model_streaming(model, scaler, [], numeric_cols)
+    with pytest.raises(ValueError):
+        fit_linear_regression_streaming([(X.iloc[:0], y.iloc[:0])], numeric_cols)
@@ -0,0 +1,66 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import result_cache
+from cleaning import load_and_clean_data
+from performance import top5_hotels
+
+
+def test_frame_edited_in_place_is_recomputed():
+    result_cache.configure(enabled=True)
+    result_cache.clear_cache()
+    df = load_and_clean_data()
+
+    best = top5_hotels(df)["Hotel name"].iloc[0]
+    df.loc[df["Hotel name"] == best, "Score"] = 1
+
+    assert best not in list(top5_hotels(df)["Hotel name"])
+    assert best not in list(top5_hotels.uncached(df)["Hotel name"])
+
+
+def test_same_content_is_a_hit():
+    result_cache.configure(enabled=True)
+    result_cache.clear_cache()
+    df = load_and_clean_data()
+
+    first = top5_hotels(df)
+    hits = result_cache.cache_info()["hits"]
+    assert top5_hotels(df.copy()) is first
+    assert result_cache.cache_info()["hits"] == hits + 1
+
+
+@result_cache.cached
+def padded(i, size):
+    return bytes(size) + str(i).encode()
+
+
+def test_disk_tier_keeps_to_its_size_cap(tmp_path):
+    result_cache.configure(enabled=True, cache_dir=str(tmp_path), disk_maxsize=50_000)
+    try:
+        for i in range(20):
+            padded(i, 10_000)
+        on_disk = [os.path.join(d, f) for d, _, files in os.walk(tmp_path) for f in files]
+        assert sum(os.path.getsize(p) for p in on_disk) <= 50_000
+        assert result_cache.cache_info()["disk_bytes"] == sum(os.path.getsize(p) for p in on_disk)
+
+        # The newest results are the ones kept
+        result_cache.clear_cache()
+        misses = result_cache.cache_info()["misses"]
+        padded(19, 10_000)
+        assert result_cache.cache_info()["misses"] == misses
+    finally:
+        result_cache.configure(cache_dir="", disk_maxsize=2 * 1024 ** 3)
+
+
+def test_counters_from_many_threads():
+    from concurrent.futures import ThreadPoolExecutor
+
+    result_cache.configure(enabled=True)
+    result_cache.clear_cache()
+    before = result_cache.cache_info()
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda i: padded(i % 4, 10), range(400)))
+    after = result_cache.cache_info()
+    assert (after["hits"] - before["hits"]) + (after["misses"] - before["misses"]) == 400
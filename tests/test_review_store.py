@@ -0,0 +1,47 @@
+import numpy as np
+
+from performance import AMENITY_COLS, dimension_stats
+from review_store import (
+    STORE_DIMENSIONS,
+    build_review_store,
+    store_amenity_mask,
+    store_dimension_stats,
+    store_frame,
+    store_group_mean,
+)
+
+
+def test_store_stats_match_dimension_stats(frame):
+    store = build_review_store(frame)
+    for dim in STORE_DIMENSIONS:
+        table, expected = store_dimension_stats(store, dim), dimension_stats(frame, dim)
+        assert list(table.index.astype(object)) == list(expected.index.astype(object))
+        assert np.allclose(table.to_numpy(dtype=float), expected[table.columns].to_numpy(dtype=float), equal_nan=True)
+
+
+def test_group_mean_matches_groupby(frame):
+    store = build_review_store(frame)
+    mask = store_amenity_mask(store, required=["Pool"], forbidden=["Casino"])
+    keep = ((frame["Pool"] == True) & (frame["Casino"] == False)).fillna(False).to_numpy(dtype=bool)
+    assert mask.sum() == keep.sum()
+
+    table = store_group_mean(store, "Traveler type", "Score", mask)
+    expected = frame[keep].astype({"Score": float}).groupby("Traveler type", observed=True)["Score"].agg(["mean", "count"])
+    assert list(table.index.astype(object)) == list(expected.index.astype(object))
+    assert np.allclose(table["mean"], expected["mean"])
+    assert list(table["count"]) == list(expected["count"])
+
+
+def test_store_decodes_to_the_frame(frame):
+    decoded = store_frame(build_review_store(frame))
+    for c in STORE_DIMENSIONS:
+        assert list(decoded[c].astype(object).fillna("")) == list(frame[c].astype(object).fillna(""))
+    for c in AMENITY_COLS:
+        assert decoded[c].equals(frame[c].astype("boolean").reset_index(drop=True))
+
+
+def test_batches_share_their_tables(reviews):
+    first = build_review_store(reviews.iloc[:200])
+    second = build_review_store(reviews.iloc[200:], categories=first["categories"])
+    for c in STORE_DIMENSIONS:
+        assert list(second["categories"][c][: len(first["categories"][c])]) == list(first["categories"][c])
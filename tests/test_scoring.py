@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+
+from cleaning import DATA_PATH
+from prediction import fit_linear_regression, prepare_model_data
+from scoring import load_model, save_model, score_rows
+
+
+def test_scores_match_the_fitted_model(reviews, tmp_path):
+    X, y, numeric_cols, amenity_cols = prepare_model_data(reviews)
+    model, scaler = fit_linear_regression(X, y, numeric_cols)
+    path = str(tmp_path / "model.json")
+    save_model(model, scaler, numeric_cols, amenity_cols, path)
+
+    X_scaled = X.copy()
+    X_scaled[numeric_cols] = scaler.transform(X_scaled[numeric_cols])
+    expected = model.predict(X_scaled)
+
+    # Raw rows of the CSV, as a client sends them
+    raw = pd.read_csv(DATA_PATH, sep=";", dtype=str).loc[X.index]
+    rows = raw.to_dict(orient="records")
+    assert np.allclose(score_rows(load_model(path), rows), expected)
+
+
+def test_missing_numeric_feature_gets_none(reviews, tmp_path):
+    X, y, numeric_cols, amenity_cols = prepare_model_data(reviews)
+    model, scaler = fit_linear_regression(X, y, numeric_cols)
+    path = str(tmp_path / "model.json")
+    save_model(model, scaler, numeric_cols, amenity_cols, path)
+
+    row = {c: "1" for c in numeric_cols}
+    row[numeric_cols[0]] = "n/a"
+    assert score_rows(load_model(path), [row, {c: "1" for c in numeric_cols}])[0] is None
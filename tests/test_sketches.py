@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+from sketches import (
+    approx_distinct_countries,
+    approx_top_values,
+    build_review_sketches,
+    count_min,
+    count_min_estimate,
+    distinct_count,
+    frequent_items,
+    hyperloglog,
+    merge_count_min,
+    merge_frequent_items,
+    merge_hyperloglogs,
+    merge_quantile_sketches,
+    merge_review_sketches,
+    quantile_sketch,
+    sketch_quantile,
+    top_items,
+)
+
+
+def skewed(seed=0, n=20_000):
+    # Zipf-like values: a few heavy hitters and a long tail
+    rng = np.random.default_rng(seed)
+    return pd.Series(rng.zipf(1.3, n) % 5_000).astype(str)
+
+
+def halves(values):
+    return values.iloc[: len(values) // 2], values.iloc[len(values) // 2:]
+
+
+def test_frequent_items_bound_the_true_counts():
+    values = skewed()
+    exact = values.value_counts()
+    a, b = halves(values)
+    for sketch in [frequent_items(values, k=32), merge_frequent_items(frequent_items(a, 32), frequent_items(b, 32))]:
+        assert sketch["n"] == len(values)
+        assert sketch["error"] <= len(values) / 33
+        top = top_items(sketch, 10)
+        true = exact.reindex(top["value"]).to_numpy()
+        assert (top["count"].to_numpy() <= true).all() and (true <= top["upper"].to_numpy()).all()
+        # Every value above n / (k + 1) is kept
+        assert set(exact[exact > len(values) / 33].index) <= set(sketch["counts"].index)
+
+
+def test_count_min_never_undercounts():
+    values = skewed(1)
+    exact = values.value_counts()
+    a, b = halves(values)
+    for sketch in [count_min(values, width=256), merge_count_min(count_min(a, 256), count_min(b, 256))]:
+        estimate = count_min_estimate(sketch, exact.index)
+        assert (estimate["count"].to_numpy() >= exact.to_numpy()).all()
+        within = estimate["count"].to_numpy() - exact.to_numpy() <= estimate["error"].to_numpy()
+        assert within.mean() >= estimate["confidence"].iloc[0] - 0.05
+
+
+def test_quantile_bounds_bracket_the_exact_quantile():
+    rng = np.random.default_rng(2)
+    values = pd.Series(rng.normal(size=50_000))
+    a, b = halves(values)
+    for sketch in [quantile_sketch(values, 64), merge_quantile_sketches(quantile_sketch(a, 64), quantile_sketch(b, 64))]:
+        for q in (0.1, 0.5, 0.9):
+            _, lower, upper = sketch_quantile(sketch, q)
+            assert lower <= values.quantile(q) <= upper
+
+
+def test_distinct_count_within_its_error():
+    values = pd.Series(np.arange(30_000) % 12_345).astype(str)
+    a, b = halves(values)
+    for sketch in [hyperloglog(values), merge_hyperloglogs(hyperloglog(a), hyperloglog(b))]:
+        estimate, rse = distinct_count(sketch)
+        assert abs(estimate - 12_345) <= 3 * rse * 12_345
+
+
+def test_review_sketches_match_the_frame(frame):
+    # k above the number of distinct values: the summaries are exact
+    parts = [build_review_sketches(frame.iloc[i:i + 100], k=1_000, hotel_k=1_000) for i in range(0, len(frame), 100)]
+    sketches = merge_review_sketches(*parts)
+    assert sketches["rows"] == len(frame)
+
+    for dim in ["Hotel name", "User country", "Review weekday"]:
+        top = approx_top_values(sketches, dim, 5)
+        exact = frame[dim].astype(object).value_counts()
+        assert list(top["count"]) == list(exact.head(5))
+        assert (top["upper"] == top["count"]).all()
+
+    # Register maxima merge exactly: the batches give the one-pass sketch
+    whole = build_review_sketches(frame)["distinct_countries"]
+    for hotel, sketch in sketches["distinct_countries"].items():
+        assert np.array_equal(sketch["registers"], whole[hotel]["registers"])
+    assert len(approx_distinct_countries(sketches)) == frame["Hotel name"].nunique()
@@ -0,0 +1,75 @@
+import pytest
+
+from taskgraph import Ref, graph_keys, run_graph, select_steps, task
+
+CALLS = []
+
+
+def load(n):
+    CALLS.append("load")
+    return list(range(n))
+
+
+def total(values):
+    CALLS.append("total")
+    return sum(values)
+
+
+def split(values):
+    CALLS.append("split")
+    return values[::2], values[1::2]
+
+
+def ratio(a, b):
+    CALLS.append("ratio")
+    return a / b
+
+
+def make_graph(n=10):
+    return {
+        "data": task(load, n),
+        "total": task(total, Ref("data")),
+        "halves": task(split, Ref("data")),
+        "even": task(total, Ref("halves", 0)),
+        "ratio": task(ratio, Ref("even"), b=Ref("total")),
+    }
+
+
+def test_outputs_equal_direct_calls():
+    values = list(range(10))
+    even, _ = split(values)
+    outputs = run_graph(make_graph(), workers=4)
+    assert outputs == {
+        "data": values,
+        "total": total(values),
+        "halves": split(values),
+        "even": total(even),
+        "ratio": ratio(total(even), total(values)),
+    }
+
+
+def test_select_steps_keeps_the_inputs():
+    assert list(select_steps(make_graph(), ["even"])) == ["data", "halves", "even"]
+    assert list(select_steps(make_graph(), ["total"])) == ["data", "total"]
+
+
+def test_unknown_input_and_cycles_are_rejected():
+    with pytest.raises(ValueError):
+        run_graph({"a": task(total, Ref("missing"))})
+    with pytest.raises(ValueError):
+        run_graph({"a": task(total, Ref("b")), "b": task(total, Ref("a"))})
+
+
+def test_store_reruns_only_changed_steps(tmp_path):
+    first = run_graph(make_graph(), store=str(tmp_path))
+    CALLS.clear()
+    stages = []
+    assert run_graph(make_graph(), store=str(tmp_path), stages=stages) == first
+    assert CALLS == []
+    assert all(s["stored"] for s in stages)
+
+    # A changed constant reaches every step downstream of it
+    before, after = graph_keys(make_graph()), graph_keys(make_graph(20))
+    assert all(before[name] != after[name] for name in before)
+    assert run_graph(make_graph(20), store=str(tmp_path))["total"] == sum(range(20))
+    assert "load" in CALLS
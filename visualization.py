@@ -1,45 +1,82 @@
+import numpy as np
 import matplotlib.pyplot as plt
 
+from instrumentation import instrumented
+from result_cache import cached
+from rendering import box_stats, draw_spec
+
+
+@instrumented
+@cached
+def score_histogram_spec(df):
+    counts, edges = np.histogram(df["Score"].dropna().to_numpy(dtype=float), bins=10)
+
+    return {
+        "kind": "hist",
+        "name": "histogram_score",
+        "counts": counts,
+        "edges": edges,
+        "title": "Distribution of Review Scores",
+        "xlabel": "Score",
+        "ylabel": "Number of Reviews",
+    }
+
+
+@instrumented
 def plot_score_histogram(df):
     plt.figure()
-    df["Score"].dropna().hist(bins=10)
-    plt.title("Distribution of Review Scores")
-    plt.xlabel("Score")
-    plt.ylabel("Number of Reviews")
+    draw_spec(plt.gcf(), score_histogram_spec(df))
     plt.show(block=False)
     plt.pause(0.1)
 
 
-def plot_score_by_traveler_type(df):
+@instrumented
+@cached
+def score_by_traveler_type_spec(df):
     data = df[["Traveler type", "Score"]].dropna()
+    stats = box_stats(data["Traveler type"].to_numpy(), data["Score"].to_numpy(dtype=float))
+
+    # Highest median first (stable, so ties stay in name order)
+    order = sorted(stats, key=lambda t: -stats[t]["med"])
 
-    order = (
-        data.groupby("Traveler type")["Score"]
-            .median()
-            .sort_values(ascending=False)
-            .index
-    )
-
-    scores = [data[data["Traveler type"] == t]["Score"] for t in order]
-
-    plt.figure(figsize=(10, 5))
-    plt.boxplot(scores, labels=order)
-    plt.title("Review Score by Traveler Type")
-    plt.xlabel("Traveler Type")
-    plt.ylabel("Score")
-    plt.xticks(rotation=45, ha="right")
+    return {
+        "kind": "boxplot",
+        "name": "boxplot_score",
+        "figsize": (10, 5),
+        "stats": [stats[t] for t in order],
+        "title": "Review Score by Traveler Type",
+        "xlabel": "Traveler Type",
+        "ylabel": "Score",
+        "xtick_rotation": 45,
+    }
+
+
+@instrumented
+def plot_score_by_traveler_type(df):
+    spec = score_by_traveler_type_spec(df)
+    plt.figure(figsize=spec["figsize"])
+    draw_spec(plt.gcf(), spec)
     plt.show()
 
 
-def plot_rooms_by_stars(df):
+@instrumented
+@cached
+def rooms_by_stars_spec(df):
     data = df[["Hotel stars", "Nr. rooms"]].dropna()
-    stars = sorted(data["Hotel stars"].unique())
+    stats = box_stats(data["Hotel stars"].to_numpy(dtype=float), data["Nr. rooms"].to_numpy(dtype=float))
+
+    return {
+        "kind": "boxplot",
+        "name": "boxplot_stars",
+        "stats": list(stats.values()),
+        "title": "Number of Rooms by Hotel Star Rating",
+        "xlabel": "Hotel Stars",
+        "ylabel": "Number of Rooms",
+    }
 
-    rooms = [data[data["Hotel stars"] == s]["Nr. rooms"] for s in stars]
 
+@instrumented
+def plot_rooms_by_stars(df):
     plt.figure()
-    plt.boxplot(rooms, labels=stars)
-    plt.title("Number of Rooms by Hotel Star Rating")
-    plt.xlabel("Hotel Stars")
-    plt.ylabel("Number of Rooms")
+    draw_spec(plt.gcf(), rooms_by_stars_spec(df))
     plt.show()